@@ -43,6 +43,24 @@ a = Analysis(
         'updater',
         'Game_Launcher',
         'theme_restart',
+        'screen_classifier',
+        'roi_registry',
+        'ocr_service',
+        'glyph_reader',
+        'frame_replay',
+        'capture_stream',
+        'stuck_detector',
+        'pack_bank',
+        'feature_index',
+        'template_archive',
+        'scale_calibrator',
+        'nav_vision',
+        'route_planner',
+        'input_executor',
+        'path_pool',
+        'wait_engine',
+        'timeline',
+        'sampling_profiler',
         # src modules imported as src.*
         'src.mirror',
         'src.mirror_1366',
@@ -68,6 +86,24 @@ a = Analysis(
         'src.updater',
         'src.Game_Launcher',
         'src.theme_restart',
+        'src.screen_classifier',
+        'src.roi_registry',
+        'src.ocr_service',
+        'src.glyph_reader',
+        'src.frame_replay',
+        'src.capture_stream',
+        'src.stuck_detector',
+        'src.pack_bank',
+        'src.feature_index',
+        'src.template_archive',
+        'src.scale_calibrator',
+        'src.nav_vision',
+        'src.route_planner',
+        'src.input_executor',
+        'src.path_pool',
+        'src.wait_engine',
+        'src.timeline',
+        'src.sampling_profiler',
         'src.gui.app_lifecycle',
         'src.gui.chain_automation',
         'src.gui.components',
@@ -202,11 +202,11 @@ def save_settings():
         "skip_sinner_healing", "skip_ego_enhancing", "skip_ego_buying",
         "prioritize_list_over_status", "debug_image_matches", "hard_mode",
         "convert_images_to_grayscale", "reconnection_delay", 
-        "reconnect_when_internet_reachable", "good_pc_mode", "click_delay",
+        "reconnect_when_internet_reachable", "good_pc_mode", "pyramid_matching", "capture_fps", "click_delay",
         "retry_count", "claim_on_defeat", "pack_refreshes", "mirror_runs", 
         "exp_runs", "exp_stage", "threads_runs", "threads_difficulty",
         "convert_enkephalin_to_modules", "audio_volume", "disable_audio",
-        "x_offset", "y_offset", "enable_animations"
+        "x_offset", "y_offset", "enable_animations", "sampling_profiler"
     ]
     
     for v in vars_to_save:
@@ -252,10 +252,10 @@ def reset_settings_to_defaults():
                 'skip_sinner_healing', 'skip_ego_enhancing', 'skip_ego_buying',
                 'prioritize_list_over_status', 'debug_image_matches', 'hard_mode',
                 'convert_images_to_grayscale', 'reconnection_delay', 'reconnect_when_internet_reachable',
-                'good_pc_mode', 'click_delay', 'retry_count', 'claim_on_defeat', 'pack_refreshes', 'mirror_runs', 
+                'good_pc_mode', 'pyramid_matching', 'capture_fps', 'click_delay', 'retry_count', 'claim_on_defeat', 'pack_refreshes', 'mirror_runs', 
                 'exp_runs', 'exp_stage', 'threads_runs', 'threads_difficulty',
                 'convert_enkephalin_to_modules', "audio_volume", "disable_audio",
-                "x_offset", "y_offset", "enable_animations"
+                "x_offset", "y_offset", "enable_animations", "sampling_profiler"
             ]
             
             for field in fields:
@@ -753,6 +753,12 @@ if __name__ == "__main__":
             log_debug(f"Loader error: {_loader_err}")
             _loader_result = 'skip'
 
+        try:
+            import template_archive
+            template_archive.build_in_background(common.BASE_PATH)
+        except Exception as _archive_err:
+            log_debug(f"Template archive build not started: {_archive_err}")
+
         log_debug("Initializing Main UI (ctk.CTk)...")
         root = ctk.CTk()
         root.attributes('-alpha', 0.0)
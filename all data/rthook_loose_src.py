@@ -12,7 +12,11 @@ if getattr(sys, 'frozen', False):
         'threads_runner', 'luxcavation_functions', 'battler', 'battlepass_collector',
         'extractor', 'function_runner', 'headless_bridge', 'audio_manager',
         'logger', 'movement_detector', 'mp_types', 'profiles', 'updater',
-        'Game_Launcher', 'theme_restart', 'src',
+        'Game_Launcher', 'theme_restart', 'screen_classifier',
+        'roi_registry', 'ocr_service', 'glyph_reader',
+        'frame_replay', 'capture_stream', 'stuck_detector', 'pack_bank', 'feature_index', 'template_archive', 'scale_calibrator',
+        'nav_vision', 'route_planner', 'input_executor', 'path_pool',
+        'wait_engine', 'timeline', 'sampling_profiler', 'src',
     }
 
     class _LooseSourceFinder:
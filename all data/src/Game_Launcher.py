@@ -70,21 +70,22 @@ def launch_game(appid):
 
 def launch_limbus():
     launch_game("1973530")
-    while not common.element_exist("pictures/CustomAdded1080p/launch/Clear_All_Caches.png"):
-        common.sleep(1)
-    while common.element_exist("pictures/CustomAdded1080p/launch/Clear_All_Caches.png"):
-        common.mouse_move_click(*common.scale_coordinates_1080p(960, 540))
-        common.click_matching("pictures/general/beeg_confirm.png", recursive=False)
-        if common.element_exist("pictures/general/maint.png"):
-            common.click_matching("pictures/general/close.png", recursive=False)
-            return False
-        common.sleep(2)
-        
-    while not common.element_exist("pictures/CustomAdded1080p/Mail/Mail.png"):
-        common.click_matching("pictures/general/beeg_confirm.png", recursive=False)
-        if common.element_exist("pictures/general/maint.png"):
-            common.click_matching("pictures/general/close.png", recursive=False)
-            return False
-        common.sleep(2)
+    with common.idle_wait():
+        while not common.element_exist("pictures/CustomAdded1080p/launch/Clear_All_Caches.png"):
+            common.sleep(1)
+        while common.element_exist("pictures/CustomAdded1080p/launch/Clear_All_Caches.png"):
+            common.mouse_move_click(*common.scale_coordinates_1080p(960, 540))
+            common.click_matching("pictures/general/beeg_confirm.png", recursive=False)
+            if common.element_exist("pictures/general/maint.png"):
+                common.click_matching("pictures/general/close.png", recursive=False)
+                return False
+            common.sleep(2)
+
+        while not common.element_exist("pictures/CustomAdded1080p/Mail/Mail.png"):
+            common.click_matching("pictures/general/beeg_confirm.png", recursive=False)
+            if common.element_exist("pictures/general/maint.png"):
+                common.click_matching("pictures/general/close.png", recursive=False)
+                return False
+            common.sleep(2)
     common.sleep(2)
     return True
\ No newline at end of file
@@ -0,0 +1,99 @@
+import time
+import logging
+import threading
+from collections import deque
+
+import common
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------------------------------------------------------
+# Background capture producer
+# A dedicated thread grabs the game monitor at a fixed rate into a small ring
+# of timestamped frames. common.capture_screen hands out the first frame whose
+# grab started after the call, so a click is never answered with an older
+# screen, while the grab and colour conversion overlap with vision work on
+# the automation thread. A stalled grab shows up as a growing age() instead
+# of a hung call; restart() abandons the stuck thread and starts a new one.
+# ---------------------------------------------------------------------------
+
+_DEFAULT_DEPTH = 2
+
+class CaptureStream:
+    def __init__(self, fps, depth=_DEFAULT_DEPTH):
+        self.fps = fps
+        self.frames = deque(maxlen=depth)
+        self.started_at = time.time()
+        self._sequence = 0
+        self._generation = 0
+        self._thread = None
+        self._stop = threading.Event()
+        self._ready = threading.Condition()
+
+    def start(self):
+        self._stop.clear()
+        self._generation += 1
+        self.started_at = time.time()
+        self._thread = threading.Thread(target=self._run, args=(self._generation,), name="CaptureStream", daemon=True)
+        self._thread.start()
+        logger.info(f"Capture stream started at {self.fps} fps")
+
+    def stop(self):
+        self._stop.set()
+        with self._ready:
+            self._ready.notify_all()
+
+    def restart(self):
+        stuck = self._thread
+        self.stop()
+        if stuck is not None:
+            common.close_sct(stuck.ident)
+        with self._ready:
+            self.frames.clear()
+        self.start()
+
+    def _run(self, generation):
+        while not self._stop.is_set() and generation == self._generation:
+            grab_started = time.time()
+            try:
+                frame = common._grab_monitor()
+            except Exception as e:
+                logger.warning(f"Capture stream grab failed: {e}")
+                # Only this thread's handle; the template stores and idle
+                # gate belong to the automation thread, which is still matching
+                common.close_sct()
+                self._stop.wait(0.5)
+                continue
+            if generation != self._generation:
+                break
+
+            with self._ready:
+                self._sequence += 1
+                self.frames.append((self._sequence, grab_started, frame))
+                self._ready.notify_all()
+
+            interval = 1.0 / max(1, self.fps)
+            self._stop.wait(max(0.0, interval - (time.time() - grab_started)))
+
+    def latest(self):
+        with self._ready:
+            if not self.frames:
+                return None, 0.0
+            _, timestamp, frame = self.frames[-1]
+        return frame, timestamp
+
+    def frame_after(self, since, timeout):
+        deadline = time.time() + timeout
+        with self._ready:
+            while True:
+                if self.frames and self.frames[-1][1] >= since:
+                    return self.frames[-1][2], self.frames[-1][1]
+                remaining = deadline - time.time()
+                if remaining <= 0 or self._stop.is_set():
+                    return None, 0.0
+                self._ready.wait(remaining)
+
+    def age(self):
+        with self._ready:
+            last = self.frames[-1][1] if self.frames else self.started_at
+        return time.time() - last
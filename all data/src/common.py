@@ -15,6 +15,8 @@ import platform
 from logging.handlers import RotatingFileHandler
 import threading
 import inspect
+from collections import OrderedDict
+from contextlib import contextmanager
 from functools import partial
 if platform.system() == 'Windows':
     from ctypes import wintypes
@@ -25,6 +27,10 @@ from mss import mss
 from mss.tools import to_png
 from PIL import ImageGrab
 import shared_vars
+import roi_registry
+import scale_calibrator
+import template_archive
+import input_executor
 
 # ---------------------------------------------------------------------------
 # Input backend — Linux / evdev uinput
@@ -35,15 +41,29 @@ import shared_vars
 from evdev import UInput as _UInput, ecodes as _ec
 from Xlib import display as _xdisplay_mod
 
-_uinput_mouse = _UInput(
-    {_ec.EV_REL: [_ec.REL_X, _ec.REL_Y, _ec.REL_WHEEL],
-     _ec.EV_KEY: [_ec.BTN_LEFT, _ec.BTN_RIGHT, _ec.BTN_MIDDLE]},
-    name='workerbee-mouse',
-)
-_uinput_kbd = _UInput(
-    {_ec.EV_KEY: list(range(1, 249))},
-    name='workerbee-kbd',
-)
+# WORKERBEE_DRY_INPUT=1 swallows every input event, for offline frame replay
+_DRY_INPUT = os.environ.get("WORKERBEE_DRY_INPUT") == "1"
+
+class _NullUInput:
+    def write(self, *args):
+        pass
+
+    def syn(self):
+        pass
+
+if _DRY_INPUT:
+    _uinput_mouse = _NullUInput()
+    _uinput_kbd = _NullUInput()
+else:
+    _uinput_mouse = _UInput(
+        {_ec.EV_REL: [_ec.REL_X, _ec.REL_Y, _ec.REL_WHEEL],
+         _ec.EV_KEY: [_ec.BTN_LEFT, _ec.BTN_RIGHT, _ec.BTN_MIDDLE]},
+        name='workerbee-mouse',
+    )
+    _uinput_kbd = _UInput(
+        {_ec.EV_KEY: list(range(1, 249))},
+        name='workerbee-kbd',
+    )
 
 _UINPUT_KEY_MAP = {
     'enter': _ec.KEY_ENTER, 'return': _ec.KEY_ENTER,
@@ -74,9 +94,11 @@ for _d in '0123456789':
 
 # Cursor-position tracker — avoids X11 read-lag during rapid bezier moves
 _uinput_pos = [None, None]
-_xdisp = _xdisplay_mod.Display()
+_xdisp = None if _DRY_INPUT else _xdisplay_mod.Display()
 
 def _cursor_pos():
+    if _xdisp is None:
+        return 0, 0
     ptr = _xdisp.screen().root.query_pointer()
     return ptr.root_x, ptr.root_y
 
@@ -122,9 +144,9 @@ except Exception:
     _PDPATH_AVAILABLE = False
 
 import profiles as _profiles
+import path_pool
 
-def _wind_mouse_fallback(tx, ty, G=9.0, W=3.0, M=15.0, D=12.0):
-    sx, sy = _cursor_pos()
+def _wind_mouse_fallback(sx, sy, tx, ty, G=9.0, W=3.0, M=15.0, D=12.0):
     dist = math.hypot(tx - sx, ty - sy)
     if dist < 2:
         return []
@@ -156,35 +178,44 @@ def _wind_mouse_fallback(tx, ty, G=9.0, W=3.0, M=15.0, D=12.0):
     pts.append((tx, ty))
     return pts
 
+_pdgen_lock = threading.Lock()
+
+def _synthesize_path(sx, sy, ex, ey, prof, canvas):
+    if not _PDPATH_AVAILABLE:
+        return _wind_mouse_fallback(sx, sy, ex, ey)
+    try:
+        with _pdgen_lock:
+            path, _, _, _ = _pdgen.generate_path(
+                sx, sy, ex, ey,
+                canvas_width=canvas[0],
+                canvas_height=canvas[1],
+                mouse_velocity=prof["mouse_velocity"],
+                noise=prof["noise"],
+                arc_strength=prof["arc_strength"],
+                overshoot_prob=prof["overshoot_prob"],
+                variance=prof["variance"],
+            )
+        return [(int(p[0]), int(p[1])) for p in path]
+    except Exception:
+        return _wind_mouse_fallback(sx, sy, ex, ey)
+
+_path_pool = path_pool.PathPool(_synthesize_path)
+
 def _generate_path(tx, ty):
     sx, sy = _cursor_pos()
     if math.hypot(tx - sx, ty - sy) < 2:
         return []
 
-    if not _PDPATH_AVAILABLE:
-        return _wind_mouse_fallback(tx, ty)
-
     prof = _profiles.get_profile()
-    jitter = prof["endpoint_jitter_px"]
+    jitter = prof["endpoint_jitter_px"] if _PDPATH_AVAILABLE else 0
     ex = tx + random.randint(-jitter, jitter)
     ey = ty + random.randint(-jitter, jitter)
-    try:
-        path, _, _, _ = _pdgen.generate_path(
-            sx, sy, ex, ey,
-            canvas_width=EXPECTED_WIDTH or 1920,
-            canvas_height=EXPECTED_HEIGHT or 1080,
-            mouse_velocity=prof["mouse_velocity"],
-            noise=prof["noise"],
-            arc_strength=prof["arc_strength"],
-            overshoot_prob=prof["overshoot_prob"],
-            variance=prof["variance"],
-        )
-        pts = [(int(p[0]), int(p[1])) for p in path]
-        if not pts or pts[-1] != (tx, ty):
-            pts.append((tx, ty))
-        return pts
-    except Exception:
-        return _wind_mouse_fallback(tx, ty)
+    pts = _path_pool.take(_profiles.active_name(), sx, sy, ex, ey)
+    if pts is None:
+        pts = _synthesize_path(sx, sy, ex, ey, prof, (EXPECTED_WIDTH or 1920, EXPECTED_HEIGHT or 1080))
+    if not pts or pts[-1] != (tx, ty):
+        pts.append((tx, ty))
+    return pts
 
 def _bezier_move(tx, ty, duration=None):
     sx, sy = _cursor_pos()
@@ -232,23 +263,95 @@ def get_sct():
             _sct_instances[tid] = mss()
         return _sct_instances[tid]
 
-def reset_sct(target_thread_id=None):
+def close_sct(target_thread_id=None):
+    # Drops one thread's mss handle only; the next grab on it opens a new one
     tid = target_thread_id if target_thread_id is not None else threading.current_thread().ident
+    with _sct_lock:
+        sct = _sct_instances.pop(tid, None)
+    if sct is not None:
+        try:
+            sct.close()
+        except Exception as e:
+            logger.warning(f"Failed to close screen capture instance: {e}")
+
+def reset_sct(target_thread_id=None):
     try:
-        with _sct_lock:
-            sct = _sct_instances.pop(tid, None)
-        if sct is not None:
-            try:
-                sct.close()
-            except Exception as e:
-                logger.warning(f"Failed to close screen capture instance: {e}")
+        close_sct(target_thread_id)
         _template_cache.clear()
+        clear_template_store()
+        clear_idle_gate()
         logger.info("Screen capture and template cache reset")
     except Exception as e:
         logger.error(f"Error resetting SCT: {e}")
 
 _template_cache = {}
 
+_SCALED_TEMPLATE_CACHE_SIZE = 1024
+_scaled_template_cache = OrderedDict()
+_scaled_template_lock = threading.Lock()
+
+def clear_template_store():
+    with _scaled_template_lock:
+        _scaled_template_cache.clear()
+
+# Pre-decoded archive built by template_archive; mapped once per process and
+# left in place across reset_sct since its arrays never change underneath us
+_archive = None
+_archive_lock = threading.Lock()
+
+def _template_archive():
+    global _archive
+    if _archive is None:
+        with _archive_lock:
+            if _archive is None:
+                _archive = template_archive.open_archive(BASE_PATH) or False
+    return _archive or None
+
+def _load_template(full_template_path, color_flag):
+    cache_key = (full_template_path, color_flag)
+    template = _template_cache.get(cache_key)
+    if template is None:
+        archive = _template_archive()
+        if archive is not None:
+            template = archive.get(full_template_path, color_flag)
+            if template is not None:
+                _template_cache[cache_key] = template
+                return template
+        try:
+            raw = np.fromfile(full_template_path, dtype=np.uint8)
+            template = cv2.imdecode(raw, color_flag)
+        except Exception:
+            template = None
+        if template is not None:
+            _template_cache[cache_key] = template
+    return template
+
+def _get_scaled_template(full_template_path, color_flag, effective_scale):
+    cache_key = (full_template_path, color_flag, round(effective_scale, 4))
+    with _scaled_template_lock:
+        template = _scaled_template_cache.get(cache_key)
+        if template is not None:
+            _scaled_template_cache.move_to_end(cache_key)
+            return template
+
+    archive = _template_archive() if effective_scale != 1.0 else None
+    template = archive.get(full_template_path, color_flag, effective_scale) if archive is not None else None
+    if template is None:
+        original_template = _load_template(full_template_path, color_flag)
+        if original_template is None:
+            return None
+
+        if effective_scale != 1.0:
+            template = cv2.resize(original_template, None, fx=effective_scale, fy=effective_scale, interpolation=cv2.INTER_LINEAR)
+        else:
+            template = original_template
+
+    with _scaled_template_lock:
+        _scaled_template_cache[cache_key] = template
+        while len(_scaled_template_cache) > _SCALED_TEMPLATE_CACHE_SIZE:
+            _scaled_template_cache.popitem(last=False)
+    return template
+
 def get_base_path():
     if getattr(sys, 'frozen', False):
         return sys._MEIPASS
@@ -342,10 +445,35 @@ def initialize_async_logging():
             return False
     return False
 
+def set_monitor_size(width, height):
+    global MONITOR_WIDTH, MONITOR_HEIGHT, IS_NON_STANDARD_RATIO, EXPECTED_WIDTH, EXPECTED_HEIGHT
+
+    previous_expected = (EXPECTED_WIDTH, EXPECTED_HEIGHT)
+    MONITOR_WIDTH = width
+    MONITOR_HEIGHT = height
+
+    aspect_ratio = MONITOR_WIDTH / MONITOR_HEIGHT
+    IS_NON_STANDARD_RATIO = not(abs(aspect_ratio - REFERENCE_ASPECT_RATIO) < 0.0001)
+
+    EXPECTED_WIDTH = MONITOR_WIDTH
+    EXPECTED_HEIGHT = MONITOR_HEIGHT
+    if IS_NON_STANDARD_RATIO:
+        if aspect_ratio > REFERENCE_ASPECT_RATIO:
+            EXPECTED_WIDTH = round(MONITOR_HEIGHT * REFERENCE_ASPECT_RATIO)
+        else:
+            EXPECTED_HEIGHT = round(MONITOR_WIDTH / REFERENCE_ASPECT_RATIO)
+        logger.info(f"Non-standard monitor ratio detected (expect {EXPECTED_WIDTH}x{EXPECTED_HEIGHT} instead)")
+
+    if previous_expected != (EXPECTED_WIDTH, EXPECTED_HEIGHT):
+        clear_template_store()
+
+    return MONITOR_WIDTH, MONITOR_HEIGHT
+
 def detect_monitor_resolution():
     global MONITOR_WIDTH, MONITOR_HEIGHT, IS_NON_STANDARD_RATIO, EXPECTED_WIDTH, EXPECTED_HEIGHT
 
     monitor_index = getattr(shared_vars, 'game_monitor', 1)
+    previous_expected = (EXPECTED_WIDTH, EXPECTED_HEIGHT)
     
     try:
         monitors = get_sct().monitors
@@ -354,24 +482,8 @@ def detect_monitor_resolution():
             monitor_index = 1
             
         monitor = monitors[monitor_index]
-        MONITOR_WIDTH = monitor['width']
-        MONITOR_HEIGHT = monitor['height']
-        
-        logger.info(f"Detected montior size: {MONITOR_WIDTH}x{MONITOR_HEIGHT}")
-
-        aspect_ratio = MONITOR_WIDTH / MONITOR_HEIGHT
-        IS_NON_STANDARD_RATIO = not(abs(aspect_ratio - REFERENCE_ASPECT_RATIO) < 0.0001)
-
-        EXPECTED_WIDTH = MONITOR_WIDTH
-        EXPECTED_HEIGHT = MONITOR_HEIGHT
-        if IS_NON_STANDARD_RATIO:
-            if aspect_ratio > REFERENCE_ASPECT_RATIO:
-                EXPECTED_WIDTH = round(MONITOR_HEIGHT * REFERENCE_ASPECT_RATIO)
-            else:
-                EXPECTED_HEIGHT = round(MONITOR_WIDTH / REFERENCE_ASPECT_RATIO)
-            logger.info(f"Non-standard monitor ratio detected (expect {EXPECTED_WIDTH}x{EXPECTED_HEIGHT} instead)")
-
-        return MONITOR_WIDTH, MONITOR_HEIGHT
+        logger.info(f"Detected montior size: {monitor['width']}x{monitor['height']}")
+        return set_monitor_size(monitor['width'], monitor['height'])
     except Exception as e:
         logger.error(f"Error detecting monitor resolution: {e}")
         MONITOR_WIDTH = 1920
@@ -379,6 +491,8 @@ def detect_monitor_resolution():
         EXPECTED_WIDTH = 1920
         EXPECTED_HEIGHT = 1080
         IS_NON_STANDARD_RATIO = False
+        if previous_expected != (EXPECTED_WIDTH, EXPECTED_HEIGHT):
+            clear_template_store()
         return 1920, 1080
 
 detect_monitor_resolution()
@@ -387,10 +501,70 @@ def random_choice(list):
     return secrets.choice(list)
 
 def sleep(x):
+    invalidate_frame()
     time.sleep(x)
 
+# Every input goes through the input executor thread. The *_async variants
+# return a Future as soon as the command is queued; the plain functions wait
+# for it, which keeps their old blocking behaviour and ordering.
+def submit_input(fn, *args, **kwargs):
+    invalidate_frame()
+    return input_executor.submit(fn, *args, **kwargs)
+
+def wait_input(timeout=None):
+    input_executor.drain(timeout)
+
+def _click_left():
+    _input_press_left()
+    time.sleep(random.uniform(0.04, 0.09))
+    _input_release_left()
+
+def _hold_left(seconds):
+    _input_press_left()
+    time.sleep(seconds)
+    _input_release_left()
+
+def _move_click(real_x, real_y):
+    prof = _profiles.get_profile()
+    pause, drift = _profiles.rhythm_tick()
+    if pause > 0:
+        if drift != (0, 0):
+            _input_move_abs(
+                max(0, real_x + drift[0]),
+                max(0, real_y + drift[1]),
+            )
+        time.sleep(pause)
+
+    if random.random() < prof["overshoot_prob"]:
+        ox = real_x + random.randint(6, 14) * random.choice([-1, 1])
+        oy = real_y + random.randint(6, 14) * random.choice([-1, 1])
+        _bezier_move(ox, oy)
+        time.sleep(random.lognormvariate(
+            prof["lognorm_pre_move_mu"], prof["lognorm_pre_move_sig"]
+        ))
+
+    _bezier_move(real_x, real_y)
+    time.sleep(random.lognormvariate(
+        prof["lognorm_pre_click_mu"], prof["lognorm_pre_click_sig"]
+    ))
+    _click_left()
+
+def _drag_to(real_x, real_y, seconds, hold, release_hold):
+    _input_press_left()
+    time.sleep(hold)
+    _bezier_move(real_x, real_y, duration=seconds * random.uniform(0.9, 1.1))
+    time.sleep(release_hold)
+    _input_release_left()
+
+def _key_taps(key, presses):
+    for _ in range(presses):
+        _input_key_tap(key)
+
+def mouse_scroll_async(amount):
+    return submit_input(_input_scroll, amount)
+
 def mouse_scroll(amount):
-    _input_scroll(amount)
+    mouse_scroll_async(amount).result()
 
 def _validate_monitor_index(monitor_index, fallback=1):
     if monitor_index >= len(get_sct().monitors):
@@ -407,91 +581,277 @@ def get_MonCords(x, y):
     mon = get_monitor_info()
     return mon['left'] + x, mon['top'] + y
 
-def mouse_move(x, y):
+def mouse_move_async(x, y):
     real_x, real_y = get_MonCords(x, y)
-    _bezier_move(real_x, real_y)
+    return submit_input(_bezier_move, real_x, real_y)
 
-def mouse_click():
+def mouse_move(x, y):
+    mouse_move_async(x, y).result()
+
+def mouse_click_async():
     if logger.isEnabledFor(logging.DEBUG):
         caller_info = _get_caller_info()
         cx, cy = _cursor_pos()
         logger.debug(f"Mouse click at ({cx}, {cy}) - {caller_info}", dirty=True)
-    _input_press_left()
-    time.sleep(random.uniform(0.04, 0.09))
-    _input_release_left()
+    return submit_input(_click_left)
+
+def mouse_click():
+    mouse_click_async().result()
 
 def mouse_hold():
-    _input_press_left()
-    sleep(2)
-    _input_release_left()
+    submit_input(_hold_left, 2).result()
 
 def mouse_down():
-    _input_press_left()
+    submit_input(_input_press_left).result()
 
 def mouse_up():
-    _input_release_left()
+    submit_input(_input_release_left).result()
 
-def mouse_move_click(x, y, log_click=True):
+def mouse_move_click_async(x, y, log_click=True):
     if log_click and logger.isEnabledFor(logging.DEBUG):
         caller_info = _get_caller_info()
         logger.debug(f"Mouse move and click to ({x}, {y}) - {caller_info}", dirty=True)
-    prof = _profiles.get_profile()
     real_x, real_y = get_MonCords(x, y)
     real_x += random.randint(-3, 3)
     real_y += random.randint(-3, 3)
+    return submit_input(_move_click, real_x, real_y)
 
-    pause, drift = _profiles.rhythm_tick()
-    if pause > 0:
-        if drift != (0, 0):
-            _input_move_abs(
-                max(0, real_x + drift[0]),
-                max(0, real_y + drift[1]),
-            )
-        time.sleep(pause)
-
-    if random.random() < prof["overshoot_prob"]:
-        ox = real_x + random.randint(6, 14) * random.choice([-1, 1])
-        oy = real_y + random.randint(6, 14) * random.choice([-1, 1])
-        _bezier_move(ox, oy)
-        time.sleep(random.lognormvariate(
-            prof["lognorm_pre_move_mu"], prof["lognorm_pre_move_sig"]
-        ))
-
-    _bezier_move(real_x, real_y)
-    time.sleep(random.lognormvariate(
-        prof["lognorm_pre_click_mu"], prof["lognorm_pre_click_sig"]
-    ))
-    _input_press_left()
-    time.sleep(random.uniform(0.04, 0.09))
-    _input_release_left()
+def mouse_move_click(x, y, log_click=True):
+    mouse_move_click_async(x, y, log_click=log_click).result()
 
-def mouse_drag(x, y, seconds=1, hold=0.06, release_hold=0.06):
+def mouse_drag_async(x, y, seconds=1, hold=0.06, release_hold=0.06):
     if logger.isEnabledFor(logging.DEBUG):
         caller_info = _get_caller_info()
         logger.debug(f"Mouse drag to ({x}, {y}) over {seconds}s - {caller_info}", dirty=True)
     real_x, real_y = get_MonCords(x, y)
-    _input_press_left()
-    time.sleep(hold)
-    _bezier_move(real_x, real_y, duration=seconds * random.uniform(0.9, 1.1))
-    time.sleep(release_hold)
-    _input_release_left()
+    return submit_input(_drag_to, real_x, real_y, seconds, hold, release_hold)
 
-def key_press(Key, presses=1):
-    for _ in range(presses):
-        _input_key_tap(Key)
+def mouse_drag(x, y, seconds=1, hold=0.06, release_hold=0.06):
+    mouse_drag_async(x, y, seconds, hold, release_hold).result()
+
+def key_press_async(Key, presses=1):
+    return submit_input(_key_taps, Key, presses)
 
-def capture_screen(monitor_index=None):
+def key_press(Key, presses=1):
+    key_press_async(Key, presses).result()
+
+# Offline replay hooks: a frame source stands in for mss on the game monitor,
+# a recorder sees every captured frame and template query
+_frame_source = None
+_match_recorder = None
+
+def set_frame_source(source):
+    global _frame_source
+    _frame_source = source
+
+def set_match_recorder(recorder):
+    global _match_recorder
+    _match_recorder = recorder
+
+def match_frame_token():
+    # The recorded frame the calling thread last captured, for queries that
+    # run on pool threads; None when not recording
+    recorder = _match_recorder
+    return recorder.frame_token() if recorder is not None else None
+
+def _record_query(template_path, params, coordinates, confidence, started, frame_shape, frame_token=None):
+    recorder = _match_recorder
+    if recorder is not None:
+        recorder.on_match(template_path, params, coordinates, confidence,
+                          time.perf_counter() - started, frame_shape, frame_token)
+
+@contextmanager
+def frame_context(max_age=None):
+    outer = getattr(_thread_local, 'frame_ctx', None)
+    if outer is not None:
+        yield outer
+        return
+    ctx = {"frame": None, "captured_at": 0.0, "max_age": max_age, "inputs_done": 0}
+    _thread_local.frame_ctx = ctx
+    try:
+        yield ctx
+    finally:
+        _thread_local.frame_ctx = None
+
+def invalidate_frame():
+    ctx = getattr(_thread_local, 'frame_ctx', None)
+    if ctx is not None:
+        ctx["frame"] = None
+
+def _context_frame():
+    ctx = getattr(_thread_local, 'frame_ctx', None)
+    if ctx is None or ctx["frame"] is None:
+        return None
+    # An input that finished after the grab (one queued asynchronously) may
+    # have changed the screen
+    if ctx["inputs_done"] != input_executor.completed():
+        ctx["frame"] = None
+        return None
+    if ctx["max_age"] is not None and time.time() - ctx["captured_at"] > ctx["max_age"]:
+        ctx["frame"] = None
+        return None
+    return ctx["frame"]
+
+# Reusable frame buffers, one small pool per thread and shape. A buffer is
+# handed out again only once nothing else references it (crops and views keep
+# their base alive), so frames kept by a frame context, the recorder queue or
+# a caller are never overwritten. The free reference count is measured once
+# on this interpreter rather than assumed.
+_BUFFER_POOL_DEPTH = 4
+_BUFFER_POOL_SHAPES = 8
+
+def _refcount_at(pool, index):
+    return sys.getrefcount(pool[index])
+
+_FREE_BUFFER_REFS = _refcount_at([np.empty(1, dtype=np.uint8)], 0)
+
+def _pooled_buffer(shape):
+    pools = getattr(_thread_local, 'buffer_pools', None)
+    if pools is None:
+        pools = _thread_local.buffer_pools = OrderedDict()
+    pool = pools.get(shape)
+    if pool is None:
+        pool = pools[shape] = []
+        while len(pools) > _BUFFER_POOL_SHAPES:
+            pools.popitem(last=False)
+    else:
+        pools.move_to_end(shape)
+
+    for index in range(len(pool)):
+        if _refcount_at(pool, index) == _FREE_BUFFER_REFS:
+            return pool[index]
+    buffer = np.empty(shape, dtype=np.uint8)
+    if len(pool) < _BUFFER_POOL_DEPTH:
+        pool.append(buffer)
+    return buffer
+
+def to_grayscale(image):
+    if len(image.shape) == 2:
+        return image
+    code = cv2.COLOR_BGRA2GRAY if image.shape[2] == 4 else cv2.COLOR_BGR2GRAY
+    return cv2.cvtColor(image, code, dst=_pooled_buffer(image.shape[:2]))
+
+def _clamp_box(x1, y1, x2, y2, width, height):
+    x1 = max(0, min(int(x1), width))
+    y1 = max(0, min(int(y1), height))
+    x2 = max(x1, min(int(x2), width))
+    y2 = max(y1, min(int(y2), height))
+    return x1, y1, x2, y2
+
+# Optional background producer (capture_stream.CaptureStream) that keeps a
+# ring of fresh frames; started and stopped through set_capture_fps
+_capture_stream = None
+_STREAM_STALE_AFTER = 2.0
+_latest_frame = (None, 0.0)
+
+def set_capture_fps(fps):
+    global _capture_stream
+    fps = int(fps or 0)
+    stream = _capture_stream
+    if fps <= 0:
+        if stream is not None:
+            _capture_stream = None
+            stream.stop()
+            logger.info("Capture stream stopped")
+        return
+    if stream is None:
+        import capture_stream
+        stream = capture_stream.CaptureStream(fps)
+        stream.start()
+        _capture_stream = stream
+    elif stream.fps != fps:
+        stream.fps = fps
+        logger.info(f"Capture stream set to {fps} fps")
+
+def latest_frame():
+    # Newest whole frame from any thread without grabbing; (None, 0.0) if none yet
+    if _capture_stream is not None:
+        return _capture_stream.latest()
+    return _latest_frame
+
+def capture_age(thread_id, since=0.0):
+    if _capture_stream is not None:
+        return _capture_stream.age()
+    return time.time() - max(_capture_heartbeat.get(thread_id, since), since)
+
+def recover_capture(thread_id):
+    if _capture_stream is not None:
+        _capture_stream.restart()
+    reset_sct(thread_id)
+
+def _grab_monitor(monitor_index=None, region=None, grayscale=False):
     mon_idx = monitor_index if monitor_index is not None else shared_vars.game_monitor
     mon_idx = _validate_monitor_index(mon_idx)
 
     monitor = get_sct().monitors[mon_idx]
-
+    if region is not None:
+        x1, y1, x2, y2 = _clamp_box(*region, monitor["width"], monitor["height"])
+        if x2 <= x1 or y2 <= y1:
+            return np.zeros((y2 - y1, x2 - x1) if grayscale else (y2 - y1, x2 - x1, 3), dtype=np.uint8)
+        monitor = {"left": monitor["left"] + x1, "top": monitor["top"] + y1,
+                   "width": x2 - x1, "height": y2 - y1}
+
+    # View the raw BGRA bytes in place and convert once into the output
     screenshot = get_sct().grab(monitor)
-    img = np.array(screenshot)
-
-    img = cv2.cvtColor(img, cv2.COLOR_BGRA2BGR)
-
-    _capture_heartbeat[threading.current_thread().ident] = time.time()
+    bgra = np.frombuffer(screenshot.raw, dtype=np.uint8).reshape(screenshot.height, screenshot.width, 4)
+    if region is not None and grayscale:
+        return cv2.cvtColor(bgra, cv2.COLOR_BGRA2GRAY)
+    if region is not None:
+        return cv2.cvtColor(bgra, cv2.COLOR_BGRA2BGR)
+    return cv2.cvtColor(bgra, cv2.COLOR_BGRA2BGR, dst=_pooled_buffer((screenshot.height, screenshot.width, 3)))
+
+def capture_screen(monitor_index=None, region=None, grayscale=False):
+    # region=(x1, y1, x2, y2) in monitor pixels grabs only that box, clamped
+    # to the monitor. Region grabs are never kept as the frame context, and
+    # grayscale=True (region grabs only) converts straight from BGRA.
+    global _latest_frame
+    called_at = time.time()
+    inputs_done = input_executor.completed()
+    if monitor_index is None:
+        frame = _context_frame()
+        if frame is not None:
+            _capture_heartbeat[threading.current_thread().ident] = called_at
+            if region is not None:
+                crop = _crop_region(frame, *region)[0]
+                return to_grayscale(crop) if grayscale else crop
+            return frame
+
+        # A frame context shares one whole frame between queries; replay,
+        # recording and the capture stream all work on whole frames, so crop
+        # one of those instead
+        in_context = getattr(_thread_local, 'frame_ctx', None) is not None
+        whole_frames = _frame_source is not None or _match_recorder is not None or _capture_stream is not None
+        if region is not None and (in_context or whole_frames):
+            crop = _crop_region(capture_screen(), *region)[0]
+            return to_grayscale(crop) if grayscale else crop
+
+    stream = _capture_stream
+    if _frame_source is not None and monitor_index is None:
+        img = _frame_source.next_frame()
+    elif stream is not None and monitor_index is None and region is None:
+        img = None
+        if stream.age() < _STREAM_STALE_AFTER:
+            img, _ = stream.frame_after(called_at, _STREAM_STALE_AFTER)
+        if img is None:
+            logger.debug("Capture stream is stale, grabbing directly", dirty=True)
+            img = _grab_monitor()
+    else:
+        img = _grab_monitor(monitor_index, region, grayscale)
+
+    now = time.time()
+    _capture_heartbeat[threading.current_thread().ident] = now
+    if region is not None:
+        return to_grayscale(img) if grayscale and len(img.shape) == 3 else img
+    if _match_recorder is not None and monitor_index is None:
+        _match_recorder.on_frame(img)
+
+    if monitor_index is None:
+        _latest_frame = (img, now)
+        ctx = getattr(_thread_local, 'frame_ctx', None)
+        if ctx is not None:
+            ctx["frame"] = img
+            ctx["captured_at"] = now
+            ctx["inputs_done"] = inputs_done
     return img
 
 def save_match_screenshot(screenshot, top_left, bottom_right, template_path, match_index):
@@ -581,30 +941,199 @@ def _get_caller_info():
         logger.debug(f"Failed to get caller info: {e}")
     return "unknown"
 
-def _base_match_template(template_path, threshold=0.8, grayscale=False,no_grayscale=False, debug=False, area="center", quiet_failure=False, x1=None, y1=None, x2=None, y2=None, screenshot=None, enable_scaling=False):
+_PYRAMID_FACTOR = 2
+_PYRAMID_MARGIN = 0.15
+_PYRAMID_MAX_CANDIDATES = 64
+
+def _pyramid_match(screenshot, full_template_path, color_flag, base_scale, threshold):
+    # Coarse-to-fine: match a half-size template on a half-size frame, then
+    # re-match at full resolution only in small windows around the coarse
+    # peaks. Returns None when the template is too small to survive the
+    # downsampling or the search area too small to be worth it.
+    template = _get_scaled_template(full_template_path, color_flag, base_scale)
+    if template is None:
+        return None
+    template_height, template_width = template.shape[:2]
+    screen_height, screen_width = screenshot.shape[:2]
+    factor = _PYRAMID_FACTOR
+    if min(template_height, template_width) < 12 * factor or screen_height * screen_width < 16 * template_height * template_width:
+        return None
+
+    small_template = _get_scaled_template(full_template_path, color_flag, base_scale / factor)
+    small_screen = cv2.resize(screenshot, (screen_width // factor, screen_height // factor), interpolation=cv2.INTER_AREA)
+    if small_template is None or small_template.shape[0] > small_screen.shape[0] or small_template.shape[1] > small_screen.shape[1]:
+        return None
+
+    coarse = cv2.matchTemplate(small_screen, small_template, cv2.TM_CCOEFF_NORMED)
+    candidates, _ = match_peaks(coarse, threshold - _PYRAMID_MARGIN, small_template.shape[1], small_template.shape[0])
+
+    radius = factor + 2
+    best_val = float(coarse.max()) if coarse.size > 0 else -1.0
+    boxes = []
+    scores = []
+    for cx, cy, _, _ in candidates[:_PYRAMID_MAX_CANDIDATES]:
+        wx1 = max(0, cx * factor - radius)
+        wy1 = max(0, cy * factor - radius)
+        wx2 = min(screen_width, cx * factor + radius + template_width)
+        wy2 = min(screen_height, cy * factor + radius + template_height)
+        if wx2 - wx1 < template_width or wy2 - wy1 < template_height:
+            continue
+        res = cv2.matchTemplate(screenshot[wy1:wy2, wx1:wx2], template, cv2.TM_CCOEFF_NORMED)
+        _, max_val, _, max_loc = cv2.minMaxLoc(res)
+        best_val = max(best_val, max_val)
+        if max_val >= threshold:
+            left = wx1 + max_loc[0]
+            top = wy1 + max_loc[1]
+            boxes.append([left, top, left + template_width, top + template_height])
+            scores.append(max_val)
+
+    filtered_boxes, match_scores = nms_scored(boxes, scores)
+    return filtered_boxes, match_scores, best_val
+
+def _crop_region(screenshot, x1, y1, x2, y2):
+    if x1 is None or y1 is None or x2 is None or y2 is None:
+        return screenshot, 0, 0
+    screenshot_height, screenshot_width = screenshot.shape[:2]
+    x1, y1, x2, y2 = _clamp_box(x1, y1, x2, y2, screenshot_width, screenshot_height)
+    return screenshot[y1:y2, x1:x2], x1, y1
+
+def _grab_region(x1, y1, x2, y2, grayscale=False):
+    # Capture only the box a query searches; returns (image, offset_x, offset_y)
+    # like _crop_region does for an existing frame
+    x1, y1, x2, y2 = _clamp_box(x1, y1, x2, y2, MONITOR_WIDTH, MONITOR_HEIGHT)
+    return capture_screen(region=(x1, y1, x2, y2), grayscale=grayscale), x1, y1
+
+# Frame-difference gate for idle waits. Inside idle_wait(), a query whose
+# search region looks the same as when it last came back empty reuses that
+# empty answer instead of running matchTemplate again. The region is compared
+# as a thumbnail with cells half the template's size, so the template showing
+# up anywhere in it moves at least one cell well past the tolerance.
+_GATE_TOLERANCE = 6
+_GATE_CACHE_SIZE = 256
+_gate_cache = OrderedDict()
+_gate_lock = threading.Lock()
+
+@contextmanager
+def idle_wait():
+    depth = getattr(_thread_local, 'idle_wait', 0)
+    _thread_local.idle_wait = depth + 1
+    try:
+        yield
+    finally:
+        _thread_local.idle_wait = depth
+
+def idle_waiting():
+    return getattr(_thread_local, 'idle_wait', 0) > 0
+
+def clear_idle_gate():
+    with _gate_lock:
+        _gate_cache.clear()
+
+def _gate_signature(template_path, region):
+    full_template_path = resource_path(template_path)
+    template = _load_template(full_template_path, cv2.IMREAD_GRAYSCALE)
+    if template is None or region.size == 0:
+        return None
+    if is_custom_fuse_image(full_template_path):
+        scale = 1.0
+    else:
+        base_width, base_height = get_template_reference_resolution(full_template_path)
+        scale = min(EXPECTED_WIDTH / base_width, EXPECTED_HEIGHT / base_height)
+    cell = max(4, int(min(template.shape[:2]) * scale) // 2)
+
+    region_height, region_width = region.shape[:2]
+    thumb = cv2.resize(region, (max(1, region_width // cell), max(1, region_height // cell)), interpolation=cv2.INTER_AREA)
+    if len(thumb.shape) == 3:
+        thumb = cv2.cvtColor(thumb, cv2.COLOR_BGR2GRAY)
+    return thumb
+
+def _gate_check(key, template_path, region, idle=None):
+    # Returns (unchanged, signature); the signature goes back to _gate_store
+    # once the real match has run. Pool threads pass idle= from the thread
+    # that asked, since idle_wait() is per thread
+    if idle is None:
+        idle = idle_waiting()
+    if not idle:
+        return False, None
+    signature = _gate_signature(template_path, region)
+    if signature is None:
+        return False, None
+    with _gate_lock:
+        previous = _gate_cache.get(key)
+    if previous is None or previous.shape != signature.shape:
+        return False, signature
+    return int(cv2.absdiff(previous, signature).max()) <= _GATE_TOLERANCE, signature
+
+def _gate_store(key, signature, found):
+    with _gate_lock:
+        if found or signature is None:
+            _gate_cache.pop(key, None)
+            return
+        _gate_cache[key] = signature
+        _gate_cache.move_to_end(key)
+        while len(_gate_cache) > _GATE_CACHE_SIZE:
+            _gate_cache.popitem(last=False)
+
+def _roi_region(template_path, screenshot):
+    if not roi_registry.enabled():
+        return None
+    if screenshot.shape[:2] != (MONITOR_HEIGHT, MONITOR_WIDTH):
+        return None
+    region = roi_registry.get_region(template_path)
+    if region is None:
+        return None
+    rx1, ry1, rx2, ry2 = region
+    return scale_x_1080p(rx1), scale_y_1080p(ry1), scale_x_1080p(rx2), scale_y_1080p(ry2)
+
+def _roi_learn(template_path, screenshot, boxes, offset_x=0, offset_y=0):
+    if len(boxes) == 0 or not roi_registry.learning():
+        return
+    if screenshot.shape[:2] != (MONITOR_HEIGHT, MONITOR_WIDTH):
+        return
+    pad_x, pad_y = padding_none_16_9_monitor(0, 0)
+    ratio_x = REFERENCE_WIDTH_1080P / EXPECTED_WIDTH
+    ratio_y = REFERENCE_HEIGHT_1080P / EXPECTED_HEIGHT
+    left = min(box[0] for box in boxes) + offset_x - pad_x - shared_vars.x_offset
+    top = min(box[1] for box in boxes) + offset_y - pad_y - shared_vars.y_offset
+    right = max(box[2] for box in boxes) + offset_x - pad_x - shared_vars.x_offset
+    bottom = max(box[3] for box in boxes) + offset_y - pad_y - shared_vars.y_offset
+    roi_registry.record(template_path, (left * ratio_x, top * ratio_y, right * ratio_x, bottom * ratio_y), len(boxes))
+
+def _base_match_template(template_path, threshold=0.8, grayscale=False,no_grayscale=False, debug=False, area="center", quiet_failure=False, x1=None, y1=None, x2=None, y2=None, screenshot=None, enable_scaling=False, use_roi=True, return_scores=False):
     
     full_template_path = resource_path(template_path)
-        
-    if screenshot is None:
-        screenshot = capture_screen()
-    original_screenshot_height, original_screenshot_width = screenshot.shape[:2]
+    match_started = time.perf_counter()
+    query_region = (x1, y1, x2, y2)
+    has_region = x1 is not None and y1 is not None and x2 is not None and y2 is not None
 
-    crop_offset_x = 0
-    crop_offset_y = 0
-    if x1 is not None and y1 is not None and x2 is not None and y2 is not None:
-        x1 = max(0, min(x1, original_screenshot_width))
-        y1 = max(0, min(y1, original_screenshot_height))
-        x2 = max(x1, min(x2, original_screenshot_width))
-        y2 = max(y1, min(y2, original_screenshot_height))
+    use_grayscale = not no_grayscale and (grayscale or shared_vars.convert_images_to_grayscale)
 
-        screenshot = screenshot[y1:y2, x1:x2]
-        crop_offset_x = x1
-        crop_offset_y = y1
+    region_grab = None
+    if screenshot is None and has_region:
+        region_grab = _grab_region(x1, y1, x2, y2, grayscale=use_grayscale)
+        screenshot = region_grab[0]
+    elif screenshot is None:
+        screenshot = capture_screen()
+    original_screenshot_height, original_screenshot_width = screenshot.shape[:2]
+    full_screenshot = screenshot
+    base_threshold = threshold
+
+    roi_region = None
+    learn_region = x1 is None and y1 is None and x2 is None and y2 is None
+    if learn_region and use_roi:
+        roi_region = _roi_region(template_path, screenshot)
+        if roi_region is not None:
+            x1, y1, x2, y2 = roi_region
+
+    if region_grab is not None:
+        screenshot, crop_offset_x, crop_offset_y = region_grab
+    else:
+        screenshot, crop_offset_x, crop_offset_y = _crop_region(screenshot, x1, y1, x2, y2)
 
     screenshot_height, screenshot_width = original_screenshot_height, original_screenshot_width
 
-    if not no_grayscale and (grayscale or shared_vars.convert_images_to_grayscale):
-        screenshot = cv2.cvtColor(screenshot, cv2.COLOR_BGR2GRAY)
+    if use_grayscale:
+        screenshot = to_grayscale(screenshot)
     
     base_width, base_height = get_template_reference_resolution(full_template_path)
     
@@ -617,93 +1146,85 @@ def _base_match_template(template_path, threshold=0.8, grayscale=False,no_graysc
     else:
         color_flag = cv2.IMREAD_GRAYSCALE if (grayscale or shared_vars.convert_images_to_grayscale) else cv2.IMREAD_COLOR
 
-    cache_key = (full_template_path, color_flag)
-    if cache_key in _template_cache:
-        original_template = _template_cache[cache_key]
-    else:
-        try:
-            raw = np.fromfile(full_template_path, dtype=np.uint8)
-            original_template = cv2.imdecode(raw, color_flag)
-        except Exception:
-            original_template = None
-        if original_template is None:
-            if logger.isEnabledFor(logging.DEBUG):
-                logger.debug(f"Image file missing: {template_path} | File Exists: False", dirty=True)
-            if quiet_failure:
-                return []
-            raise FileNotFoundError(f"Template image '{full_template_path}' not found.")
-        _template_cache[cache_key] = original_template
+    if _load_template(full_template_path, color_flag) is None:
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"Image file missing: {template_path} | File Exists: False", dirty=True)
+        if quiet_failure:
+            return []
+        raise FileNotFoundError(f"Template image '{full_template_path}' not found.")
 
+    scale_resolution = scale_calibrator.resolution_key(EXPECTED_WIDTH, EXPECTED_HEIGHT)
     if enable_scaling:
-        scales_to_test = [x / 100.0 for x in range(80, 121, 4)]
+        scales_to_test = scale_calibrator.scales_for(template_path, scale_resolution)
     else:
         scales_to_test = [1.0]
 
+    if no_grayscale and len(screenshot.shape) == 2:
+        screenshot = cv2.cvtColor(screenshot, cv2.COLOR_GRAY2BGR)
+
     best_max_val = -1.0
     best_result = None
     best_template_dims = (0, 0)
     best_scale_found = 1.0
 
-    for scale_adj in scales_to_test:
-        if is_custom_fuse_image(full_template_path):
-            effective_scale = scale_adj
-        else:
-            effective_scale = scale_factor * scale_adj
+    threshold = get_effective_threshold(template_path, threshold, scale_factor)
 
-        if effective_scale != 1.0:
-            curr_template = cv2.resize(original_template, None, fx=effective_scale, fy=effective_scale, interpolation=cv2.INTER_LINEAR)
-        else:
-            curr_template = original_template
-
-        if no_grayscale:
-            if len(screenshot.shape) == 2: screenshot = cv2.cvtColor(screenshot, cv2.COLOR_GRAY2BGR)
-            if len(curr_template.shape) == 2: curr_template = cv2.cvtColor(curr_template, cv2.COLOR_GRAY2BGR)
-        else:
-            if (grayscale or shared_vars.convert_images_to_grayscale):
-                if len(screenshot.shape) == 3: screenshot = cv2.cvtColor(screenshot, cv2.COLOR_BGR2GRAY)
-                if len(curr_template.shape) == 3: curr_template = cv2.cvtColor(curr_template, cv2.COLOR_BGR2GRAY)
+    gate_key = (template_path, threshold, color_flag, enable_scaling, x1, y1, x2, y2, full_screenshot.shape)
+    gated, gate_signature = _gate_check(gate_key, template_path, screenshot)
 
-        if curr_template.shape[0] > screenshot.shape[0] or curr_template.shape[1] > screenshot.shape[1]:
-            continue
-
-        res = cv2.matchTemplate(screenshot, curr_template, cv2.TM_CCOEFF_NORMED)
-        min_val, max_val, min_loc, max_loc = cv2.minMaxLoc(res)
-
-        if best_result is None or max_val > best_max_val:
-            best_max_val = max_val
-            best_result = res
-            best_template_dims = curr_template.shape[:2]
-            best_scale_found = scale_adj
+    pyramid = None
+    if shared_vars.pyramid_matching and not enable_scaling and not gated:
+        base_scale = 1.0 if is_custom_fuse_image(full_template_path) else scale_factor
+        pyramid = _pyramid_match(screenshot, full_template_path, color_flag, base_scale, threshold)
 
-    result = best_result
-    template_height, template_width = best_template_dims
+    if gated:
+        filtered_boxes, match_scores = [], []
+    elif pyramid is not None:
+        filtered_boxes, match_scores, best_max_val = pyramid
+    else:
+        best_max_val, best_result, best_template_dims, best_scale_found = _sweep_scales(
+            screenshot, full_template_path, color_flag, scale_factor, scales_to_test)
+        template_height, template_width = best_template_dims
+        filtered_boxes, match_scores = match_peaks(best_result, threshold, template_width, template_height)
+
+        if enable_scaling:
+            swept = len(scales_to_test) == len(scale_calibrator.FULL_SWEEP)
+            if not swept and len(filtered_boxes) == 0 and scale_calibrator.should_verify(template_path, scale_resolution):
+                # The calibrated neighbourhood missed; check the rest of the
+                # sweep in case the scale itself has moved
+                rest = [s for s in scale_calibrator.FULL_SWEEP if s not in scales_to_test]
+                sweep = _sweep_scales(screenshot, full_template_path, color_flag, scale_factor, rest)
+                if sweep[1] is not None and sweep[0] > best_max_val:
+                    best_max_val, best_result, best_template_dims, best_scale_found = sweep
+                    template_height, template_width = best_template_dims
+                    filtered_boxes, match_scores = match_peaks(best_result, threshold, template_width, template_height)
+                swept = True
+            scale_calibrator.observe(template_path, scale_resolution, best_scale_found, best_max_val,
+                                     len(filtered_boxes) > 0, swept)
+
+    if not gated:
+        _gate_store(gate_key, gate_signature, len(filtered_boxes) > 0)
 
     if enable_scaling and (debug or shared_vars.debug_image_matches):
         logger.debug(f"Multi-scale match for {os.path.basename(template_path)}: Best Scale={best_scale_found:.2f}, Confidence={best_max_val:.4f}", dirty=True)
-    
-    if scale_factor > 1.8:
-        threshold = threshold - 0.03
-    total_adjustment = get_total_threshold_adjustment(template_path)
-    threshold = threshold + total_adjustment
-    
-    locations = np.where(result >= threshold)
-    
-    boxes = []
-    match_scores = []
-    
-    for pt in zip(*locations[::-1]):
-        top_left = pt
-        bottom_right = (top_left[0] + template_width, top_left[1] + template_height)
-        boxes.append([top_left[0], top_left[1], bottom_right[0], bottom_right[1]])
-        match_scores.append(result[top_left[1], top_left[0]])
-    
-    boxes = np.array(boxes)
-    filtered_boxes = non_max_suppression_fast(boxes)
+
+    # Full frame when the region missed, and now and then when it hit, to
+    # catch copies of the template outside the region
+    if roi_region is not None and (roi_registry.should_fallback(template_path) if len(filtered_boxes) == 0
+                                   else roi_registry.should_verify(template_path)):
+        found = _base_match_template(template_path, base_threshold, grayscale, no_grayscale, debug, area, quiet_failure,
+                                     screenshot=full_screenshot, enable_scaling=enable_scaling, use_roi=False,
+                                     return_scores=return_scores)
+        if found and len(filtered_boxes) == 0:
+            roi_registry.drop(template_path)
+        return found
+    if learn_region:
+        _roi_learn(template_path, full_screenshot, filtered_boxes, crop_offset_x, crop_offset_y)
     
     if not quiet_failure:
         if logger.isEnabledFor(logging.DEBUG):
             caller_info = _get_caller_info()
-            highest_match_rate = result.max() if result.size > 0 else 0.0
+            highest_match_rate = max(best_max_val, 0.0)
             if len(filtered_boxes) > 0:
                 locations = []
                 for box in filtered_boxes:
@@ -713,7 +1234,8 @@ def _base_match_template(template_path, threshold=0.8, grayscale=False,no_graysc
                 locations_str = ", ".join(locations)
                 logger.debug(f"Match found: {template_path} | Confidence: {highest_match_rate:.4f} | File Exists: True | Locations: {locations_str} | Caller: {caller_info}", dirty=True)
             else:
-                logger.debug(f"Match not found: {template_path} | Confidence: {highest_match_rate:.4f} | File Exists: True | Caller: {caller_info}", dirty=True)
+                unchanged = " | Screen unchanged" if gated else ""
+                logger.debug(f"Match not found: {template_path} | Confidence: {highest_match_rate:.4f} | File Exists: True{unchanged} | Caller: {caller_info}", dirty=True)
     
     if (debug or shared_vars.debug_image_matches) and len(filtered_boxes) > 0:
         
@@ -766,7 +1288,101 @@ def _base_match_template(template_path, threshold=0.8, grayscale=False,no_graysc
                 2.0
             )
     
-    return _extract_coordinates(filtered_boxes, area, crop_offset_x, crop_offset_y)
+    coordinates = _extract_coordinates(filtered_boxes, area, crop_offset_x, crop_offset_y)
+    if _match_recorder is not None:
+        # Region grabs were cropped from the recorded whole frame
+        frame_shape = full_screenshot.shape if region_grab is None else (MONITOR_HEIGHT, MONITOR_WIDTH)
+        _record_query(template_path, {
+            "kind": "match", "threshold": base_threshold, "grayscale": grayscale, "no_grayscale": no_grayscale,
+            "area": area, "region": query_region, "enable_scaling": enable_scaling,
+        }, coordinates, best_max_val, match_started, frame_shape)
+    if return_scores:
+        return [(coord, float(score)) for coord, score in zip(coordinates, match_scores)]
+    return coordinates
+
+def _sweep_scales(screenshot, full_template_path, color_flag, scale_factor, scales):
+    # Returns (best score, best result map, (template height, width), best scale)
+    best_max_val = -1.0
+    best_result = None
+    best_template_dims = (0, 0)
+    best_scale_found = 1.0
+    for scale_adj in scales:
+        if is_custom_fuse_image(full_template_path):
+            effective_scale = scale_adj
+        else:
+            effective_scale = scale_factor * scale_adj
+
+        curr_template = _get_scaled_template(full_template_path, color_flag, effective_scale)
+        if curr_template is None:
+            continue
+
+        if curr_template.shape[0] > screenshot.shape[0] or curr_template.shape[1] > screenshot.shape[1]:
+            continue
+
+        res = cv2.matchTemplate(screenshot, curr_template, cv2.TM_CCOEFF_NORMED)
+        min_val, max_val, min_loc, max_loc = cv2.minMaxLoc(res)
+
+        if best_result is None or max_val > best_max_val:
+            best_max_val = max_val
+            best_result = res
+            best_template_dims = curr_template.shape[:2]
+            best_scale_found = scale_adj
+    return best_max_val, best_result, best_template_dims, best_scale_found
+
+def get_effective_threshold(template_path, threshold, scale_factor=None):
+    if scale_factor is None:
+        base_width, base_height = get_template_reference_resolution(resource_path(template_path))
+        scale_factor = min(EXPECTED_WIDTH / base_width, EXPECTED_HEIGHT / base_height)
+    if scale_factor > 1.8:
+        threshold = threshold - 0.03
+    return threshold + get_total_threshold_adjustment(template_path)
+
+def match_score(template_path, screenshot=None, x1=None, y1=None, x2=None, y2=None, grayscale=False, no_grayscale=False, record=True):
+    # Single-scale best score for a template; returns (score, box) with the
+    # box in full-frame coordinates, or (0.0, None). Grayscale frames are used
+    # as-is so batch callers can convert once. record=False is for callers
+    # that record the query themselves.
+    full_template_path = resource_path(template_path)
+    match_started = time.perf_counter()
+
+    use_grayscale = not no_grayscale and (grayscale or shared_vars.convert_images_to_grayscale)
+    if screenshot is None and x1 is not None and y1 is not None and x2 is not None and y2 is not None:
+        screenshot, crop_offset_x, crop_offset_y = _grab_region(x1, y1, x2, y2, grayscale=use_grayscale)
+        frame_shape = (MONITOR_HEIGHT, MONITOR_WIDTH)
+    else:
+        if screenshot is None:
+            screenshot = capture_screen()
+        frame_shape = screenshot.shape
+        screenshot, crop_offset_x, crop_offset_y = _crop_region(screenshot, x1, y1, x2, y2)
+
+    if use_grayscale:
+        screenshot = to_grayscale(screenshot)
+    elif not use_grayscale and len(screenshot.shape) == 2:
+        screenshot = cv2.cvtColor(screenshot, cv2.COLOR_GRAY2BGR)
+    color_flag = cv2.IMREAD_GRAYSCALE if use_grayscale else cv2.IMREAD_COLOR
+
+    if is_custom_fuse_image(full_template_path):
+        effective_scale = 1.0
+    else:
+        base_width, base_height = get_template_reference_resolution(full_template_path)
+        effective_scale = min(EXPECTED_WIDTH / base_width, EXPECTED_HEIGHT / base_height)
+
+    template = _get_scaled_template(full_template_path, color_flag, effective_scale)
+    if template is None:
+        return 0.0, None
+    template_height, template_width = template.shape[:2]
+    if template_height > screenshot.shape[0] or template_width > screenshot.shape[1]:
+        return 0.0, None
+
+    res = cv2.matchTemplate(screenshot, template, cv2.TM_CCOEFF_NORMED)
+    _, max_val, _, max_loc = cv2.minMaxLoc(res)
+    left = max_loc[0] + crop_offset_x
+    top = max_loc[1] + crop_offset_y
+    if record and _match_recorder is not None:
+        _record_query(template_path, {
+            "kind": "score", "grayscale": grayscale, "no_grayscale": no_grayscale, "region": (x1, y1, x2, y2),
+        }, [(left + template_width // 2, top + template_height // 2)], max_val, match_started, frame_shape)
+    return float(max_val), (left, top, left + template_width, top + template_height)
 
 def get_total_threshold_adjustment(template_path):
     config = shared_vars.image_threshold_config
@@ -803,6 +1419,9 @@ def match_image(template_path, threshold=0.8, area="center",mousegoto200=False,
         mouse_move(*scale_coordinates_1080p(200, 200))
     return _base_match_template(template_path, threshold, grayscale, no_grayscale, debug, area, quiet_failure, x1, y1, x2, y2, screenshot, enable_scaling=enable_scaling)
 
+def match_image_scored(template_path, threshold=0.8, area="center", grayscale=False, no_grayscale=False, debug=False, quiet_failure=False, x1=None, y1=None, x2=None, y2=None, screenshot=None, enable_scaling=False):
+    return _base_match_template(template_path, threshold, grayscale, no_grayscale, debug, area, quiet_failure, x1, y1, x2, y2, screenshot, enable_scaling=enable_scaling, return_scores=True)
+
 def greyscale_match_image(template_path, threshold=0.75, area="center", no_grayscale=False, debug=False, quiet_failure=False, x1=None, y1=None, x2=None, y2=None, screenshot=None):
     return _base_match_template(template_path, threshold, grayscale=True, no_grayscale=no_grayscale, debug=debug, area=area, quiet_failure=quiet_failure, x1=x1, y1=y1, x2=x2, y2=y2, screenshot=screenshot)
 
@@ -899,42 +1518,67 @@ def get_resolution(monitor_index=None):
     mon = get_monitor_info(monitor_index)
     return mon['width'], mon['height']
 
-def non_max_suppression_fast(boxes, overlapThresh=0.5):
-    if len(boxes) == 0:
-        return []
-
-    if boxes.dtype.kind == "i":
-        boxes = boxes.astype("float")
-
-    pick = []
-
+def _suppress(boxes, order, overlapThresh):
     x1 = boxes[:, 0]
     y1 = boxes[:, 1]
     x2 = boxes[:, 2]
     y2 = boxes[:, 3]
-
     area = (x2 - x1 + 1) * (y2 - y1 + 1)
-    idxs = np.argsort(y2)
 
-    while len(idxs) > 0:
-        last = len(idxs) - 1
-        i = idxs[last]
+    suppressed = np.zeros(len(order), dtype=bool)
+    pick = []
+    for pos in range(len(order)):
+        if suppressed[pos]:
+            continue
+        i = order[pos]
         pick.append(i)
+        rest = order[pos + 1:]
+        if rest.size == 0:
+            break
 
-        xx1 = np.maximum(x1[i], x1[idxs[:last]])
-        yy1 = np.maximum(y1[i], y1[idxs[:last]])
-        xx2 = np.minimum(x2[i], x2[idxs[:last]])
-        yy2 = np.minimum(y2[i], y2[idxs[:last]])
-
-        w = np.maximum(0, xx2 - xx1 + 1)
-        h = np.maximum(0, yy2 - yy1 + 1)
+        w = np.maximum(0, np.minimum(x2[i], x2[rest]) - np.maximum(x1[i], x1[rest]) + 1)
+        h = np.maximum(0, np.minimum(y2[i], y2[rest]) - np.maximum(y1[i], y1[rest]) + 1)
+        suppressed[pos + 1:] |= (w * h) / area[rest] > overlapThresh
+    return np.array(pick, dtype=int)
 
-        overlap = (w * h) / area[idxs[:last]]
+def non_max_suppression_fast(boxes, overlapThresh=0.5):
+    if len(boxes) == 0:
+        return []
 
-        idxs = np.delete(idxs, np.concatenate(([last], np.where(overlap > overlapThresh)[0])))
+    if boxes.dtype.kind == "i":
+        boxes = boxes.astype("float")
 
+    pick = _suppress(boxes, np.argsort(boxes[:, 3])[::-1], overlapThresh)
     return boxes[pick].astype("int")
 
+def nms_scored(boxes, scores, overlapThresh=0.5):
+    if len(boxes) == 0:
+        return np.empty((0, 4), dtype=int), np.empty(0, dtype=np.float32)
+
+    boxes = np.asarray(boxes, dtype=float)
+    scores = np.asarray(scores, dtype=np.float32)
+    pick = _suppress(boxes, np.argsort(-scores, kind="stable"), overlapThresh)
+    return boxes[pick].astype("int"), scores[pick]
+
+def match_peaks(result, threshold, template_width, template_height, overlapThresh=0.5):
+    # Local maxima of a matchTemplate response above threshold, NMS'd in
+    # score order. Points that are not the maximum of a quarter-template
+    # window would overlap a stronger neighbour by more than half anyway.
+    if result is None or result.size == 0:
+        return np.empty((0, 4), dtype=int), np.empty(0, dtype=np.float32)
+
+    mask = result >= threshold
+    if not mask.any():
+        return np.empty((0, 4), dtype=int), np.empty(0, dtype=np.float32)
+
+    kernel_w = max(3, (template_width // 4) | 1)
+    kernel_h = max(3, (template_height // 4) | 1)
+    dilated = cv2.dilate(result, np.ones((kernel_h, kernel_w), np.uint8))
+    ys, xs = np.nonzero(mask & (result >= dilated))
+    scores = result[ys, xs]
+    boxes = np.stack([xs, ys, xs + template_width, ys + template_height], axis=1)
+    return nms_scored(boxes, scores, overlapThresh)
+
 def get_aspect_ratio(monitor_index=None):
     width, height = get_resolution(monitor_index)
     if (width / 4) * 3 == height:
@@ -1033,9 +1677,10 @@ def wait_skip(img_path, threshold=0.8):
         click_matching(img_path, threshold)
         return
 
-    while not element_exist(img_path, threshold):
-        mouse_click()
-        mouse_click()
+    with idle_wait():
+        while not element_exist(img_path, threshold):
+            mouse_click()
+            mouse_click()
         
     click_matching(img_path, threshold)
 
@@ -1046,20 +1691,21 @@ def click_matching(image_path, threshold=0.8, area="center", mousegoto200=False,
         if not os.path.exists(full_path):
             return False
 
-    while True:
-        found = ifexist_match(image_path, threshold, area, mousegoto200, grayscale, no_grayscale, debug, x1, y1, x2, y2, screenshot, quiet_failure=quiet_failure, enable_scaling=enable_scaling)
-        if found:
-            x, y = found[0]
-            mouse_move_click(x, y, log_click=False)
-            delay = shared_vars.click_delay.value if hasattr(shared_vars.click_delay, 'value') else shared_vars.click_delay
-            time.sleep(delay)
-            return True
+    with idle_wait():
+        while True:
+            found = ifexist_match(image_path, threshold, area, mousegoto200, grayscale, no_grayscale, debug, x1, y1, x2, y2, screenshot, quiet_failure=quiet_failure, enable_scaling=enable_scaling)
+            if found:
+                x, y = found[0]
+                mouse_move_click(x, y, log_click=False)
+                delay = shared_vars.click_delay.value if hasattr(shared_vars.click_delay, 'value') else shared_vars.click_delay
+                time.sleep(delay)
+                return True
         
-        if not recursive:
-            return False
+            if not recursive:
+                return False
 
-        screenshot = None
-        time.sleep(0.05)
+            screenshot = None
+            time.sleep(0.05)
     
 def element_exist(img_path, threshold=0.8, area="center",mousegoto200=False, grayscale=False, no_grayscale=False, debug=False, quiet_failure=False, x1=None, y1=None, x2=None, y2=None, screenshot=None):
     result = match_image(img_path, threshold, area, mousegoto200, grayscale, no_grayscale, debug, quiet_failure, x1, y1, x2, y2, screenshot)
@@ -1102,8 +1748,9 @@ def squad_order(status):
 
 def luminence(x,y, screenshot=None):
     if screenshot is None:
-        screenshot = capture_screen()
-    pixel_image = screenshot[y, x]
+        pixel_image = capture_screen(region=(x, y, x + 1, y + 1))[0, 0]
+    else:
+        pixel_image = screenshot[y, x]
     coeff = (int(pixel_image[0]) + int(pixel_image[1]) + int(pixel_image[2])) / 3
     return coeff
 
@@ -1124,6 +1771,7 @@ def set_game_monitor(monitor_index):
     else:
         shared_vars.game_monitor = monitor_index
 
+    clear_template_store()
     detect_monitor_resolution()
     return shared_vars.game_monitor
 
@@ -6,34 +6,28 @@ import threading
 import json
 import time
 import subprocess
-import numpy as np
-from PIL import ImageGrab, Image
 import mirror
 import mirror_1366
 import common
+import ocr_service
+import frame_replay
+import stuck_detector
+import timeline
+import sampling_profiler
 
 _CAPTURE_HANG_LIMIT = 30
 _RUN_TIME_LIMIT = 5400
 
 def _run_watchdog(main_thread_id, run_start, stop_event):
-    config_dir = os.path.join(get_base_path(), "config")
-    screenshot_paths = [
-        os.path.join(config_dir, "macro_state_0.png"),
-        os.path.join(config_dir, "macro_state_1.png"),
-    ]
-    SCREENSHOT_INTERVAL = 60
-    STUCK_THRESHOLD = 5.0
-    last_screenshot = 0
-    screenshot_index = 0
-
-    while not stop_event.wait(5):
+    detector = stuck_detector.StuckScreenDetector()
+
+    while not stop_event.wait(detector.sample_interval):
         now = time.time()
 
-        last_capture = common._capture_heartbeat.get(main_thread_id, run_start)
-        capture_elapsed = now - last_capture
+        capture_elapsed = common.capture_age(main_thread_id, run_start)
         if capture_elapsed > _CAPTURE_HANG_LIMIT:
             logger.warning(f"Run watchdog: capture_screen hung for {capture_elapsed:.0f}s, resetting sct")
-            common.reset_sct(main_thread_id)
+            common.recover_capture(main_thread_id)
 
         run_elapsed = now - run_start
         if run_elapsed > _RUN_TIME_LIMIT:
@@ -44,39 +38,25 @@ def _run_watchdog(main_thread_id, run_start, stop_event):
             )
             break
 
-        if now - last_screenshot >= SCREENSHOT_INTERVAL:
-            try:
-                current_path = screenshot_paths[screenshot_index % 2]
-                prev_path = screenshot_paths[(screenshot_index - 1) % 2]
-                img = ImageGrab.grab()
-                img.save(current_path)
-                if screenshot_index > 0 and os.path.exists(prev_path):
-                    prev_img = Image.open(prev_path)
-                    curr_arr = np.array(img)
-                    prev_arr = np.array(prev_img)
-                    try:
-                        if curr_arr.shape == prev_arr.shape:
-                            diff = np.mean(np.abs(curr_arr.astype(np.int32) - prev_arr.astype(np.int32)))
-                            if diff < STUCK_THRESHOLD:
-                                logger.warning(f"Run watchdog: screen unchanged for {SCREENSHOT_INTERVAL}s (diff={diff:.2f}), injecting TimeoutError")
-                                ctypes.pythonapi.PyThreadState_SetAsyncExc(
-                                    ctypes.c_long(main_thread_id),
-                                    ctypes.py_object(TimeoutError)
-                                )
-                                break
-                    finally:
-                        del curr_arr, prev_arr
-                        prev_img.close()
-                screenshot_index += 1
-                last_screenshot = now
-            except Exception as e:
-                logger.warning(f"Run watchdog: screenshot check failed: {e}")
-            finally:
-                try:
-                    img.close()
-                    del img
-                except Exception:
-                    pass
+        # Reuse the newest frame the run itself captured instead of grabbing
+        # the screen again from this thread
+        try:
+            frame, captured_at = common.latest_frame()
+            stuck = detector.update(frame, captured_at)
+        except Exception as e:
+            logger.warning(f"Run watchdog: stuck screen check failed: {e}")
+            continue
+        if stuck:
+            diffs = ", ".join(f"{name}={diff:.2f}" for name, diff in detector.last_diffs.items())
+            logger.warning(f"Run watchdog: screen unchanged for {detector.static_for():.0f}s ({diffs}), injecting TimeoutError")
+            dumped = detector.dump(common.LOG_DIR)
+            if dumped:
+                logger.info(f"Run watchdog: stuck screen images saved to {dumped}_*.png")
+            ctypes.pythonapi.PyThreadState_SetAsyncExc(
+                ctypes.c_long(main_thread_id),
+                ctypes.py_object(TimeoutError)
+            )
+            break
 
 logger = None
 
@@ -205,9 +185,14 @@ def sync_shared_vars(shared_vars_instance):
             sv_module.reconnection_delay = shared_vars_instance.reconnection_delay.value
             sv_module.reconnect_when_internet_reachable = shared_vars_instance.reconnect_when_internet_reachable.value
             sv_module.good_pc_mode = shared_vars_instance.good_pc_mode.value
+            sv_module.pyramid_matching = shared_vars_instance.pyramid_matching.value
+            sv_module.capture_fps = shared_vars_instance.capture_fps.value
+            common.set_capture_fps(sv_module.capture_fps)
             sv_module.click_delay = shared_vars_instance.click_delay.value
             sv_module.stop_after_current_run = shared_vars_instance.stop_after_current_run.value
             sv_module.convert_enkephalin_to_modules = shared_vars_instance.convert_enkephalin_to_modules.value
+            sv_module.sampling_profiler = shared_vars_instance.sampling_profiler.value
+            sampling_profiler.set_enabled(sv_module.sampling_profiler, "mirror")
         except AttributeError:
             pass
         except Exception:
@@ -315,6 +300,7 @@ def mirror_dungeon_run(num_runs, status_list_file, connection_manager, shared_va
             try:
                 run_complete = 0
                 win_flag = 0
+                timeline.start_run("mirror")
                 MD = MirrorClass(status_list[i])
                 logger.info(f"Current Team: " + status_list[i])
                 MD.setup_mirror()
@@ -323,24 +309,29 @@ def mirror_dungeon_run(num_runs, status_list_file, connection_manager, shared_va
                     if connection_manager.connection_event.is_set():
                         win_flag, run_complete, run_stats = MD.mirror_loop()
                     else:
-                        connection_manager.connection_event.wait(timeout=30)
+                        with stuck_detector.expected_wait():
+                            connection_manager.connection_event.wait(timeout=30)
 
                     if element_exist("pictures/general/server_error.png"):
-                        connection_manager.handle_reconnection()
+                        with stuck_detector.expected_wait():
+                            connection_manager.handle_reconnection()
 
                 if win_flag == 1:
                     win_count += 1
                     logger.info(f"Run {i + 1} completed with a win")
                     update_stats(True, run_stats)
+                    timeline.end_run("Win")
                 else:
                     lose_count += 1
                     logger.info(f"Run {i + 1} completed with a loss")
                     update_stats(False, run_stats)
+                    timeline.end_run("Loss")
                 i += 1
 
             except Exception as e:
                 logger.exception(f"Error in run {i + 1}: {e}")
                 error_screenshot()
+                timeline.end_run("Error")
                 i += 1
             finally:
                 _stop_watchdog.set()
@@ -357,6 +348,8 @@ def main(num_runs, shared_vars):
         base_path, status_path = setup_paths_and_imports()
         
         logger.info(f"compiled_runner.py main function started with {num_runs} runs")
+        frame_replay.start_recording_from_env()
+        ocr_service.warm_up()
         
         status_list_file = load_status_list(status_path)
         
@@ -4,54 +4,58 @@ import logging
 import sys
 import common
 import shared_vars
+import wait_engine
+import stuck_detector
+import timeline
+from screen_classifier import ScreenClassifier
 
 logger = logging.getLogger(__name__)
 
+# The loading bars and the connecting label sit in the bottom-right corner
+_LOADING_STATES = ScreenClassifier([
+    ("loading", "pictures/general/loading.png", (960, 540, 1920, 1080)),
+    ("loading", "pictures/general/connecting.png", (960, 540, 1920, 1080)),
+    ("loading", "pictures/general/loading_icon.png"),
+])
+
+@timeline.phase("loading")
 def check_loading():
-    loading_images = [
-        "pictures/general/loading.png",
-        "pictures/general/connecting.png",
-        "pictures/general/loading_icon.png"
-    ]
-    
     timeout = 60
     start_time = time.time()
     
-    while True:
-        is_loading = False
-        for img in loading_images:
-            if common.element_exist(img, quiet_failure=True):
-                is_loading = True
+    with common.idle_wait():
+        while True:
+            if not _LOADING_STATES.classify():
                 break
-        
-        if not is_loading:
-            break
-            
-        if time.time() - start_time > timeout:
-            logger.warning("Loading check timed out")
-            break
-            
-        time.sleep(0.5)
+
+            if time.time() - start_time > timeout:
+                logger.warning("Loading check timed out")
+                break
+
+            time.sleep(0.5)
 
 def transition_loading():
     common.sleep(5)
 
+@timeline.phase("loading")
 def post_run_load():
-    while(not common.element_exist("pictures/general/module.png")):
-        common.sleep(1)
+    with common.idle_wait(), stuck_detector.expected_wait():
+        while(not common.element_exist("pictures/general/module.png")):
+            common.sleep(1)
 
 def reconnect():
-    while(common.element_exist("pictures/general/server_error.png")):
-        if shared_vars.reconnect_when_internet_reachable:
-            if common.check_internet_connection():
+    with stuck_detector.expected_wait():
+        while(common.element_exist("pictures/general/server_error.png")):
+            if shared_vars.reconnect_when_internet_reachable:
+                if common.check_internet_connection():
+                    common.click_matching("pictures/general/retry.png")
+                    common.mouse_move(*common.scale_coordinates_1080p(200,200))
+                else:
+                    common.sleep(1)
+            else:
+                common.sleep(shared_vars.reconnection_delay)
                 common.click_matching("pictures/general/retry.png")
                 common.mouse_move(*common.scale_coordinates_1080p(200,200))
-            else:
-                common.sleep(1)
-        else:
-            common.sleep(shared_vars.reconnection_delay)
-            common.click_matching("pictures/general/retry.png")
-            common.mouse_move(*common.scale_coordinates_1080p(200,200))
     if common.element_exist("pictures/general/no_op.png"):
         common.click_matching("pictures/general/close.png")
         logger.critical("COULD NOT RECONNECT TO THE SERVER. SHUTTING DOWN!")
@@ -85,11 +89,13 @@ def _skill_chain(bar_y):
     import cv2
     import numpy as np
 
-    shot = common.capture_screen()
-    h, w = shot.shape[:2]
-
     gx  = common.scale_x_1080p(60)
     g2x = common.scale_x_1080p(1490)
+    # The cursor heads for the bar start while the coin strip is read
+    approach = common.mouse_move_async(int(gx), int(bar_y))
+
+    shot = common.capture_screen()
+    h, w = shot.shape[:2]
     length = g2x - gx
     logger.debug(f"Skill chain: bar gx={gx} bar_y={bar_y} g2x={g2x} length={length}")
 
@@ -122,7 +128,7 @@ def _skill_chain(bar_y):
     sx     = gx + common.scale_x_1080p(75)
     step   = common.scale_x_1080p(115)
 
-    common.mouse_move(int(gx), int(bar_y))
+    approach.result()
     common.mouse_down()
     for i, is3 in enumerate(moves):
         common.mouse_move(int(sx + step * i + common.scale_x_1080p(68)), int(hi_y if is3 else lo_y))
@@ -132,6 +138,7 @@ def _skill_chain(bar_y):
     time.sleep(0.2)
     logger.info(f"Skill chain: {sum(moves)}/{skill_num} skill-3 slots chained")
 
+@timeline.phase("battle")
 def battle():
     logger.info("Starting battle loop")
     battle_finished = 0
@@ -143,7 +150,6 @@ def battle():
     last_action_time = time.time()
 
     main_thread_id = threading.current_thread().ident
-    last_capture_ok = [time.time()]
     watchdog_active = [True]
     CAPTURE_HANG_THRESHOLD = 30
 
@@ -152,10 +158,10 @@ def battle():
             time.sleep(5)
             if not watchdog_active[0]:
                 break
-            elapsed = time.time() - last_capture_ok[0]
+            elapsed = common.capture_age(main_thread_id, battle_start_time)
             if elapsed > CAPTURE_HANG_THRESHOLD:
                 logger.warning(f"Screen capture hung for {elapsed:.0f}s, forcing sct reset")
-                common.reset_sct(main_thread_id)
+                common.recover_capture(main_thread_id)
 
     wt = threading.Thread(target=_capture_watchdog, daemon=True)
     wt.start()
@@ -166,7 +172,6 @@ def battle():
                 logger.warning("Battle timed out (15 minutes). Forcing restart.")
                 return
 
-            last_capture_ok[0] = time.time()
             screenshot = common.capture_screen()
 
             if common.element_exist("pictures/general/server_error.png", screenshot=screenshot):
@@ -302,6 +307,7 @@ def battle():
     finally:
         watchdog_active[0] = False
 
+@timeline.phase("ego_check")
 def ego_check():
     logger.info("Starting ego check")
     if shared_vars.skip_ego_check:
@@ -419,8 +425,8 @@ def battle_check():
                 for i in range(5):
                     common.mouse_scroll(-1000)
             common.click_matching(option)
-            common.sleep(0.5)
-            if not common.element_exist("pictures/events/result.png",0.9):
+            if not wait_engine.wait_until(wait_engine.appears("pictures/events/result.png", threshold=0.9),
+                                          timeout=0.5, site="core.passive_result"):
                 continue
             else:
                 break
@@ -505,6 +511,7 @@ def battle_check():
 
     return 1
 
+@timeline.phase("event")
 def skill_check():
     logger.info("Handling Skill Check")
     check_images = [
@@ -549,8 +556,7 @@ def skill_check():
             common.wait_skip("pictures/events/continue.png")
 
     else:
-        common.sleep(1)
-        if common.element_exist("pictures/mirror/general/ego_gift_get.png"):
+        if wait_engine.wait_until(wait_engine.appears("pictures/mirror/general/ego_gift_get.png"), timeout=1, site="core.skill_check_gift"):
             common.click_matching("pictures/general/confirm_b.png")
 
 def refill_enkephalin():
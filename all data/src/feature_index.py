@@ -0,0 +1,231 @@
+import os
+import sys
+import hashlib
+import logging
+import threading
+
+import cv2
+import numpy as np
+import common
+import shared_vars
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------------------------------------------------------
+# Persistent ORB descriptor index for template folders
+# Keypoints and descriptors of every template in a folder are stored in one
+# .npz under config/features, keyed by a hash of each image file so an edited
+# or added template is re-described on the next load while the rest come
+# straight from disk. Lookups go through bit-sampling LSH tables over the
+# binary descriptors: one query with the crop's descriptors votes for every
+# template at once instead of brute-force matching each template in turn.
+#
+#   python feature_index.py [folder ...]    prebuild (default: pack floors)
+# ---------------------------------------------------------------------------
+
+INDEX_DIR = os.path.join(shared_vars.BASE_PATH, "config", "features")
+INDEX_VERSION = 1
+ORB_FEATURES = 500
+MAX_DISTANCE = 50
+
+_LSH_TABLES = 8
+_LSH_BITS = 14
+_LSH_SEED = 1337
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+_POSITIONS = [np.random.default_rng(_LSH_SEED + t).choice(256, _LSH_BITS, replace=False) for t in range(_LSH_TABLES)]
+_WEIGHTS = (1 << np.arange(_LSH_BITS)).astype(np.int64)
+
+_indexes = {}
+_lock = threading.Lock()
+
+def _hash_file(path):
+    with open(path, "rb") as f:
+        return hashlib.blake2b(f.read(), digest_size=12).hexdigest()
+
+def _lsh_keys(descriptors):
+    bits = np.unpackbits(descriptors, axis=1)
+    return [bits[:, positions].astype(np.int64) @ _WEIGHTS for positions in _POSITIONS]
+
+def _describe(orb, path):
+    image = cv2.imdecode(np.fromfile(path, dtype=np.uint8), cv2.IMREAD_GRAYSCALE)
+    if image is None:
+        return None
+    keypoints, descriptors = orb.detectAndCompute(image, None)
+    if descriptors is None:
+        descriptors = np.zeros((0, 32), dtype=np.uint8)
+    points = np.float32([kp.pt for kp in keypoints]).reshape(-1, 2)
+    return image.shape[:2], points, descriptors
+
+class FeatureIndex:
+    def __init__(self, image_dir):
+        self.image_dir = image_dir
+        self.names = []
+        self.sizes = {}
+        self.points = np.zeros((0, 2), dtype=np.float32)
+        self.descriptors = np.zeros((0, 32), dtype=np.uint8)
+        self.owners = np.zeros(0, dtype=np.int32)
+        self._tables = []
+
+    def cache_path(self):
+        key = self.image_dir.strip("/\\").replace("/", "_").replace("\\", "_")
+        return os.path.join(INDEX_DIR, f"{key}.npz")
+
+    def _load_cache(self):
+        path = self.cache_path()
+        if not os.path.exists(path):
+            return {}
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                if int(data["version"]) != INDEX_VERSION or int(data["orb_features"]) != ORB_FEATURES:
+                    return {}
+                entries = {}
+                offsets = np.concatenate(([0], np.cumsum(data["counts"])))
+                for i, name in enumerate(data["names"]):
+                    start, end = offsets[i], offsets[i + 1]
+                    entries[str(name)] = (str(data["hashes"][i]), tuple(int(v) for v in data["sizes"][i]),
+                                          data["points"][start:end], data["descriptors"][start:end])
+                return entries
+        except Exception as e:
+            logger.warning(f"Could not read feature index {path}, rebuilding: {e}")
+            return {}
+
+    def _save_cache(self, entries):
+        names = sorted(entries)
+        path = self.cache_path()
+        try:
+            os.makedirs(INDEX_DIR, exist_ok=True)
+            tmp_path = path + ".tmp"
+            with open(tmp_path, "wb") as f:
+                np.savez(f,
+                         version=np.int32(INDEX_VERSION),
+                         orb_features=np.int32(ORB_FEATURES),
+                         names=np.array(names, dtype=str),
+                         hashes=np.array([entries[n][0] for n in names], dtype=str),
+                         sizes=np.array([entries[n][1] for n in names], dtype=np.int32).reshape(-1, 2),
+                         counts=np.array([len(entries[n][3]) for n in names], dtype=np.int32),
+                         points=np.concatenate([entries[n][2] for n in names] or [np.zeros((0, 2), np.float32)]),
+                         descriptors=np.concatenate([entries[n][3] for n in names] or [np.zeros((0, 32), np.uint8)]))
+            os.replace(tmp_path, path)
+        except Exception as e:
+            logger.warning(f"Could not write feature index {path}: {e}")
+
+    def load(self):
+        full_dir = common.resource_path(self.image_dir)
+        files = sorted(f for f in os.listdir(full_dir) if f.endswith(".png")) if os.path.isdir(full_dir) else []
+        cached = self._load_cache()
+
+        entries = {}
+        described = 0
+        orb = None
+        for filename in files:
+            name = filename[:-4]
+            path = os.path.join(full_dir, filename)
+            digest = _hash_file(path)
+            entry = cached.get(name)
+            if entry is None or entry[0] != digest:
+                if orb is None:
+                    orb = cv2.ORB_create(nfeatures=ORB_FEATURES)
+                result = _describe(orb, path)
+                if result is None:
+                    logger.warning(f"Could not decode {path}, leaving it out of the feature index")
+                    continue
+                size, points, descriptors = result
+                entry = (digest, size, points, descriptors)
+                described += 1
+            entries[name] = entry
+
+        if described or set(entries) != set(cached):
+            self._save_cache(entries)
+        self._assemble(entries)
+        logger.debug(f"Feature index for {self.image_dir}: {len(self.names)} templates, "
+                     f"{len(self.descriptors)} descriptors ({described} re-described)")
+        return self
+
+    def _assemble(self, entries):
+        self.names = sorted(entries)
+        self.sizes = {name: entries[name][1] for name in self.names}
+        if not self.names:
+            return
+        self.points = np.concatenate([entries[n][2] for n in self.names]).astype(np.float32)
+        self.descriptors = np.ascontiguousarray(np.concatenate([entries[n][3] for n in self.names]), dtype=np.uint8)
+        self.owners = np.concatenate([np.full(len(entries[n][3]), i, dtype=np.int32) for i, n in enumerate(self.names)])
+
+        self._tables = []
+        if not len(self.descriptors):
+            return
+        for keys in _lsh_keys(self.descriptors):
+            order = np.argsort(keys, kind="stable")
+            unique_keys, starts = np.unique(keys[order], return_index=True)
+            ends = np.append(starts[1:], len(order))
+            self._tables.append({int(k): order[s:e] for k, s, e in zip(unique_keys, starts, ends)})
+
+    def query(self, descriptors, exclude=()):
+        # Returns {name: [(template_point, query_index), ...]}. Each query
+        # descriptor keeps its nearest indexed descriptor under MAX_DISTANCE,
+        # and each indexed descriptor keeps only its closest query, which
+        # stands in for the cross-check of a brute-force matcher.
+        if descriptors is None or not len(descriptors) or not self._tables:
+            return {}
+        allowed = np.array([name not in exclude for name in self.names], dtype=bool)
+        if not allowed.any():
+            return {}
+
+        query_keys = _lsh_keys(descriptors)
+        best_index = np.full(len(descriptors), -1, dtype=np.int64)
+        best_dist = np.full(len(descriptors), MAX_DISTANCE, dtype=np.int32)
+        for qi in range(len(descriptors)):
+            buckets = [table.get(int(keys[qi])) for table, keys in zip(self._tables, query_keys)]
+            buckets = [bucket for bucket in buckets if bucket is not None]
+            if not buckets:
+                continue
+            candidates = np.unique(np.concatenate(buckets))
+            candidates = candidates[allowed[self.owners[candidates]]]
+            if not candidates.size:
+                continue
+            distances = _POPCOUNT[np.bitwise_xor(self.descriptors[candidates], descriptors[qi])].sum(axis=1, dtype=np.int32)
+            j = int(distances.argmin())
+            if distances[j] < best_dist[qi]:
+                best_dist[qi] = distances[j]
+                best_index[qi] = candidates[j]
+
+        closest = {}
+        for qi in np.flatnonzero(best_index >= 0):
+            idx = int(best_index[qi])
+            if idx not in closest or best_dist[qi] < best_dist[closest[idx]]:
+                closest[idx] = int(qi)
+
+        votes = {}
+        for idx, qi in closest.items():
+            votes.setdefault(self.names[self.owners[idx]], []).append((self.points[idx], qi))
+        return votes
+
+def get_index(image_dir):
+    with _lock:
+        index = _indexes.get(image_dir)
+        if index is None:
+            index = FeatureIndex(image_dir).load()
+            _indexes[image_dir] = index
+        return index
+
+def clear():
+    with _lock:
+        _indexes.clear()
+
+def _default_folders():
+    folders = []
+    for root in ("pictures/mirror/packs", "pictures/1366/mirror/packs"):
+        full_root = common.resource_path(root)
+        if os.path.isdir(full_root):
+            folders.extend(f"{root}/{d}" for d in sorted(os.listdir(full_root))
+                           if os.path.isdir(os.path.join(full_root, d)))
+    return folders
+
+def main(argv=None):
+    folders = (argv if argv is not None else sys.argv[1:]) or _default_folders()
+    for folder in folders:
+        index = FeatureIndex(folder).load()
+        print(f"{folder}: {len(index.names)} templates, {len(index.descriptors)} descriptors -> {index.cache_path()}")
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
@@ -0,0 +1,354 @@
+import os
+import sys
+import json
+import time
+import queue
+import logging
+import atexit
+import argparse
+import threading
+import importlib
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------------------------------------------------------
+# Frame recorder, replay source and vision benchmark
+# A recording session is a folder holding frames/NNNNNN.png plus
+# queries.jsonl, one line per template query with its parameters, result and
+# latency: _base_match_template calls ("match"), bare match_score calls
+# ("score") and ScreenClassifier rows ("classify"). Replay feeds those frames back through
+# common.capture_screen so the mirror/battle code can run without the game;
+# the benchmark re-runs every recorded query and diffs it against the
+# recorded result.
+#
+#   WORKERBEE_RECORD_DIR=<dir>            record while a runner is active
+#   python frame_replay.py replay <dir> mirror_loop --status poise
+#   python frame_replay.py bench <dir> [--repeat N] [--pyramid]
+# ---------------------------------------------------------------------------
+
+RECORD_ENV = "WORKERBEE_RECORD_DIR"
+SCORE_TOLERANCE = 0.02
+
+# BaseException so the broad "except Exception" handlers in the bot code
+# cannot swallow the end of a recording
+class ReplayFinished(BaseException):
+    pass
+
+def _jsonable(value):
+    if isinstance(value, (list, tuple)):
+        return [_jsonable(v) for v in value]
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+class FrameRecorder:
+    def __init__(self, directory, max_frames=20000):
+        self.directory = directory
+        self.frames_dir = os.path.join(directory, "frames")
+        os.makedirs(self.frames_dir, exist_ok=True)
+        self.max_frames = max_frames
+        self.dropped = 0
+        self._next_frame = 0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._queue = queue.Queue(maxsize=32)
+        self._queries = open(os.path.join(directory, "queries.jsonl"), "a")
+        self._writer = threading.Thread(target=self._write_loop, name="FrameRecorder", daemon=True)
+        self._writer.start()
+
+    def on_frame(self, img):
+        with self._lock:
+            if self._next_frame >= self.max_frames:
+                self._local.frame = None
+                return
+            frame_id = self._next_frame
+            self._next_frame += 1
+        self._local.frame = frame_id
+        self._local.shape = img.shape
+        try:
+            self._queue.put_nowait(("frame", frame_id, img))
+        except queue.Full:
+            self.dropped += 1
+            self._local.frame = None
+
+    def frame_token(self):
+        # Lets a query running on another thread be attributed to the frame
+        # the calling thread captured
+        return getattr(self._local, "frame", None), getattr(self._local, "shape", None)
+
+    def on_match(self, template_path, params, coordinates, confidence, elapsed, screenshot_shape, frame_token=None):
+        frame_id, frame_shape = frame_token if frame_token is not None else self.frame_token()
+        if frame_id is not None and screenshot_shape[:2] != frame_shape[:2]:
+            frame_id = None
+        entry = {
+            "frame": frame_id,
+            "thread": threading.current_thread().name,
+            "time": time.time(),
+            "template": template_path,
+            "params": _jsonable(params),
+            "result": _jsonable(coordinates),
+            "confidence": round(float(confidence), 4),
+            "elapsed_ms": round(elapsed * 1000.0, 3),
+        }
+        # Runs on the bot thread, so a lagging writer costs the entry, not time
+        try:
+            self._queue.put_nowait(("query", None, entry))
+        except queue.Full:
+            self.dropped += 1
+
+    def _write_loop(self):
+        while True:
+            kind, frame_id, payload = self._queue.get()
+            if kind == "stop":
+                break
+            try:
+                if kind == "frame":
+                    ok, encoded = cv2.imencode(".png", payload)
+                    if ok:
+                        encoded.tofile(os.path.join(self.frames_dir, f"{frame_id:06d}.png"))
+                else:
+                    self._queries.write(json.dumps(payload) + "\n")
+            except Exception as e:
+                logger.warning(f"Frame recorder write failed: {e}")
+
+    def close(self):
+        self._queue.put(("stop", None, None))
+        self._writer.join(timeout=30)
+        self._queries.close()
+        if self.dropped:
+            logger.warning(f"Frame recorder dropped {self.dropped} entries (writer could not keep up)")
+
+def start_recording(directory):
+    import common
+    recorder = FrameRecorder(directory)
+    common.set_match_recorder(recorder)
+    logger.info(f"Recording frames and template queries to {directory}")
+    return recorder
+
+def start_recording_from_env():
+    directory = os.environ.get(RECORD_ENV)
+    if not directory:
+        return None
+    session = os.path.join(directory, time.strftime("%Y%m%d_%H%M%S"))
+    recorder = start_recording(session)
+    atexit.register(stop_recording, recorder)
+    return recorder
+
+def stop_recording(recorder):
+    import common
+    common.set_match_recorder(None)
+    if recorder is not None:
+        recorder.close()
+
+def _frame_paths(directory):
+    frames_dir = os.path.join(directory, "frames")
+    return {int(name[:-4]): os.path.join(frames_dir, name)
+            for name in os.listdir(frames_dir) if name.endswith(".png")}
+
+def _load_frame(path):
+    return cv2.imdecode(np.fromfile(path, dtype=np.uint8), cv2.IMREAD_COLOR)
+
+def load_queries(directory):
+    queries = []
+    with open(os.path.join(directory, "queries.jsonl"), "r") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                queries.append(json.loads(line))
+    return queries
+
+class ReplaySource:
+    def __init__(self, directory, loop=False):
+        paths = _frame_paths(directory)
+        self.paths = [paths[i] for i in sorted(paths)]
+        if not self.paths:
+            raise FileNotFoundError(f"No recorded frames in {directory}")
+        self.loop = loop
+        self.index = 0
+        self._lock = threading.Lock()
+
+    def frame_size(self):
+        frame = _load_frame(self.paths[0])
+        return frame.shape[1], frame.shape[0]
+
+    def next_frame(self):
+        with self._lock:
+            if self.index >= len(self.paths):
+                if not self.loop:
+                    raise ReplayFinished()
+                self.index = 0
+            path = self.paths[self.index]
+            self.index += 1
+        return _load_frame(path)
+
+def install_replay(directory, loop=False):
+    import common
+    source = ReplaySource(directory, loop=loop)
+    common.set_monitor_size(*source.frame_size())
+    common.set_frame_source(source)
+    return source
+
+def _resolve_target(target, status):
+    if target in ("mirror_loop", "pack_selection", "find_gifts"):
+        import mirror
+        instance = mirror.Mirror(status)
+        if target == "find_gifts":
+            return lambda: instance.find_gifts([status])
+        return getattr(instance, target)
+    if target == "battle":
+        import core
+        return core.battle
+    module_name, _, function_name = target.rpartition(".")
+    return getattr(importlib.import_module(module_name), function_name)
+
+def replay(directory, target, status="poise", max_calls=None):
+    source = install_replay(directory)
+    function = _resolve_target(target, status)
+    calls = 0
+    started = time.perf_counter()
+    try:
+        while max_calls is None or calls < max_calls:
+            result = function()
+            calls += 1
+            logger.info(f"Replay {target} call {calls} (frame {source.index}/{len(source.paths)}): {result}")
+    except ReplayFinished:
+        pass
+    elapsed = time.perf_counter() - started
+    logger.info(f"Replay finished: {calls} calls over {source.index} frames in {elapsed:.2f}s")
+    return calls
+
+def _percentile(values, pct):
+    if not values:
+        return 0.0
+    return float(np.percentile(values, pct))
+
+def _rerun(common, query, frame):
+    # Re-runs one recorded query the way it was made; the result is truthy
+    # when it should count as a hit
+    params = query["params"]
+    x1, y1, x2, y2 = params["region"]
+    kind = params.get("kind", "match")
+    if kind == "match":
+        return common.match_image(query["template"], params["threshold"], area=params["area"],
+                                  grayscale=params["grayscale"], no_grayscale=params["no_grayscale"],
+                                  quiet_failure=True, x1=x1, y1=y1, x2=x2, y2=y2, screenshot=frame,
+                                  enable_scaling=params["enable_scaling"])
+    if kind == "classify":
+        score, box = common.match_score(query["template"], screenshot=frame, x1=x1, y1=y1, x2=x2, y2=y2,
+                                        grayscale=params["grayscale"], no_grayscale=not params["grayscale"],
+                                        record=False)
+        return box is not None and score >= params["threshold"]
+    # A bare score has no threshold of its own; count it as the same answer
+    # while it stays within SCORE_TOLERANCE of the recorded one
+    score, box = common.match_score(query["template"], screenshot=frame, x1=x1, y1=y1, x2=x2, y2=y2,
+                                    grayscale=params["grayscale"], no_grayscale=params["no_grayscale"],
+                                    record=False)
+    return box is not None and abs(score - query["confidence"]) <= SCORE_TOLERANCE
+
+def benchmark(directory, repeat=1, cache_frames=8, pyramid=False):
+    import common
+    import roi_registry
+    import shared_vars
+
+    # Re-running recorded queries must not feed the learned regions
+    roi_registry.set_learning(False)
+    # Recorded results come from the full-resolution path, so a --pyramid
+    # run doubles as the accuracy parity check for the coarse-to-fine mode
+    shared_vars.pyramid_matching = pyramid
+
+    queries = [q for q in load_queries(directory) if q.get("frame") is not None]
+    paths = _frame_paths(directory)
+    queries = [q for q in queries if q["frame"] in paths]
+    if not queries:
+        raise ValueError(f"No replayable queries in {directory}")
+
+    first_frame = _load_frame(paths[queries[0]["frame"]])
+    common.set_monitor_size(first_frame.shape[1], first_frame.shape[0])
+
+    frames = OrderedDict()
+    per_template = {}
+    per_frame_cpu = {}
+    mismatches = []
+
+    for _ in range(repeat):
+        for query in queries:
+            frame_id = query["frame"]
+            frame = frames.get(frame_id)
+            if frame is None:
+                frame = _load_frame(paths[frame_id])
+                frames[frame_id] = frame
+                if len(frames) > cache_frames:
+                    frames.popitem(last=False)
+
+            wall_start = time.perf_counter()
+            cpu_start = time.process_time()
+            result = _rerun(common, query, frame)
+            cpu = time.process_time() - cpu_start
+            wall = time.perf_counter() - wall_start
+
+            stats = per_template.setdefault(query["template"], {"wall": [], "recorded": [], "mismatch": 0})
+            stats["wall"].append(wall * 1000.0)
+            stats["recorded"].append(query["elapsed_ms"])
+            per_frame_cpu[frame_id] = per_frame_cpu.get(frame_id, 0.0) + cpu
+
+            if bool(result) != bool(query["result"]):
+                stats["mismatch"] += 1
+                mismatches.append((frame_id, query["template"], bool(query["result"]), bool(result)))
+
+    frame_cpu = [v * 1000.0 / repeat for v in per_frame_cpu.values()]
+    return {
+        "queries": len(queries),
+        "frames": len(per_frame_cpu),
+        "templates": {
+            template: {
+                "calls": len(stats["wall"]),
+                "p50_ms": _percentile(stats["wall"], 50),
+                "p95_ms": _percentile(stats["wall"], 95),
+                "recorded_p50_ms": _percentile(stats["recorded"], 50),
+                "mismatches": stats["mismatch"],
+            }
+            for template, stats in per_template.items()
+        },
+        "cpu_per_frame_ms": {"mean": float(np.mean(frame_cpu)), "p95": _percentile(frame_cpu, 95)},
+        "mismatches": mismatches,
+    }
+
+def print_report(report, top=25):
+    print(f"{report['queries']} queries over {report['frames']} frames")
+    print(f"CPU per frame: mean {report['cpu_per_frame_ms']['mean']:.2f} ms, p95 {report['cpu_per_frame_ms']['p95']:.2f} ms")
+    print(f"{'template':60} {'calls':>6} {'p50':>8} {'p95':>8} {'rec p50':>8} {'diff':>5}")
+    rows = sorted(report["templates"].items(), key=lambda item: item[1]["p50_ms"] * item[1]["calls"], reverse=True)
+    for template, stats in rows[:top]:
+        print(f"{template[-60:]:60} {stats['calls']:>6} {stats['p50_ms']:>8.2f} {stats['p95_ms']:>8.2f} "
+              f"{stats['recorded_p50_ms']:>8.2f} {stats['mismatches']:>5}")
+    for frame_id, template, recorded, replayed in report["mismatches"][:top]:
+        print(f"  frame {frame_id}: {template} recorded={'hit' if recorded else 'miss'} replayed={'hit' if replayed else 'miss'}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay recorded frames and benchmark template matching")
+    sub = parser.add_subparsers(dest="command", required=True)
+    replay_parser = sub.add_parser("replay")
+    replay_parser.add_argument("session")
+    replay_parser.add_argument("target", help="mirror_loop, pack_selection, find_gifts, battle or module.function")
+    replay_parser.add_argument("--status", default="poise")
+    replay_parser.add_argument("--max-calls", type=int, default=None)
+    bench_parser = sub.add_parser("bench")
+    bench_parser.add_argument("session")
+    bench_parser.add_argument("--repeat", type=int, default=1)
+    bench_parser.add_argument("--top", type=int, default=25)
+    bench_parser.add_argument("--pyramid", action="store_true", help="use coarse-to-fine matching")
+    args = parser.parse_args(argv)
+
+    if args.command == "replay":
+        replay(args.session, args.target, args.status, args.max_calls)
+    else:
+        print_report(benchmark(args.session, args.repeat, pyramid=args.pyramid), args.top)
+
+if __name__ == "__main__":
+    os.environ.setdefault("WORKERBEE_DRY_INPUT", "1")
+    sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+    main()
@@ -0,0 +1,186 @@
+import os
+import hashlib
+import logging
+import threading
+
+import cv2
+import numpy as np
+import common
+import shared_vars
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------------------------------------------------------
+# Glyph recognizer for the game's digit font
+# Cheap stand-in for EasyOCR where only a few digits have to be read. Floor
+# numbers are spotted with the floorN.png glyphs shipped in pictures/. Other
+# digit sets are segmented into connected components and compared against
+# glyphs harvested from confident EasyOCR reads, stored under config/glyphs.
+# Callers fall back to EasyOCR whenever the confidence is low.
+# ---------------------------------------------------------------------------
+
+GLYPH_DIR = os.path.join(shared_vars.BASE_PATH, "config", "glyphs")
+GLYPH_SIZE = (20, 28)
+MIN_CONFIDENCE = 0.8
+
+_FLOOR_GLYPHS = [(i, f"pictures/mirror/packs/floor{i}.png") for i in range(1, 6)]
+_FLOOR_BAND = (0, 110, 1920, 220)
+_FLOOR_MARGIN = 0.08
+
+def read_floor(screen):
+    x1, y1, x2, y2 = _FLOOR_BAND
+    x1, y1 = common.scale_coordinates_1080p(x1, y1)
+    x2, y2 = common.scale_coordinates_1080p(x2, y2)
+
+    scores = []
+    for floor_num, template_path in _FLOOR_GLYPHS:
+        score, _ = common.match_score(template_path, screenshot=screen, x1=x1, y1=y1, x2=x2, y2=y2, no_grayscale=True)
+        scores.append((score, floor_num))
+    scores.sort(reverse=True)
+
+    best_score, best_floor = scores[0]
+    if best_score - scores[1][0] < _FLOOR_MARGIN:
+        return None, 0.0
+    return best_floor, best_score
+
+def _binarize(image):
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if len(image.shape) == 3 else image
+    _, binary = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    if cv2.countNonZero(binary) > binary.size // 2:
+        binary = cv2.bitwise_not(binary)
+    return binary
+
+def _normalize(binary):
+    return cv2.resize(binary, GLYPH_SIZE, interpolation=cv2.INTER_AREA)
+
+def _compare(glyph, sample):
+    score = cv2.matchTemplate(glyph, sample, cv2.TM_CCOEFF_NORMED)[0][0]
+    return 0.0 if np.isnan(score) else float(score)
+
+class GlyphReader:
+    def __init__(self, name, charset="0123456789", min_height_ratio=0.15, max_per_char=8):
+        self.name = name
+        self.charset = charset
+        self.min_height_ratio = min_height_ratio
+        self.max_per_char = max_per_char
+        self.directory = os.path.join(GLYPH_DIR, name)
+        self.glyphs = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        if self.glyphs is not None:
+            return
+        self.glyphs = []
+        if not os.path.isdir(self.directory):
+            return
+        for filename in sorted(os.listdir(self.directory)):
+            if not filename.endswith(".png") or filename[0] not in self.charset:
+                continue
+            raw = np.fromfile(os.path.join(self.directory, filename), dtype=np.uint8)
+            sample = cv2.imdecode(raw, cv2.IMREAD_GRAYSCALE)
+            if sample is not None and sample.shape[::-1] == GLYPH_SIZE:
+                self.glyphs.append((filename[0], sample))
+        logger.debug(f"Loaded {len(self.glyphs)} glyphs for {self.name}")
+
+    def ready(self):
+        with self._lock:
+            self._load()
+            known = {char for char, _ in self.glyphs}
+        return all(char in known for char in self.charset)
+
+    def segment(self, image):
+        binary = _binarize(image)
+        count, _, stats, _ = cv2.connectedComponentsWithStats(binary, connectivity=8)
+        min_height = max(4, int(binary.shape[0] * self.min_height_ratio))
+
+        boxes = []
+        for i in range(1, count):
+            x, y, w, h, area = stats[i]
+            if h < min_height or w > h * 1.2 or area < 8:
+                continue
+            boxes.append([x, y, x + w, y + h])
+        boxes.sort()
+
+        merged = []
+        for box in boxes:
+            if merged and box[0] < merged[-1][2] - 1:
+                last = merged[-1]
+                merged[-1] = [min(last[0], box[0]), min(last[1], box[1]), max(last[2], box[2]), max(last[3], box[3])]
+            else:
+                merged.append(box)
+        return [(box, _normalize(binary[box[1]:box[3], box[0]:box[2]])) for box in merged]
+
+    def _classify(self, glyph):
+        best_char, best_score = None, 0.0
+        for char, sample in self.glyphs:
+            score = _compare(glyph, sample)
+            if score > best_score:
+                best_char, best_score = char, score
+        return best_char, best_score
+
+    def read(self, image):
+        with self._lock:
+            self._load()
+            if not self.glyphs:
+                return "", 0.0
+
+            tokens = []
+            scores = []
+            current = ""
+            last_right = None
+            rejected = False
+            for box, glyph in self.segment(image):
+                char, score = self._classify(glyph)
+                if char is None or score < MIN_CONFIDENCE:
+                    if current:
+                        tokens.append(current)
+                    current = ""
+                    rejected = True
+                    last_right = box[2]
+                    continue
+                gap = box[0] - last_right if last_right is not None else 0
+                if gap > (box[3] - box[1]) and current:
+                    tokens.append(current)
+                    current = ""
+                current += char
+                scores.append(score)
+                last_right = box[2]
+            if current:
+                tokens.append(current)
+
+        # A glyph we have no confident sample for would silently drop out of
+        # the text ("07" reading as "0"), so any rejected segment fails the
+        # whole read and the caller falls back to EasyOCR, which harvests it
+        text = " ".join(tokens)
+        if rejected or not tokens:
+            return text, 0.0
+        return text, min(scores)
+
+    def learn(self, image, text):
+        segments = self.segment(image)
+        if len(segments) != len(text) or any(char not in self.charset for char in text):
+            return 0
+        learned = 0
+        with self._lock:
+            self._load()
+            for char, (_, glyph) in zip(text, segments):
+                samples = [sample for known, sample in self.glyphs if known == char]
+                if len(samples) >= self.max_per_char:
+                    continue
+                if any(_compare(glyph, sample) >= 0.95 for sample in samples):
+                    continue
+                try:
+                    os.makedirs(self.directory, exist_ok=True)
+                    digest = hashlib.blake2b(glyph.tobytes(), digest_size=6).hexdigest()
+                    ok, encoded = cv2.imencode(".png", glyph)
+                    if ok:
+                        encoded.tofile(os.path.join(self.directory, f"{char}_{digest}.png"))
+                        self.glyphs.append((char, glyph))
+                        learned += 1
+                except Exception as e:
+                    logger.warning(f"Could not store glyph for {self.name}: {e}")
+        if learned:
+            logger.debug(f"Learned {learned} new glyphs for {self.name} from '{text}'")
+        return learned
+
+EXP_STAGE = GlyphReader("exp_stage")
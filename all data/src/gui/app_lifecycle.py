@@ -33,6 +33,9 @@ def load_preferences(config, shared_vars):
     if "reconnection_delay" in settings: shared_vars.reconnection_delay.value = int(settings["reconnection_delay"])
     if "reconnect_when_internet_reachable" in settings: shared_vars.reconnect_when_internet_reachable.value = bool(settings["reconnect_when_internet_reachable"])
     if "good_pc_mode" in settings: shared_vars.good_pc_mode.value = bool(settings["good_pc_mode"])
+    if "pyramid_matching" in settings: shared_vars.pyramid_matching.value = bool(settings["pyramid_matching"])
+    if "sampling_profiler" in settings: shared_vars.sampling_profiler.value = bool(settings["sampling_profiler"])
+    if "capture_fps" in settings: shared_vars.capture_fps.value = int(settings["capture_fps"])
     if "click_delay" in settings: shared_vars.click_delay.value = float(settings["click_delay"])
     if "retry_count" in settings: shared_vars.retry_count.value = int(settings["retry_count"])
     if "pack_refreshes" in settings: shared_vars.pack_refreshes.value = int(settings["pack_refreshes"])
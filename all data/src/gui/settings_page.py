@@ -451,6 +451,7 @@ def _setup_misc_settings(parent, shared_vars, save_callback, config, base_path):
         ctk.CTkCheckBox(frame, text=label, variable=var, command=cmd).pack(anchor="w", pady=5)
         
     add_bool("Debug Image Matches", "debug_image_matches")
+    add_bool("Sampling Profiler (Writes to logs/)", "sampling_profiler")
     add_bool("Convert to Grayscale (Speed Boost)", "convert_images_to_grayscale")
     add_bool("Reconnect only when Internet Reachable", "reconnect_when_internet_reachable")
     add_bool("Enable Animations", "enable_animations")
@@ -533,6 +534,23 @@ def _setup_misc_settings(parent, shared_vars, save_callback, config, base_path):
         except: pass
     click_entry.bind("<FocusOut>", save_click)
 
+    row3 = ctk.CTkFrame(frame, fg_color="transparent")
+    row3.pack(fill="x", pady=5)
+    ctk.CTkLabel(row3, text="Background Capture FPS (0 = off):", width=200, anchor="w").pack(side="left")
+    fps_entry = ModernEntry(row3, width=80)
+    fps_entry.pack(side="left")
+    fps_entry.insert(0, str(shared_vars.capture_fps.value))
+
+    def save_fps(e=None):
+        try:
+            val = int(fps_entry.get())
+            if val < 0: val = 0
+            if val > 60: val = 60
+            shared_vars.capture_fps.value = val
+            save_callback()
+        except: pass
+    fps_entry.bind("<FocusOut>", save_fps)
+
 def _setup_image_thresholds(parent, base_path):
     card = CardFrame(parent)
     card.pack(fill="x", pady=10, padx=10)
@@ -721,6 +739,7 @@ def _setup_automation_settings(parent, shared_vars, save_callback):
         
     add_bool("Skip using EGO in Battle", "skip_ego_check")
     add_bool("Good PC Mode (Faster Transitions)", "good_pc_mode")
+    add_bool("Pyramid Matching (Lower CPU on Large Monitors)", "pyramid_matching")
 
 def _setup_shortcuts(parent, config, save_callback, root, update_callback):
     card = CardFrame(parent)
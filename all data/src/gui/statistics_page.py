@@ -6,6 +6,30 @@ from src.gui.styles import UIStyle
 from src.gui.components import CardFrame
 from src.gui.utils import load_json_data
 
+PHASE_LABELS = {
+    "setup": "Setup",
+    "pack_selection": "Pack Selection",
+    "navigation": "Navigation",
+    "squad_select": "Squad Select",
+    "battle": "Battle",
+    "ego_check": "EGO Check",
+    "event": "Events",
+    "rewards": "Rewards",
+    "rest_shop": "Rest Shop",
+    "fusion": "Fusion",
+    "enhancement": "Enhancement",
+    "loading": "Loading",
+    "lux_navigation": "Luxcavation Navigation",
+    "run_end": "Run End",
+    "other": "Other",
+}
+
+PHASE_KINDS = [("mirror", "Mirror Dungeon"), ("exp", "Exp"), ("threads", "Threads")]
+
+def _format_seconds(seconds):
+    mins, secs = divmod(int(seconds), 60)
+    return f"{mins}:{secs:02d}"
+
 def load_statistics_tab(parent, base_path):
     """Load and render the statistics tab"""
     for widget in parent.winfo_children():
@@ -13,10 +37,11 @@ def load_statistics_tab(parent, base_path):
     
     stats_path = os.path.join(base_path, "config", "stats.json")
     data = load_json_data(stats_path)
+    timeline_data = load_json_data(os.path.join(base_path, "config", "timeline_stats.json"))
 
     if hasattr(parent, 'ui_cache') and parent.ui_cache:
         try:
-            update_statistics_ui(parent.ui_cache, data)
+            update_statistics_ui(parent.ui_cache, data, timeline_data)
             return
         except Exception:
             del parent.ui_cache
@@ -56,6 +81,14 @@ def load_statistics_tab(parent, base_path):
     ui_cache['thread_runs'] = ctk.CTkLabel(lux_grid, text="", font=UIStyle.BODY_FONT)
     ui_cache['thread_runs'].pack(side="left", expand=True)
 
+    phase_card = CardFrame(scroll_frame)
+    phase_card.pack(fill="x", padx=10, pady=10)
+    ctk.CTkLabel(phase_card, text="Time per Phase", font=UIStyle.SUBHEADER_FONT).pack(pady=10, padx=15, anchor="w")
+
+    phase_frame = ctk.CTkFrame(phase_card, fg_color="transparent")
+    phase_frame.pack(fill="x", padx=15, pady=(0, 15))
+    ui_cache['phase_frame'] = phase_frame
+
     hist_card = CardFrame(scroll_frame)
     hist_card.pack(fill="x", padx=10, pady=10)
     ctk.CTkLabel(hist_card, text="Recent Runs", font=UIStyle.SUBHEADER_FONT).pack(pady=10, padx=15, anchor="w")
@@ -72,12 +105,50 @@ def load_statistics_tab(parent, base_path):
     ctk.CTkButton(scroll_frame, text="Refresh Stats", command=refresh, height=UIStyle.BUTTON_HEIGHT, font=UIStyle.BODY_FONT).pack(pady=20)
 
     try:
-        update_statistics_ui(ui_cache, data)
+        update_statistics_ui(ui_cache, data, timeline_data)
         parent.ui_cache = ui_cache
     except Exception as e:
         ctk.CTkLabel(scroll_frame, text=f"Error loading stats: {e}", text_color="red").pack()
 
-def update_statistics_ui(ui_cache, data):
+def update_phase_ui(phase_frame, timeline_data):
+    for widget in phase_frame.winfo_children():
+        widget.destroy()
+
+    shown = False
+    for kind, title in PHASE_KINDS:
+        stats = timeline_data.get(kind, {})
+        phases = stats.get("phases", {})
+        if not phases:
+            continue
+        shown = True
+
+        duration = stats.get("duration", {})
+        summary = (f"{title} | last {len(stats.get('recent', []))} runs | "
+                   f"median {_format_seconds(duration.get('p50', 0))} | p90 {_format_seconds(duration.get('p90', 0))}")
+        ctk.CTkLabel(phase_frame, text=summary, font=UIStyle.BODY_FONT, anchor="w").pack(fill="x", pady=(6, 2))
+
+        table = ctk.CTkFrame(phase_frame, fg_color="#252525", corner_radius=6)
+        table.pack(fill="x", pady=(0, 6))
+        for col, heading in enumerate(("Phase", "Median", "P90", "Share")):
+            table.grid_columnconfigure(col, weight=1)
+            ctk.CTkLabel(table, text=heading, font=(UIStyle.FONT_FAMILY, 11, "bold"), text_color="gray").grid(row=0, column=col, sticky="w", padx=10, pady=(6, 2))
+
+        ordered = sorted(phases.items(), key=lambda item: item[1].get("share", 0), reverse=True)
+        for row, (name, entry) in enumerate(ordered, start=1):
+            cells = (
+                PHASE_LABELS.get(name, name.replace("_", " ").title()),
+                _format_seconds(entry.get("p50", 0)),
+                _format_seconds(entry.get("p90", 0)),
+                f"{entry.get('share', 0) * 100:.1f}%",
+            )
+            for col, text in enumerate(cells):
+                ctk.CTkLabel(table, text=text, font=UIStyle.SMALL_FONT, text_color="#e0e0e0").grid(row=row, column=col, sticky="w", padx=10, pady=1)
+
+    if not shown:
+        ctk.CTkLabel(phase_frame, text="No phase timings yet, they are recorded from the next run on.",
+                     font=UIStyle.SMALL_FONT, text_color="gray", anchor="w").pack(fill="x")
+
+def update_statistics_ui(ui_cache, data, timeline_data=None):
     md_stats = data.get("mirror", {})
     runs = md_stats.get("runs", 0)
     wins = md_stats.get("wins", 0)
@@ -95,6 +166,8 @@ def update_statistics_ui(ui_cache, data):
     ui_cache['exp_runs'].configure(text=f"Exp Runs: {data.get('exp', {}).get('runs', 0)}")
     ui_cache['thread_runs'].configure(text=f"Thread Runs: {data.get('threads', {}).get('runs', 0)}")
 
+    update_phase_ui(ui_cache['phase_frame'], timeline_data or {})
+
     if "history" in md_stats and md_stats["history"]:
         history_frame = ui_cache['history_frame']
         for widget in history_frame.winfo_children():
@@ -0,0 +1,90 @@
+import queue
+import logging
+import threading
+from concurrent.futures import Future
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------------------------------------------------------
+# Input executor
+# One thread plays every mouse and keyboard command in submission order, so a
+# humanized move no longer blocks the automation thread while the cursor
+# travels. submit() returns a Future: callers can start a move, capture and
+# analyze the next frame meanwhile, and call .result() only when the input
+# has to have landed. Commands submitted from inside a running command (a
+# queued sequence calling common.mouse_down, say) run inline so they keep
+# their place in the sequence instead of deadlocking behind it.
+# ---------------------------------------------------------------------------
+
+class InputExecutor:
+    def __init__(self):
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._completed = 0
+
+    def _ensure_started(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="InputExecutor", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            future, fn, args, kwargs = self._queue.get()
+            self._execute(future, fn, args, kwargs)
+
+    def _execute(self, future, fn, args, kwargs):
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            future.set_result(fn(*args, **kwargs))
+        except BaseException as e:
+            logger.debug(f"Input command {getattr(fn, '__name__', fn)} failed: {e}")
+            future.set_exception(e)
+        finally:
+            with self._lock:
+                self._completed += 1
+
+    def in_worker(self):
+        return threading.current_thread() is self._thread
+
+    def submit(self, fn, *args, **kwargs):
+        future = Future()
+        if self.in_worker():
+            self._execute(future, fn, args, kwargs)
+            return future
+        self._ensure_started()
+        self._queue.put((future, fn, args, kwargs))
+        return future
+
+    def pending(self):
+        return self._queue.qsize()
+
+    def completed(self):
+        # Bumped after every command, so a frame grabbed before an input
+        # finished can be told apart from one grabbed after
+        return self._completed
+
+    def drain(self, timeout=None):
+        # Waits until every command submitted so far has been played
+        self.submit(lambda: None).result(timeout)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = InputExecutor()
+        return _executor
+
+def submit(fn, *args, **kwargs):
+    return get_executor().submit(fn, *args, **kwargs)
+
+def drain(timeout=None):
+    get_executor().drain(timeout)
+
+def completed():
+    return get_executor().completed()
@@ -10,22 +10,26 @@ import signal
 import mirror
 import mirror_utils
 import shared_vars
-
-_ocr_reader = None
-
-def _get_ocr():
-    global _ocr_reader
-    if _ocr_reader is None:
-        logger = logging.getLogger(__name__)
-        logger.info("Loading EasyOCR model (first use, may take a moment)...")
-        try:
-            import easyocr as _easyocr
-            _ocr_reader = _easyocr.Reader(['en'], gpu=False, verbose=False)
-            logger.info("EasyOCR model loaded")
-        except Exception as e:
-            import traceback
-            logger.error(f"Failed to load OCR: {e}\n{traceback.format_exc()}")
-    return _ocr_reader
+import ocr_service
+import glyph_reader
+import wait_engine
+import timeline
+
+def _read_stage_label(crop):
+    label, confidence = glyph_reader.EXP_STAGE.read(crop)
+    if confidence >= glyph_reader.MIN_CONFIDENCE:
+        return label
+
+    if not ocr_service.available():
+        return None
+    results = ocr_service.read_boxes(crop)
+    for bbox, text, conf in results:
+        text = text.strip()
+        if text.isdigit() and conf >= 0.9:
+            xs = [int(point[0]) for point in bbox]
+            ys = [int(point[1]) for point in bbox]
+            glyph_reader.EXP_STAGE.learn(crop[max(0, min(ys)):max(ys), max(0, min(xs)):max(xs)], text)
+    return " ".join(text for _, text, _ in results)
 
 def get_base_path():
     if getattr(sys, 'frozen', False):
@@ -129,6 +133,7 @@ def click_matching_EXP(image_path, threshold=0.8, area="center",
     logger.warning(f"All attempts to find {os.path.basename(image_path)} failed")
     return False
 
+@timeline.phase("rewards")
 def click_continue():
     start_time = time.time()
 
@@ -155,6 +160,7 @@ def click_continue():
     if time.time() - start_time >= 60:
         return
 
+@timeline.phase("squad_select")
 def squad_select_lux(mirror_instance, SelectTeam=False):
     
     if SelectTeam:
@@ -174,7 +180,7 @@ def squad_select_lux(mirror_instance, SelectTeam=False):
                     if not common.element_exist(status):
                         for i in range(7):
                             common.mouse_scroll(-1000)
-                        common.sleep(1)
+                        wait_engine.wait_until(wait_engine.appears(status), timeout=1.0, site="lux.status_scroll")
                         if common.click_matching(status, recursive=False):
                             break
                         continue
@@ -190,8 +196,7 @@ def squad_select_lux(mirror_instance, SelectTeam=False):
         
     common.click_matching("pictures/CustomAdded1080p/general/squads/to_battle.png")
     
-    while not common.element_exist("pictures/battle/winrate.png"):
-        common.sleep(0.5)
+    wait_engine.wait_until(wait_engine.appears("pictures/battle/winrate.png"), timeout=None, site="lux.battle_start", interval=0.5)
         
     logger.info(f"Battle screen detected, entering battle")
     core.battle()
@@ -200,6 +205,7 @@ def squad_select_lux(mirror_instance, SelectTeam=False):
     core.check_loading()
     click_continue()
 
+@timeline.phase("lux_navigation")
 def navigate_to_lux():
     if common.click_matching("pictures/CustomAdded1080p/luxcavation/luxcavation.png", recursive=False):
         return
@@ -211,14 +217,23 @@ def navigate_to_lux():
 
 def pre_exp_setup(Stage, SelectTeam=False, config_type="exp_team_selection"):
     logger.info(f"Starting EXP farming setup for stage: {Stage} with config: {config_type}")
-    core.refill_enkephalin()
-    navigate_to_exp(Stage, SelectTeam, config_type)
+    timeline.start_run("exp")
+    try:
+        core.refill_enkephalin()
+        navigate_to_exp(Stage, SelectTeam, config_type)
+    finally:
+        timeline.end_run()
 
 def pre_threads_setup(Difficulty, SelectTeam=False, config_type="threads_team_selection"):
     logger.info(f"Starting Thread farming setup for difficulty: {Difficulty} with config: {config_type}")
-    core.refill_enkephalin()
-    navigate_to_threads(Difficulty, SelectTeam, config_type)
+    timeline.start_run("threads")
+    try:
+        core.refill_enkephalin()
+        navigate_to_threads(Difficulty, SelectTeam, config_type)
+    finally:
+        timeline.end_run()
 
+@timeline.phase("lux_navigation")
 def navigate_to_exp(Stage, SelectTeam=False, config_type="exp_team_selection"):
     logger.info(f"Navigating to EXP stage: {Stage} with config: {config_type}")
     
@@ -230,7 +245,8 @@ def navigate_to_exp(Stage, SelectTeam=False, config_type="exp_team_selection"):
 
     logger.debug("Clicking EXP tab")
     common.click_matching("pictures/CustomAdded1080p/luxcavation/exp/exp.png", 0.8)
-    time.sleep(1.0)
+    wait_engine.wait_until(wait_engine.appears("pictures/CustomAdded1080p/luxcavation/exp/exp_enter.png", threshold=0.85),
+                           timeout=1.0, site="lux.exp_tab")
     
     if Stage == "latest":
         logger.debug("Clicking latest stage using coordinates")
@@ -246,8 +262,6 @@ def navigate_to_exp(Stage, SelectTeam=False, config_type="exp_team_selection"):
         drag_start_x, drag_start_y = lux_coords["exp_drag_start"]
         drag_end_x, drag_end_y = lux_coords["exp_drag_end"]
 
-        _ocr = _get_ocr()
-
         success = False
         for attempt in range(8):
             screenshot = common.capture_screen()
@@ -256,9 +270,7 @@ def navigate_to_exp(Stage, SelectTeam=False, config_type="exp_team_selection"):
 
             if not enter_matches:
                 logger.debug(f"No exp_enter buttons visible on screen (attempt {attempt+1})")
-            elif not _ocr:
-                logger.warning("OCR unavailable, cannot read stage labels")
-            if enter_matches and _ocr:
+            else:
                 stage_y1 = int(0.268 * sh)
                 stage_y2 = int(0.398 * sh)
                 ocr_hw = int(0.094 * sw)
@@ -266,9 +278,11 @@ def navigate_to_exp(Stage, SelectTeam=False, config_type="exp_team_selection"):
                     cx1 = max(0, ex - ocr_hw)
                     cx2 = min(sw, ex + ocr_hw)
                     crop = screenshot[stage_y1:stage_y2, cx1:cx2]
-                    texts = _ocr.readtext(crop, detail=0)
-                    combined = " ".join(texts)
-                    logger.debug(f"OCR at x={ex}: '{combined}' (looking for '{target_label}')")
+                    combined = _read_stage_label(crop)
+                    if combined is None:
+                        logger.warning("OCR unavailable, cannot read stage labels")
+                        break
+                    logger.debug(f"Stage label at x={ex}: '{combined}' (looking for '{target_label}')")
                     if target_label in combined:
                         logger.info(f"Stage {Stage} (label '{target_label}') found at x={ex}, clicking Enter at ({ex},{ey})")
                         common.mouse_move_click(ex, ey)
@@ -298,10 +312,9 @@ def navigate_to_exp(Stage, SelectTeam=False, config_type="exp_team_selection"):
         navigate_to_exp(Stage, SelectTeam, config_type)
         return
     
-    logger.debug(f"Click successful, waiting for UI to settle...")
-    time.sleep(0.5) 
-    
-    if common.element_exist("pictures/CustomAdded1080p/general/squads/squad_select.png"):
+    logger.debug(f"Click successful, waiting for squad select...")
+    squad_select = wait_engine.appears("pictures/CustomAdded1080p/general/squads/squad_select.png")
+    if wait_engine.wait_until(squad_select, timeout=2.0, site="lux.exp_squad_select"):
         logger.info(f"Squad select screen detected")
         mirror_instance = get_mirror_instance(config_type)
         squad_select_lux(mirror_instance, SelectTeam)
@@ -315,6 +328,7 @@ def navigate_to_exp(Stage, SelectTeam=False, config_type="exp_team_selection"):
         return
     
 
+@timeline.phase("lux_navigation")
 def navigate_to_threads(Difficulty, SelectTeam=False, config_type="threads_team_selection"):
     
     if Difficulty != "latest" and Difficulty not in [20, 30, 40, 50, 60]:
@@ -367,10 +381,9 @@ def navigate_to_threads(Difficulty, SelectTeam=False, config_type="threads_team_
             common.mouse_drag(drag_x, drag_start_y, 0.3)
             time.sleep(0.3)
         
-    logger.debug(f"Click successful, waiting for UI to settle...")
-    time.sleep(0.5) 
-        
-    if common.element_exist("pictures/CustomAdded1080p/general/squads/squad_select.png"):
+    logger.debug(f"Click successful, waiting for squad select...")
+    squad_select = wait_engine.appears("pictures/CustomAdded1080p/general/squads/squad_select.png")
+    if wait_engine.wait_until(squad_select, timeout=2.0, site="lux.threads_squad_select"):
         logger.info(f"Squad select screen detected")
         mirror_instance = get_mirror_instance(config_type)
         squad_select_lux(mirror_instance, SelectTeam)
@@ -6,6 +6,15 @@ import common
 import copy
 import shared_vars
 import mirror_utils
+import ocr_service
+import glyph_reader
+import pack_bank
+import feature_index
+import nav_vision
+import route_planner
+import wait_engine
+import timeline
+from screen_classifier import ScreenClassifier
 from core import (skill_check, battle_check, battle, check_loading,
                   post_run_load, refill_enkephalin, navigate_to_md)
 
@@ -23,7 +32,28 @@ os.chdir(BASE_PATH)
 
 logger = logging.getLogger(__name__)
 
-_orb_descriptor_cache = {}
+_FRAME_MAX_AGE = 0.3
+
+# Regions are 1080p boxes around where each screen's marker sits; rows
+# without one (markers that move between layouts) use the learned ROI
+_LOOP_STATES = ScreenClassifier([
+    ("maint", "pictures/general/maint.png", (0, 200, 1920, 880)),
+    ("event_skip", "pictures/events/skip.png", (640, 120, 1920, 900)),
+    ("event_proceed", "pictures/events/proceed.png", (960, 540, 1920, 1080)),
+    ("battle", "pictures/battle/winrate.png", (960, 540, 1920, 1080)),
+    ("battle", "pictures/battle/winrate_wave.png", (960, 540, 1920, 1080)),
+    ("navigation", "pictures/mirror/general/danteh.png", (0, 0, 1280, 1080)),
+    ("squad_select", "pictures/CustomAdded1080p/general/squads/clear_selection.png", (960, 0, 1920, 1080)),
+    ("reward_select", "pictures/mirror/general/reward_select.png", (960, 0, 1920, 1080)),
+    ("ego_gift_get", "pictures/mirror/general/ego_gift_get.png", (240, 0, 1680, 540)),
+    ("rest_shop", "pictures/mirror/restshop/shop.png"),
+    ("rest_shop", "pictures/mirror/restshop/super_shop.png"),
+    ("encounter_reward", "pictures/mirror/general/encounter_reward.png", (240, 0, 1680, 540)),
+    ("enhance_gifts", "pictures/CustomAdded1080p/mirror/general/enhance_ego_gift_page.png", (240, 0, 1680, 540)),
+    ("event_effect", "pictures/mirror/general/event_effect.png", (240, 0, 1680, 540)),
+    ("main_menu", "pictures/general/module.png"),
+    ("main_menu", "pictures/mirror/general/md_enter.png"),
+])
 
 class Mirror:
     def __init__(self, status):
@@ -44,6 +74,8 @@ class Mirror:
         }
         self.current_floor_tracker = None
         self.retries_used = 0
+        self._route = None
+        self._entered_node = None
 
     @staticmethod
     def floor_id():
@@ -57,15 +89,17 @@ class Mirror:
         if len(screen.shape) == 2:
             screen = cv2.cvtColor(screen, cv2.COLOR_GRAY2BGR)
 
+        floor_num, confidence = glyph_reader.read_floor(screen)
+        if floor_num is not None and confidence >= glyph_reader.MIN_CONFIDENCE:
+            logger.info(f"Glyph floor detected: floor{floor_num} (confidence: {confidence:.4f})")
+            return f"floor{floor_num}"
+
         try:
             import re
-            import easyocr
-            import numpy as np
             h = screen.shape[0]
             y1, y2 = round(130 * h / 1080), round(200 * h / 1080)
             title_strip = screen[y1:y2, :]
-            ocr_reader = easyocr.Reader(['en'], gpu=False, verbose=False)
-            texts = ocr_reader.readtext(title_strip, detail=0)
+            texts = ocr_service.read_text(title_strip)
             combined = " ".join(texts)
             m = re.search(r'FLOOR\s+(\d)', combined, re.IGNORECASE)
             if m:
@@ -86,26 +120,11 @@ class Mirror:
             template_path = f"pictures/mirror/packs/{floor_name}.png"
             full_path = common.resource_path(template_path)
 
-            cache_key = (full_path, cv2.IMREAD_COLOR)
-            if cache_key in common._template_cache:
-                template = common._template_cache[cache_key]
-            else:
-                try:
-                    import numpy as np
-                    raw = np.fromfile(full_path, dtype=np.uint8)
-                    template = cv2.imdecode(raw, cv2.IMREAD_COLOR)
-                except Exception:
-                    template = None
-                if template is None:
-                    continue
-                common._template_cache[cache_key] = template
-
             base_w, base_h = common.get_template_reference_resolution(full_path)
             scale = min(common.EXPECTED_WIDTH / base_w, common.EXPECTED_HEIGHT / base_h)
-            if scale != 1.0:
-                scaled = cv2.resize(template, None, fx=scale, fy=scale, interpolation=cv2.INTER_LINEAR)
-            else:
-                scaled = template
+            scaled = common._get_scaled_template(full_path, cv2.IMREAD_COLOR, scale)
+            if scaled is None:
+                continue
 
             if scaled.shape[0] > screen.shape[0] or scaled.shape[1] > screen.shape[1]:
                 continue
@@ -173,6 +192,7 @@ class Mirror:
         else:
             return common.squad_order(status)
 
+    @timeline.phase("setup")
     def setup_mirror(self):
         
         if (common.element_exist("pictures/mirror/general/danteh.png", quiet_failure=True) or
@@ -278,7 +298,13 @@ class Mirror:
         return win_flag, run_complete, self.run_stats
 
     def mirror_loop(self):
-        if common.element_exist("pictures/general/maint.png"): 
+        with common.frame_context(max_age=_FRAME_MAX_AGE):
+            return self._mirror_loop_tick()
+
+    def _mirror_loop_tick(self):
+        screen_state = _LOOP_STATES.classify()
+
+        if "maint" in screen_state: 
             common.click_matching("pictures/general/close.png", recursive=False)
             common.sleep(0.5)
             common.click_matching("pictures/general/no_op.png")
@@ -286,46 +312,46 @@ class Mirror:
             self.logger.critical("Server under maintenance")
             sys.exit(0)
 
-        if common.element_exist("pictures/events/skip.png"): 
+        if "event_skip" in screen_state: 
             self.logger.info("Event skip button detected")
             common.mouse_move(*common.scale_coordinates_1080p(200, 200))
             common.click_skip(15)
             self.event_choice()
 
-        elif common.click_matching("pictures/events/proceed.png", recursive=False):
+        elif "event_proceed" in screen_state and common.click_matching("pictures/events/proceed.png", recursive=False):
             self.logger.info("Event proceed button detected")
             self.event_choice()
 
-        elif common.element_exist("pictures/battle/winrate.png") or common.element_exist("pictures/battle/winrate_wave.png"):
+        elif "battle" in screen_state:
             self.logger.info("Battle winrate button detected")
             battle()
             check_loading()
 
-        elif common.element_exist("pictures/mirror/general/danteh.png"): 
+        elif "navigation" in screen_state: 
             self.logger.info("Navigation screen detected (danteh)")
             self.navigation()
 
-        elif common.element_exist("pictures/CustomAdded1080p/general/squads/clear_selection.png"): 
+        elif "squad_select" in screen_state: 
             self.logger.info("Squad selection for battle detected")
             self.squad_select()
 
-        elif common.element_exist("pictures/mirror/general/reward_select.png"): 
+        elif "reward_select" in screen_state: 
             self.logger.info("Reward selection detected")
             self.reward_select()
 
-        elif common.element_exist("pictures/mirror/general/ego_gift_get.png"): 
+        elif "ego_gift_get" in screen_state: 
             self.logger.info("EGO Gift acquisition detected")
             common.click_matching("pictures/general/confirm_b.png") 
             
-        elif common.element_exist("pictures/mirror/restshop/shop.png") or common.element_exist("pictures/mirror/restshop/super_shop.png") : 
+        elif "rest_shop" in screen_state: 
             self.logger.info("Rest shop detected")
             self.rest_shop()
 
-        elif common.element_exist("pictures/mirror/general/encounter_reward.png"):
+        elif "encounter_reward" in screen_state:
             self.logger.info("Encounter reward detected")
             self.encounter_reward_select()
 
-        elif common.element_exist("pictures/CustomAdded1080p/mirror/general/enhance_ego_gift_page.png", quiet_failure=True):
+        elif "enhance_gifts" in screen_state:
             self.logger.info("Enhancement screen detected")
             import mirror_utils
             status = mirror_utils.get_status_gift_template(self.status)
@@ -337,7 +363,7 @@ class Mirror:
             self.logger.info("Pack selection detected")
             self.pack_selection()
 
-        elif common.element_exist("pictures/mirror/general/event_effect.png"):
+        elif "event_effect" in screen_state:
             self.logger.info("Event effect selection detected")
             found = common.match_image("pictures/mirror/general/event_select.png", no_grayscale=True)
             if found:
@@ -348,7 +374,7 @@ class Mirror:
             else:
                 self.logger.warning("event_select.png not found, skipping event effect")
             
-        elif common.element_exist("pictures/general/module.png") or common.element_exist("pictures/mirror/general/md_enter.png"):
+        elif "main_menu" in screen_state:
             self.logger.info("Main menu detected in loop. Forcing run completion.")
             return 0, 1, self.run_stats
 
@@ -391,6 +417,7 @@ class Mirror:
                 return
             common.sleep(0.5)
     
+    @timeline.phase("setup")
     def gift_selection(self):
         self.logger.info("Starting EGO gift selection")
         
@@ -520,7 +547,7 @@ class Mirror:
                 if not common.element_exist(status):
                     for _ in range(7):
                         common.mouse_scroll(-1000)
-                    common.sleep(1)
+                    wait_engine.wait_until(wait_engine.appears(status), timeout=1.0, site="mirror.grace_status_scroll")
                     if common.click_matching(status, recursive=False):
                         break
                     continue
@@ -552,9 +579,6 @@ class Mirror:
 
         self.logger.debug(f"Screenshot: {actual_w}x{actual_h} | crop: x={min_x_scaled}-{max_x_scaled}, y={min_y_scaled}-{max_y_scaled}")
 
-        base_scale = min(actual_w / 2560.0, actual_h / 1440.0)
-        scale_candidates = [base_scale * adj for adj in (1.00, 1.33, 0.87)]
-
         crop = screenshot[min_y_scaled:max_y_scaled, min_x_scaled:max_x_scaled]
         gray_crop = cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY) if len(crop.shape) == 3 else crop.copy()
 
@@ -568,89 +592,27 @@ class Mirror:
         best_per_coord = {}
         excepted_visible_count = 0
 
-        all_packs = [f for f in os.listdir(floor_dir) if f.endswith(".png")]
-        priority_names = set(floor_priorities.keys()) if floor_priorities else set()
-        excepted_names  = set(exception_packs) if exception_packs else set()
-        def _pack_sort_key(fname):
-            n = fname[:-4]
-            if n in priority_names: return 0
-            if n in excepted_names:  return 2
-            return 1
-        all_packs.sort(key=_pack_sort_key)
-
-        for pack_file in all_packs:
-            pack_name = pack_file.replace(".png", "")
-            pack_rel_path = f"pictures/mirror/packs/f{floor_char}/{pack_file}"
-            pack_abs_path = common.resource_path(pack_rel_path)
-            is_excepted = pack_name in exception_packs
-
-            threshold_adj = common.get_total_threshold_adjustment(pack_rel_path)
-
-            gray_key = (pack_abs_path, cv2.IMREAD_GRAYSCALE)
-            tmpl_gray_orig = common._template_cache.get(gray_key)
-            if tmpl_gray_orig is None:
-                try:
-                    with open(pack_abs_path, 'rb') as _f:
-                        raw = np.frombuffer(_f.read(), dtype=np.uint8)
-                    tmpl_gray_orig = cv2.imdecode(raw, cv2.IMREAD_GRAYSCALE)
-                except Exception as e:
-                    self.logger.warning(f"Failed to load template for pack '{pack_name}': {e}")
-                    tmpl_gray_orig = None
-                if tmpl_gray_orig is not None:
-                    common._template_cache[gray_key] = tmpl_gray_orig
+        pack_dir = f"pictures/mirror/packs/f{floor_char}"
+        bank = pack_bank.get_bank(pack_dir, (2560, 1440), actual_w, actual_h)
+        scan_results, stopped_early = bank.scan(gray_crop, floor_priorities, exception_packs)
+        if stopped_early:
+            self.logger.debug("Top priority pack confirmed, skipping the rest of the pack scan")
 
-            if tmpl_gray_orig is None:
-                self.logger.warning(f"Template returned None for pack '{pack_name}', skipping")
-                continue
-
-            def _extract_matches_scored(res, thresh, box_w, box_h):
-                locs = np.where(res >= thresh)
-                if not locs[0].size:
-                    return []
-                boxes = np.array([
-                    [int(x), int(y), int(x + box_w), int(y + box_h)]
-                    for x, y in zip(locs[1], locs[0])
-                ])
-                kept = common.non_max_suppression_fast(boxes)
-                out = []
-                for b in kept:
-                    cx = int((b[0] + b[2]) / 2) + min_x_scaled
-                    cy = int((b[1] + b[3]) / 2) + min_y_scaled
-                    score = float(np.max(res[b[1]:b[3], b[0]:b[2]]))
-                    out.append(((cx, cy), score))
-                return out
-
-            def _multiscale_match(tmpl_orig, search_img):
-                best_res, best_score, best_th, best_tw = None, 0.0, 0, 0
-                for sf in scale_candidates:
-                    t = cv2.resize(tmpl_orig, None, fx=sf, fy=sf, interpolation=cv2.INTER_LINEAR) if sf != 1.0 else tmpl_orig
-                    if t.shape[0] > search_img.shape[0] or t.shape[1] > search_img.shape[1]:
-                        continue
-                    res = cv2.matchTemplate(search_img, t, cv2.TM_CCOEFF_NORMED)
-                    s = float(res.max()) if res.size > 0 else 0.0
-                    if s > best_score:
-                        best_score, best_res, best_th, best_tw = s, res, t.shape[0], t.shape[1]
-                return best_res, best_score, best_th, best_tw
-
-            g_res, best_score, g_th, g_tw = _multiscale_match(tmpl_gray_orig, gray_crop)
-            coord_scores = []
-            if g_res is not None:
-                if is_excepted:
-                    if _extract_matches_scored(g_res, 0.55 + threshold_adj, g_tw, g_th):
-                        excepted_visible_count += 1
-                        self.logger.debug(f"Excepted pack visible (score>{0.55+threshold_adj:.2f}), skipping: {pack_name}")
-                    else:
-                        self.logger.debug(f"Excepted pack not visible (score={best_score:.4f}), skipping: {pack_name}")
-                    continue
-                coord_scores = (_extract_matches_scored(g_res, 0.65 + threshold_adj, g_tw, g_th) or
-                                _extract_matches_scored(g_res, 0.50 + threshold_adj, g_tw, g_th))
-            elif is_excepted:
-                self.logger.debug(f"Excepted pack skipped (template too large for crop): {pack_name}")
+        for pack_name, (best_score, matches) in scan_results.items():
+            if pack_name in exception_packs:
+                if matches:
+                    excepted_visible_count += 1
+                    self.logger.debug(f"Excepted pack visible, skipping: {pack_name}")
+                elif best_score is None:
+                    self.logger.debug(f"Excepted pack skipped (template too large for crop): {pack_name}")
+                else:
+                    self.logger.debug(f"Excepted pack not visible (score={best_score:.4f}), skipping: {pack_name}")
                 continue
 
-            if not coord_scores:
-                self.logger.debug(f"Pack not detected: {pack_name} | score: {best_score:.4f}")
-            for coord, score in coord_scores:
+            if not matches:
+                self.logger.debug(f"Pack not detected: {pack_name} | score: {best_score or 0.0:.4f}")
+            for (cx, cy), score in matches:
+                coord = (cx + min_x_scaled, cy + min_y_scaled)
                 existing = best_per_coord.get(coord)
                 if existing is None or score > existing[0]:
                     best_per_coord[coord] = (score, pack_name)
@@ -664,47 +626,22 @@ class Mirror:
         best_per_coord = kept
 
         already_found_names = {v[1] for v in best_per_coord.values()}
-        if shared_vars.good_pc_mode and len(best_per_coord) < 5:
+        if len(best_per_coord) < 5 and not stopped_early:
             self.logger.debug(f"CCOEFF found {len(best_per_coord)} packs. Running ORB secondary scan")
             try:
-                orb = cv2.ORB_create(nfeatures=500)
-                bf = cv2.BFMatcher(cv2.NORM_HAMMING, crossCheck=True)
+                orb = cv2.ORB_create(nfeatures=feature_index.ORB_FEATURES)
                 kp_crop, des_crop = orb.detectAndCompute(gray_crop, None)
                 if des_crop is not None:
                     orb_candidates = {}
                     crop_h, crop_w = gray_crop.shape[:2]
-                    for pack_file in all_packs:
-                        pack_name = pack_file.replace(".png", "")
-                        if pack_name in exception_packs or pack_name in already_found_names:
+                    index = feature_index.get_index(f"pictures/mirror/packs/f{floor_char}")
+                    votes = index.query(des_crop, exclude=set(exception_packs) | already_found_names)
+                    for pack_name, pairs in votes.items():
+                        if len(pairs) < 4:
                             continue
-                        pack_abs_path = common.resource_path(f"pictures/mirror/packs/f{floor_char}/{pack_file}")
-                        cached = _orb_descriptor_cache.get(pack_abs_path)
-                        if cached is None:
-                            gray_key = (pack_abs_path, cv2.IMREAD_GRAYSCALE)
-                            tmpl_orb = common._template_cache.get(gray_key)
-                            if tmpl_orb is None:
-                                try:
-                                    with open(pack_abs_path, 'rb') as _f:
-                                        raw = np.frombuffer(_f.read(), dtype=np.uint8)
-                                    tmpl_orb = cv2.imdecode(raw, cv2.IMREAD_GRAYSCALE)
-                                except Exception:
-                                    continue
-                                if tmpl_orb is None:
-                                    continue
-                                common._template_cache[gray_key] = tmpl_orb
-                            kp_tmpl, des_tmpl = orb.detectAndCompute(tmpl_orb, None)
-                            if des_tmpl is None:
-                                continue
-                            tmpl_h, tmpl_w = tmpl_orb.shape[:2]
-                            _orb_descriptor_cache[pack_abs_path] = (kp_tmpl, des_tmpl, tmpl_h, tmpl_w)
-                            cached = (kp_tmpl, des_tmpl, tmpl_h, tmpl_w)
-                        kp_tmpl, des_tmpl, tmpl_h, tmpl_w = cached
-                        matches = bf.match(des_tmpl, des_crop)
-                        good = [m for m in matches if m.distance < 50]
-                        if len(good) < 4:
-                            continue
-                        pts1 = np.float32([kp_tmpl[m.queryIdx].pt for m in good]).reshape(-1, 1, 2)
-                        pts2 = np.float32([kp_crop[m.trainIdx].pt for m in good]).reshape(-1, 1, 2)
+                        tmpl_h, tmpl_w = index.sizes[pack_name]
+                        pts1 = np.float32([pt for pt, _ in pairs]).reshape(-1, 1, 2)
+                        pts2 = np.float32([kp_crop[qi].pt for _, qi in pairs]).reshape(-1, 1, 2)
                         H, mask = cv2.findHomography(pts1, pts2, cv2.RANSAC, 5.0)
                         if H is None or mask is None:
                             continue
@@ -735,14 +672,13 @@ class Mirror:
                 self.logger.warning(f"ORB secondary scan failed: {e}")
 
         has_unnamed = any(v[1] == "unknown_pack" for v in best_per_coord.values())
-        if len(best_per_coord) < 5 or has_unnamed:
+        if not stopped_early and (len(best_per_coord) < 5 or has_unnamed):
             self.logger.debug(f"Template+ORB found {len(best_per_coord)} packs (unnamed: {has_unnamed}). Running OCR fallback.")
             try:
-                import easyocr
                 from rapidfuzz import process, fuzz
 
-                if getattr(self, '_ocr_unavailable', False):
-                    raise RuntimeError("OCR previously failed to initialize, skipping")
+                if not ocr_service.available():
+                    raise RuntimeError("OCR reader unavailable, skipping")
 
                 inpack_path = common.resource_path("pictures/CustomAdded1080p/mirror/packs/inpack.png")
                 inpack_tmpl = None
@@ -756,14 +692,9 @@ class Mirror:
                 if inpack_tmpl is not None:
                     gray_ss = cv2.cvtColor(screenshot, cv2.COLOR_BGR2GRAY) if len(screenshot.shape) == 3 else screenshot
                     res_ip = cv2.matchTemplate(gray_ss, inpack_tmpl, cv2.TM_CCOEFF_NORMED)
-                    ip_locs = np.where(res_ip >= 0.75)
-                    if ip_locs[0].size:
-                        ih, iw = inpack_tmpl.shape[:2]
-                        ip_boxes = np.array([
-                            [int(x), int(y), int(x + iw), int(y + ih)]
-                            for x, y in zip(ip_locs[1], ip_locs[0])
-                        ])
-                        ip_kept = common.non_max_suppression_fast(ip_boxes)
+                    ih, iw = inpack_tmpl.shape[:2]
+                    ip_kept, _ = common.match_peaks(res_ip, 0.75, iw, ih)
+                    if len(ip_kept):
 
                         actual_h, actual_w = screenshot.shape[:2]
                         name_y1 = round(660 * actual_h / 1080)
@@ -771,16 +702,7 @@ class Mirror:
                         click_y_offset = round(150 * actual_h / 1080)
                         half_ocr_w = round(200 * actual_w / 1920)
 
-                        if not hasattr(self, '_ocr_reader') or self._ocr_reader is None:
-                            self.logger.info("Initializing OCR reader (first use)")
-                            try:
-                                self._ocr_reader = easyocr.Reader(['en'], gpu=False, verbose=False)
-                            except Exception as ocr_init_e:
-                                self.logger.warning(f"OCR reader init failed, disabling for this session: {ocr_init_e}")
-                                self._ocr_unavailable = True
-                                raise
-
-                        known_names = [f[:-4] for f in os.listdir(floor_dir) if f.endswith(".png")]
+                        known_names = bank.names()
 
                         sorted_ip = sorted(ip_kept, key=lambda b: int((b[0] + b[2]) / 2))
                         ip_cxs = [int((b[0] + b[2]) / 2) for b in sorted_ip]
@@ -797,7 +719,7 @@ class Mirror:
                             sx1 = max(left_mid, ip_cx - half_ocr_w)
                             sx2 = min(right_mid, ip_cx + half_ocr_w)
                             strip = screenshot[name_y1:name_y2, sx1:sx2]
-                            ocr_texts = self._ocr_reader.readtext(strip, detail=0)
+                            ocr_texts = ocr_service.read_text(strip)
                             raw_text = " ".join(ocr_texts).strip()
 
                             click_cy = ip_cy + click_y_offset
@@ -833,6 +755,7 @@ class Mirror:
 
         return selectable_packs_pos, pack_identities, known_pack_names, found_priority_packs, excepted_visible_count
 
+    @timeline.phase("pack_selection")
     def pack_selection(self) -> None:
         if self.current_floor_tracker:
             last_floor_num = int(self.current_floor_tracker.replace("floor", ""))
@@ -884,8 +807,7 @@ class Mirror:
                     self.logger.info(f"Detected Hard Mode, switching to Normal Mode (attempt {_attempt + 1})")
                     common.sleep(1)
                     common.mouse_move_click(toggle_x, toggle_y)
-                    common.sleep(1.5)
-                    if not _hard_mode_detected():
+                    if wait_engine.wait_until(lambda: not _hard_mode_detected(), timeout=1.5, site="mirror.hard_mode_toggle"):
                         self.logger.info("Successfully switched to Normal Mode")
                         break
                 else:
@@ -949,16 +871,23 @@ class Mirror:
             self.logger.debug(f"Found {len(selectable_packs_pos)} selectable packs")
 
             def robust_drag_pack(x, y):
+                # Queued as one input sequence; returns its Future so the
+                # caller can watch the screen while the drag plays
                 extra = 1.0 if not shared_vars.good_pc_mode else 0.0
-                common.mouse_move(x, y)
-                common.sleep(0.15 + extra)
-                common.mouse_down()
-                common.sleep(0.15 + extra)
                 drag_offset = round(350 * common.EXPECTED_HEIGHT / common.REFERENCE_HEIGHT_1080P)
+                src_x, src_y = common.get_MonCords(x, y)
                 dest_x, dest_y = common.get_MonCords(x, y + drag_offset)
-                common._bezier_move(dest_x, dest_y, duration=0.3 + extra)
-                common.sleep(0.15 + extra)
-                common.mouse_up()
+
+                def drag():
+                    common._bezier_move(src_x, src_y)
+                    common.sleep(0.15 + extra)
+                    common.mouse_down()
+                    common.sleep(0.15 + extra)
+                    common._bezier_move(dest_x, dest_y, duration=0.3 + extra)
+                    common.sleep(0.15 + extra)
+                    common.mouse_up()
+
+                return common.submit_input(drag)
 
             def select_pack(coords, name="unknown_pack"):
                 pack_name = name
@@ -976,16 +905,21 @@ class Mirror:
                 self.logger.info(f"Selected Pack: {pack_name} | Location: {detected_floor}")
 
                 x, y = coords
-                robust_drag_pack(x, y)
+                drag = robust_drag_pack(x, y)
                 self.run_stats["packs_by_floor"][floor] = pack_name
 
-                wait_start = time.time()
+                # Polling starts while the drag is still playing; the 5s
+                # window counts from when it has landed
+                wait_start = None
                 selection_confirmed = False
-                while time.time() - wait_start < 5:
+                while wait_start is None or time.time() - wait_start < 5:
+                    if wait_start is None and drag.done():
+                        wait_start = time.time()
                     if not self.is_pack_screen():
                         selection_confirmed = True
                         break
                     common.sleep(0.2)
+                drag.result()
 
                 if selection_confirmed:
                     self.run_stats["packs"].append(pack_name)
@@ -1103,11 +1037,12 @@ class Mirror:
                     if filtered:
                         bx, by = filtered[0]
                         self.logger.info(f"inpack fallback: dragging pack at ({bx}, {by})")
-                        robust_drag_pack(bx, by)
+                        robust_drag_pack(bx, by).result()
                         return
                 self.logger.error(f"inpack fallback also found nothing on {floor}. Stopping macro.")
                 raise RuntimeError(f"All visible packs are excepted on {floor}. Cannot select a pack.")
 
+    @timeline.phase("squad_select")
     def squad_select(self):
         self.logger.info("Selecting squad members for battle")
         if not self.squad_set or not common.element_exist("pictures/CustomAdded1080p/general/squads/full_squad.png"):
@@ -1132,6 +1067,7 @@ class Mirror:
         battle()
         check_loading()
 
+    @timeline.phase("rewards")
     def reward_select(self):
         self.logger.info("Selecting rewards")
         status_effect = mirror_utils.reward_choice(self.status)
@@ -1197,6 +1133,7 @@ class Mirror:
         common.click_matching("pictures/general/confirm_b.png", recursive=False, quiet_failure=True)
         common.click_matching("pictures/general/confirm_w.png", recursive=False, quiet_failure=True)
 
+    @timeline.phase("rewards")
     def encounter_reward_select(self):
         self.logger.info("Selecting encounter rewards")
         _valid = {"cost_gift", "cost", "gift", "resource", "starlight"}
@@ -1222,7 +1159,10 @@ class Mirror:
                 if common.click_matching(rewards, recursive=False, x1=min_x, y1=min_y, x2=max_x, y2=max_y):
                     clicked = True
                     common.click_matching("pictures/general/confirm_b.png")
-                    common.sleep(1)
+                    wait_engine.wait_until(wait_engine.any_of(
+                        wait_engine.appears("pictures/mirror/encounter_reward/prompt.png"),
+                        wait_engine.appears("pictures/mirror/general/ego_gift_get.png"),
+                    ), timeout=1, site="mirror.encounter_reward")
                     if common.element_exist("pictures/mirror/encounter_reward/prompt.png"):
                         common.click_matching("pictures/CustomAdded1080p/mirror/general/BorderedConfirm.png")
                         break
@@ -1259,101 +1199,38 @@ class Mirror:
             return nodes
         return result
 
-    def _classify_node_at(self, cx, cy, full_screenshot):
-        NAV = "pictures/mirror/navigation"
-        hw = common.scale_x_1080p(140)
-        hh = common.scale_y_1080p(130)
-        kw = {
-            "x1": max(0, cx - hw), "y1": max(0, cy - hh),
-            "x2": min(full_screenshot.shape[1], cx + hw),
-            "y2": min(full_screenshot.shape[0], cy + hh),
-            "screenshot": full_screenshot,
-            "quiet_failure": True,
-            "enable_scaling": True,
-        }
-        def has(name, t=0.72):
-            return bool(common.match_image(f"{NAV}/{name}.png", t, **kw))
-        if has("boss_ark", 0.70) or has("boss0", 0.65) or has("boss1", 0.65) or has("boss_highlighted", 0.65): return "Boss"
-        if has("event0") or has("event1") or has("event2"):                    return "Event"
-        if has("shop0") or has("shop1") or has("shop_highlighted"):            return "Shop"
-        if has("risk0", 0.65) or has("risk1", 0.65) or has("risk2", 0.65):    return "Risky"
-        if has("focus0", 0.65) or has("focus1", 0.65) or has("focus2", 0.65) or has("focus3", 0.65): return "Focused"
-        if has("coin", 0.70):
-            return "Miniboss" if has("gift", 0.70) else "Normal"
-        return None
-
-    def _get_nav_connections(self, screenshot, x_adj=0, y_adj=0):
-        import cv2
-        NAV = "pictures/mirror/navigation"
-        rx1 = common.scale_x_1080p(850)  + x_adj; ry1 = common.scale_y_1080p(280) + y_adj
-        rx2 = common.scale_x_1080p(1460) + x_adj; ry2 = common.scale_y_1080p(710) + y_adj
-        rx1 = max(0, rx1); ry1 = max(0, ry1)
-        rx2 = min(screenshot.shape[1], rx2); ry2 = min(screenshot.shape[0], ry2)
-        region = screenshot[ry1:ry2, rx1:rx2]
-        if region.size == 0:
-            return []
-        rh, rw = region.shape[:2]
-        ch = max(1, int(0.216 * rh))
-        cw = max(1, int(0.492 * rw))
-        quads = [
-            region[0:ch, 0:cw],
-            region[0:ch, rw-cw:rw],
-            region[rh-ch:rh, 0:cw],
-            region[rh-ch:rh, rw-cw:rw],
-        ]
-        connections = []
-        for i, quad in enumerate(quads):
-            for j, direction in enumerate(["up", "down"]):
-                try:
-                    tmpl = cv2.imread(common.resource_path(f"{NAV}/{direction}.png"), cv2.IMREAD_GRAYSCALE)
-                    src  = cv2.cvtColor(quad, cv2.COLOR_BGR2GRAY) if len(quad.shape) == 3 else quad.copy()
-                    if tmpl is None or tmpl.shape[0] > src.shape[0] or tmpl.shape[1] > src.shape[1]:
-                        continue
-                    if cv2.matchTemplate(src, tmpl, cv2.TM_CCOEFF_NORMED).max() >= 0.80:
-                        connections.append(((i % 2, (i // 2) + 1 - j), (i % 2 + 1, (i // 2) + j)))
-                except Exception as e:
-                    logger.debug(f"Template match failed for quad {i} direction {direction}: {e}")
-        return connections
-
-    def _dfs_best_first_step(self, nodes, connections):
-        _COSTS = {"Boss": 60, "Event": 0, "Shop": 15, "Focused": 77,
-                  "Miniboss": 67, "Normal": 52, "Risky": 87, "Unknown": 52}
-        L = len(nodes)
-        if L == 0:
+    def _plan_first_step(self, graph):
+        # Follows the route planned on an earlier map screen while the map
+        # still agrees with it; otherwise plans a new one. Rows are relative
+        # to Dante, who sits on the middle row once the map is re-centred.
+        route = self._route
+        self._route = None
+        if route is not None and route["floor"] == self.current_floor_tracker:
+            (row, node_type), rest = route["steps"][0], route["steps"][1:]
+            row = row - route["anchor"] + 1
+            if 0 <= row <= 2 and graph.nodes[0][row] == node_type:
+                if rest:
+                    self._route = {"floor": route["floor"], "anchor": route["steps"][0][0], "steps": rest}
+                self.logger.info(f"Following planned route: row {row} ({node_type})")
+                return row, node_type
+            self.logger.info("Floor map no longer matches the planned route, re-planning")
+
+        path, cost = route_planner.plan(graph)
+        if not path:
             return None, None
-        adj = {}
-        for i in range(L):
-            for j in range(3):
-                if nodes[i][j] is not None:
-                    adj.setdefault((i, j), [])
-        for i in range(L - 1):
-            for j in range(3):
-                if nodes[i][j] is not None:
-                    for nj in [j - 1, j, j + 1]:
-                        if 0 <= nj <= 2 and nodes[i + 1][nj] is not None:
-                            adj.setdefault((i, j), []).append((i + 1, nj))
-        for (a, b), (c, d) in connections:
-            if 0 <= a < L and 0 <= c < L and nodes[a][b] is not None and nodes[c][d] is not None:
-                if a + 1 == c:
-                    adj.setdefault((a, b), []).append((c, d))
-                elif c + 1 == a:
-                    adj.setdefault((c, d), []).append((a, b))
-        def dfs(i, j, seen):
-            if (i, j) in seen:
-                return float('inf')
-            cost = _COSTS.get(nodes[i][j], 52)
-            if i == L - 1:
-                return cost
-            children = [dfs(ni, nj, seen | {(i, j)}) for ni, nj in adj.get((i, j), []) if ni == i + 1]
-            return cost + (min(children) if children else 0)
-        best_j, best_cost = None, float('inf')
-        for j in range(3):
-            if nodes[0][j] is None:
-                continue
-            c = dfs(0, j, set())
-            if c < best_cost:
-                best_cost, best_j = c, j
-        return best_j, (nodes[0][best_j] if best_j is not None else None)
+        steps = [(row, graph.nodes[depth][row]) for depth, row in path]
+        if len(steps) > 1:
+            self._route = {"floor": self.current_floor_tracker, "anchor": steps[0][0], "steps": steps[1:]}
+        self.logger.info(f"Planned route: {steps} (cost {cost:.0f})")
+        return steps[0]
+
+    def _finish_node_timing(self):
+        # A node lasts from entering it until the floor map is back; times
+        # across a floor change would include the pack selection
+        entered = self._entered_node
+        self._entered_node = None
+        if entered is not None and entered[2] == self.current_floor_tracker:
+            route_planner.record(entered[0], time.time() - entered[1])
 
     def _gift_weighted_pack(self, candidates, pack_identities, screenshot):
         status_sel = getattr(shared_vars, 'status_selection', None)
@@ -1390,11 +1267,14 @@ class Mirror:
             return 0
         return 1 if has_zero else -1
 
+    @timeline.phase("navigation")
     def navigation(self, _depth=0):
         if _depth >= 2:
             self.logger.warning("Navigation: recursion limit reached, giving up")
             return
         self.logger.info("Navigating floor nodes")
+        if _depth == 0:
+            self._finish_node_timing()
         nav_threshold = 0.65 if self.res_x < 1920 else 0.8
         nav_x1 = common.scale_x_1080p(1100)
         nav_start_time = time.time()
@@ -1428,62 +1308,6 @@ class Mirror:
             common.mouse_move_click(*common.scale_coordinates_1080p(329, 710))
             common.sleep(1.5)
 
-        _COSTS = {"Event": 0, "Shop": 15, "Normal": 52, "Miniboss": 67,
-                  "Boss": 60, "Focused": 77, "Risky": 87}
-
-        NAV = "pictures/mirror/navigation"
-        row_half = common.scale_y_1080p(120)
-
-        def _build_coords(x_adj=0, y_adj=0):
-            return (
-                [common.scale_y_1080p(238)+y_adj, common.scale_y_1080p(513)+y_adj, common.scale_y_1080p(788)+y_adj],
-                [
-                    (common.scale_x_1080p(624)+x_adj,  common.scale_x_1080p(906)+x_adj),
-                    (common.scale_x_1080p(1004)+x_adj, common.scale_x_1080p(1286)+x_adj),
-                    (common.scale_x_1080p(1384)+x_adj, common.scale_x_1080p(1666)+x_adj),
-                ],
-                common.scale_x_1080p(765) + x_adj,
-            )
-
-        def _scan_nodes(screenshot, x_adj=0, y_adj=0):
-            row_y_local, depth_x_local, _ = _build_coords(x_adj, y_adj)
-            arrow_x1 = common.scale_x_1080p(350) + x_adj
-            arrow_x2 = common.scale_x_1080p(906) + x_adj
-            ROW_ARROW = [f"{NAV}/_up.png", f"{NAV}/_forward.png", f"{NAV}/_down.png"]
-            rr = [
-                i for i, (arrow_img, row_y) in enumerate(zip(ROW_ARROW, row_y_local))
-                if common.match_image(arrow_img, 0.75, screenshot=screenshot,
-                                      x1=arrow_x1, x2=arrow_x2,
-                                      y1=row_y - row_half, y2=row_y + row_half,
-                                      quiet_failure=True)
-            ]
-            if not rr:
-                rr = [0, 1, 2]
-
-            def _classify_at(x_min, x_max, row_y, scr):
-                kw = dict(screenshot=scr, x1=x_min, x2=x_max,
-                          y1=row_y - row_half, y2=row_y + row_half, quiet_failure=True)
-                kw_gray = dict(**kw, grayscale=True)
-                def has(paths, t, gray=False):
-                    kws = kw_gray if gray else kw
-                    return any(common.match_image(p, t, **kws) for p in paths)
-                if has([f"{NAV}/boss_ark.png", f"{NAV}/boss0.png", f"{NAV}/boss1.png", f"{NAV}/boss_highlighted.png"], 0.65): return "Boss"
-                if has([f"{NAV}/event_node.png"], 0.65, gray=True) or \
-                   has([f"{NAV}/event0.png", f"{NAV}/event1.png", f"{NAV}/event2.png"], 0.72): return "Event"
-                if has([f"{NAV}/shop0.png",    f"{NAV}/shop1.png",    f"{NAV}/shop_highlighted.png", f"{NAV}/super0.png",   f"{NAV}/super1.png"], 0.65): return "Shop"
-                if has([f"{NAV}/risk0.png",    f"{NAV}/risk1.png",    f"{NAV}/risk2.png"],    0.65): return "Risky"
-                if has([f"{NAV}/focus0.png",   f"{NAV}/focus1.png",   f"{NAV}/focus2.png",   f"{NAV}/focus3.png"], 0.65): return "Focused"
-                if has([f"{NAV}/coin.png"],                                                    0.80): return "Normal"
-                return None
-
-            nd = [[None] * 3 for _ in range(3)]
-            for depth in range(3):
-                x_min, x_max = depth_x_local[depth]
-                rows = range(3)
-                for row in rows:
-                    nd[depth][row] = _classify_at(x_min, x_max, row_y_local[row], screenshot)
-            return nd, rr
-
         nav_screenshot = common.capture_screen()
 
         x_adj = y_adj = 0
@@ -1498,33 +1322,33 @@ class Mirror:
             if abs(x_adj) > 10 or abs(y_adj) > 10:
                 self.logger.info(f"Camera drift: Dante at ({ax},{ay}), adjusting coords by ({x_adj},{y_adj})")
 
-        ROW_Y, _, FALLBACK_X = _build_coords(x_adj, y_adj)
-
-        connections = self._get_nav_connections(nav_screenshot, x_adj, y_adj)
-        self.logger.info(f"Connections detected: {connections}")
+        ROW_Y, _ = nav_vision.layout(x_adj, y_adj)
+        FALLBACK_X = common.scale_x_1080p(765) + x_adj
 
-        nodes, reachable_rows = _scan_nodes(nav_screenshot, x_adj, y_adj)
-        self.logger.info(f"Node matrix: {nodes}")
+        graph = nav_vision.scan(nav_screenshot, x_adj, y_adj)
+        self.logger.info(f"Connections detected: {graph.connections}")
+        self.logger.info(f"Node matrix: {graph.nodes}")
 
-        if all(n is None for n in nodes[0]):
+        if all(n is None for n in graph.nodes[0]):
             self.logger.warning("Depth-0 all None, retrying scan after 1s")
             common.sleep(1.0)
             nav_screenshot = common.capture_screen()
-            nodes, reachable_rows = _scan_nodes(nav_screenshot, x_adj, y_adj)
-            self.logger.info(f"Retry node matrix: {nodes}")
+            graph = nav_vision.scan(nav_screenshot, x_adj, y_adj, connections=graph.connections)
+            self.logger.info(f"Retry node matrix: {graph.nodes}")
 
-        best_row, best_type = self._dfs_best_first_step(nodes, connections)
+        best_row, best_type = self._plan_first_step(graph)
         if best_row is not None:
             classified = [((FALLBACK_X, ROW_Y[best_row]), best_type)]
-            self.logger.info(f"DFS best path: row {best_row} ({best_type})")
         else:
             classified = [
-                ((FALLBACK_X, ROW_Y[r]), nodes[0][r])
-                for r in reachable_rows
-                if nodes[0][r] is not None
+                ((FALLBACK_X, ROW_Y[r]), graph.nodes[0][r])
+                for r in graph.reachable_rows
+                if graph.nodes[0][r] is not None
             ]
-            classified.sort(key=lambda item: _COSTS.get(item[1], 52))
-            self.logger.warning(f"DFS found no path, falling back to cost sort: {classified}")
+            classified.sort(key=lambda item: route_planner.node_cost(item[1]))
+            self.logger.warning(f"No route found, falling back to cost sort: {classified}")
+
+        selected_type = None
 
         while not common.element_exist("pictures/mirror/general/nav_enter.png", threshold=nav_threshold, x1=nav_x1):
             if time.time() - nav_start_time > 180:
@@ -1535,29 +1359,30 @@ class Mirror:
                 return
 
             nav_found = False
-            for (x, y), _ in classified:
+            nav_enter = wait_engine.appears("pictures/mirror/general/nav_enter.png", threshold=nav_threshold, x1=nav_x1)
+            for (x, y), node_type in classified:
                 common.mouse_move_click(x, y)
-                common.sleep(1.5)
-                if common.element_exist("pictures/mirror/general/nav_enter.png", threshold=nav_threshold, x1=nav_x1):
+                if wait_engine.wait_until(nav_enter, timeout=1.5, site="mirror.nav_enter"):
                     nav_found = True
+                    selected_type = node_type
                     break
 
             if not nav_found:
                 self.logger.warning("Nav click failed, trying blind click fallback")
+                self._route = None
                 for row_y in ROW_Y:
                     common.mouse_move_click(FALLBACK_X, row_y)
-                    common.sleep(1.5)
-                    if common.element_exist("pictures/mirror/general/nav_enter.png", threshold=nav_threshold, x1=nav_x1):
+                    if wait_engine.wait_until(nav_enter, timeout=1.5, site="mirror.nav_enter"):
                         nav_found = True
                         break
 
             if not nav_found:
                 nav_screenshot = common.capture_screen()
-                renodes, reachable_rows = _scan_nodes(nav_screenshot, x_adj, y_adj)
-                re_row, re_type = self._dfs_best_first_step(renodes, connections)
+                regraph = nav_vision.scan(nav_screenshot, x_adj, y_adj, connections=graph.connections)
+                re_row, re_type = self._plan_first_step(regraph)
                 if re_row is not None:
                     classified = [((FALLBACK_X, ROW_Y[re_row]), re_type)]
-                    self.logger.info(f"Re-scan DFS: row {re_row} ({re_type})")
+                    self.logger.info(f"Re-scan route: row {re_row} ({re_type})")
                 else:
                     self.logger.warning("Re-scan found no path, recursing")
                     self.navigation(_depth=_depth + 1)
@@ -1566,12 +1391,15 @@ class Mirror:
         common.sleep(0.4)
         for _ in range(3):
             if common.click_matching("pictures/mirror/general/nav_enter.png", threshold=nav_threshold, recursive=False, x1=nav_x1):
+                if selected_type is not None:
+                    self._entered_node = (selected_type, time.time(), self.current_floor_tracker)
                 break
             common.sleep(0.3)
 
     def sell_gifts(self):
         for _ in range(3):
-            common.sleep(1)
+            wait_engine.wait_until(wait_engine.appears("pictures/mirror/restshop/market/vestige_2.png"),
+                                   timeout=1.0, site="mirror.sell_vestige")
             if common.click_matching("pictures/mirror/restshop/market/vestige_2.png", recursive=False):
                 common.click_matching("pictures/mirror/restshop/market/sell_b.png")
                 common.click_matching("pictures/general/confirm_w.png")
@@ -1798,12 +1626,14 @@ class Mirror:
         
         return exception_gifts
     
+    @timeline.phase("fusion")
     def fuse_gifts(self):
         self.logger.info("Starting gift fusion")
 
         def exit_fusion():
             if not common.click_matching("pictures/mirror/restshop/close.png", recursive=False):
-                common.sleep(1)
+                wait_engine.wait_until(wait_engine.appears("pictures/mirror/restshop/close.png"),
+                                       timeout=1.0, site="mirror.fusion_close")
                 if not common.click_matching("pictures/mirror/restshop/close.png", recursive=False):
                     common.key_press("esc")
             common.sleep(0.5)
@@ -1929,6 +1759,7 @@ class Mirror:
         
         exit_fusion()
                 
+    @timeline.phase("rest_shop")
     def rest_shop(self):
         self.logger.info("Entering rest shop logic")
         def leave_restshop():
@@ -2026,6 +1857,9 @@ class Mirror:
                                 offset_x, offset_y = common.scale_offset_1440p(25, 1)
                                 if common.luminence(x + offset_x, y + offset_y) < 2:
                                     continue
+                                # Head for the gift while the cost check runs;
+                                # the click itself waits for the move
+                                common.mouse_move_async(x, y)
                                 if common.element_exist("pictures/mirror/restshop/small_not.png"):
                                     break
                                 common.mouse_move_click(x, y)
@@ -2088,6 +1922,7 @@ class Mirror:
                 common.sleep(0.2)
         return True
 
+    @timeline.phase("enhancement")
     def enhance_gifts(self,status):
         self.logger.info("Starting gift enhancement")
 
@@ -2161,6 +1996,7 @@ class Mirror:
             if not scrolled and not gifts and not wordless_gifts:
                 break
 
+    @timeline.phase("event")
     def event_choice(self):
         self.logger.info("Handling event choice")
         if common.click_matching("pictures/events/level_up.png", recursive=False):
@@ -2180,8 +2016,8 @@ class Mirror:
                     break
                 if common.click_matching("pictures/events/continue.png", recursive=False):
                     break
-            common.sleep(1)
-            if common.element_exist("pictures/mirror/general/ego_gift_get.png"):
+            if wait_engine.wait_until(wait_engine.appears("pictures/mirror/general/ego_gift_get.png"),
+                                      timeout=1.0, site="mirror.event_gift"):
                 common.key_press("enter")
 
         elif common.click_matching("pictures/events/gain_check.png", recursive=False):
@@ -2215,8 +2051,8 @@ class Mirror:
                     break
                 if common.click_matching("pictures/events/continue.png", recursive=False):
                     break
-            common.sleep(1)
-            if common.element_exist("pictures/mirror/general/ego_gift_get.png"):
+            if wait_engine.wait_until(wait_engine.appears("pictures/mirror/general/ego_gift_get.png"),
+                                      timeout=1.0, site="mirror.event_gift"):
                 common.key_press("enter")
 
         elif common.click_matching("pictures/events/win_battle.png", recursive=False): 
@@ -2268,6 +2104,7 @@ class Mirror:
             battle()
             check_loading()
 
+    @timeline.phase("run_end")
     def victory(self):
         common.click_matching("pictures/general/confirm_w.png", recursive=False)
         common.click_matching("pictures/general/beeg_confirm.png")
@@ -2275,9 +2112,10 @@ class Mirror:
         common.click_matching("pictures/general/claim_rewards.png")
         common.sleep(1)
         common.click_matching("pictures/general/md_claim.png")
-        common.sleep(1)
+        wait_engine.wait_until(wait_engine.appears("pictures/general/confirm_b.png", quiet_failure=True),
+                               timeout=1.0, site="mirror.victory_claim")
         common.click_matching("pictures/general/confirm_b.png", recursive=False, quiet_failure=True)
-        common.sleep(0.5)
+        wait_engine.wait_until(wait_engine.appears("pictures/general/confirm_w.png"), timeout=0.5, site="mirror.victory_confirm")
         if common.click_matching("pictures/general/confirm_w.png", recursive=False):
             _wait_end = time.time() + 30
             while True:
@@ -2300,6 +2138,7 @@ class Mirror:
             self.logger.error("Insufficient modules")
             sys.exit(0)
 
+    @timeline.phase("run_end")
     def defeat(self):
         self.logger.info("Defeat detected. Checking for retry or forfeit options...")
         while True:
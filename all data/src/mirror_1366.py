@@ -7,6 +7,10 @@ import common
 import copy
 import shared_vars
 import mirror_utils_1366 as mirror_utils
+import pack_bank
+import feature_index
+import wait_engine
+from screen_classifier import ScreenClassifier
 from core import (skill_check, battle_check, battle, check_loading,
                   transition_loading, post_run_load, refill_enkephalin,
                   navigate_to_md)
@@ -25,7 +29,26 @@ os.chdir(BASE_PATH)
 
 logger = logging.getLogger(__name__)
 
-_orb_descriptor_cache = {}
+_FRAME_MAX_AGE = 0.3
+
+# Regions are 1080p boxes around where each screen's marker sits; rows
+# without one (markers that move between layouts) use the learned ROI
+_LOOP_STATES = ScreenClassifier([
+    ("maint", "pictures/1366/general/maint.png", (0, 200, 1920, 880)),
+    ("event_skip", "pictures/1366/events/skip.png", (640, 120, 1920, 900)),
+    ("event_proceed", "pictures/1366/events/proceed.png", (960, 540, 1920, 1080)),
+    ("battle", "pictures/1366/battle/winrate.png", (960, 540, 1920, 1080)),
+    ("navigation", "pictures/1366/mirror/general/danteh.png", (0, 0, 1280, 1080)),
+    ("squad_select", "pictures/1366/CustomAdded1080p/general/squads/clear_selection.png", (960, 0, 1920, 1080)),
+    ("reward_select", "pictures/1366/mirror/general/reward_select.png", (960, 0, 1920, 1080)),
+    ("ego_gift_get", "pictures/1366/mirror/general/ego_gift_get.png", (240, 0, 1680, 540)),
+    ("rest_shop", "pictures/1366/mirror/restshop/shop.png"),
+    ("rest_shop", "pictures/1366/mirror/restshop/super_shop.png"),
+    ("encounter_reward", "pictures/1366/mirror/general/encounter_reward.png", (240, 0, 1680, 540)),
+    ("event_effect", "pictures/1366/mirror/general/event_effect.png", (240, 0, 1680, 540)),
+    ("main_menu", "pictures/1366/general/module.png"),
+    ("main_menu", "pictures/1366/mirror/general/md_enter.png"),
+])
 
 class Mirror:
     def __init__(self, status):
@@ -68,26 +91,11 @@ class Mirror:
             template_path = f"pictures/1366/mirror/packs/{floor_name}.png"
             full_path = common.resource_path(template_path)
 
-            cache_key = (full_path, cv2.IMREAD_COLOR)
-            if cache_key in common._template_cache:
-                template = common._template_cache[cache_key]
-            else:
-                try:
-                    import numpy as np
-                    raw = np.fromfile(full_path, dtype=np.uint8)
-                    template = cv2.imdecode(raw, cv2.IMREAD_COLOR)
-                except Exception:
-                    template = None
-                if template is None:
-                    continue
-                common._template_cache[cache_key] = template
-
             base_w, base_h = common.get_template_reference_resolution(full_path)
             scale = min(common.EXPECTED_WIDTH / base_w, common.EXPECTED_HEIGHT / base_h)
-            if scale != 1.0:
-                scaled = cv2.resize(template, None, fx=scale, fy=scale, interpolation=cv2.INTER_LINEAR)
-            else:
-                scaled = template
+            scaled = common._get_scaled_template(full_path, cv2.IMREAD_COLOR, scale)
+            if scaled is None:
+                continue
 
             if scaled.shape[0] > screen.shape[0] or scaled.shape[1] > screen.shape[1]:
                 continue
@@ -232,7 +240,13 @@ class Mirror:
         return win_flag, run_complete, self.run_stats
 
     def mirror_loop(self):
-        if common.element_exist("pictures/1366/general/maint.png"):
+        with common.frame_context(max_age=_FRAME_MAX_AGE):
+            return self._mirror_loop_tick()
+
+    def _mirror_loop_tick(self):
+        screen_state = _LOOP_STATES.classify()
+
+        if "maint" in screen_state:
             common.click_matching("pictures/1366/general/close.png", recursive=False)
             common.sleep(0.5)
             common.click_matching("pictures/1366/general/no_op.png")
@@ -240,42 +254,42 @@ class Mirror:
             self.logger.critical("Server under maintenance")
             sys.exit(0)
 
-        if common.element_exist("pictures/1366/events/skip.png"):
+        if "event_skip" in screen_state:
             self.logger.info("Event skip button detected")
             common.mouse_move(*common.scale_coordinates_1080p(200, 200))
             common.click_skip(15)
             self.event_choice()
 
-        elif common.click_matching("pictures/1366/events/proceed.png", recursive=False):
+        elif "event_proceed" in screen_state and common.click_matching("pictures/1366/events/proceed.png", recursive=False):
             self.logger.info("Event proceed button detected")
             self.event_choice()
 
-        elif common.element_exist("pictures/1366/battle/winrate.png"):
+        elif "battle" in screen_state:
             self.logger.info("Battle winrate button detected")
             battle()
             check_loading()
 
-        elif common.element_exist("pictures/1366/mirror/general/danteh.png"):
+        elif "navigation" in screen_state:
             self.logger.info("Navigation screen detected (danteh)")
             self.navigation()
 
-        elif common.element_exist("pictures/1366/CustomAdded1080p/general/squads/clear_selection.png"):
+        elif "squad_select" in screen_state:
             self.logger.info("Squad selection for battle detected")
             self.squad_select()
 
-        elif common.element_exist("pictures/1366/mirror/general/reward_select.png"):
+        elif "reward_select" in screen_state:
             self.logger.info("Reward selection detected")
             self.reward_select()
 
-        elif common.element_exist("pictures/1366/mirror/general/ego_gift_get.png"):
+        elif "ego_gift_get" in screen_state:
             self.logger.info("EGO Gift acquisition detected")
             common.click_matching("pictures/1366/general/confirm_b.png")
 
-        elif common.element_exist("pictures/1366/mirror/restshop/shop.png") or common.element_exist("pictures/1366/mirror/restshop/super_shop.png"):
+        elif "rest_shop" in screen_state:
             self.logger.info("Rest shop detected")
             self.rest_shop()
 
-        elif common.element_exist("pictures/1366/mirror/general/encounter_reward.png"):
+        elif "encounter_reward" in screen_state:
             self.logger.info("Encounter reward detected")
             self.encounter_reward_select()
 
@@ -283,7 +297,7 @@ class Mirror:
             self.logger.info("Pack selection detected")
             self.pack_selection()
 
-        elif common.element_exist("pictures/1366/mirror/general/event_effect.png"):
+        elif "event_effect" in screen_state:
             self.logger.info("Event effect selection detected")
             found = common.match_image("pictures/1366/mirror/general/event_select.png", no_grayscale=True)
             x,y = common.random_choice(found)
@@ -291,7 +305,7 @@ class Mirror:
             common.sleep(1)
             common.click_matching("pictures/1366/general/confirm_b.png")
 
-        elif common.element_exist("pictures/1366/general/module.png") or common.element_exist("pictures/1366/mirror/general/md_enter.png"):
+        elif "main_menu" in screen_state:
             self.logger.info("Main menu detected in loop. Forcing run completion.")
             return 0, 1, self.run_stats
 
@@ -444,7 +458,7 @@ class Mirror:
                 if not common.element_exist(status):
                     for i in range(7):
                         common.mouse_scroll(-1000)
-                    common.sleep(1)
+                    wait_engine.wait_until(wait_engine.appears(status), timeout=1.0, site="mirror_1366.grace_status_scroll")
                     if common.click_matching(status, recursive=False):
                         break
                     continue
@@ -477,91 +491,33 @@ class Mirror:
 
         self.logger.debug(f"Screenshot: {actual_w}x{actual_h} | crop: x={min_x_scaled}-{max_x_scaled}, y={min_y_scaled}-{max_y_scaled}")
 
-        base_scale = min(actual_w / 1366.0, actual_h / 768.0)
-        scale_candidates = [base_scale * adj for adj in (1.00, 1.33, 0.87)]
-
         crop = screenshot[min_y_scaled:max_y_scaled, min_x_scaled:max_x_scaled]
         gray_crop = cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY) if len(crop.shape) == 3 else crop.copy()
 
         best_per_coord = {}
         excepted_visible_count = 0
 
-        all_packs = [f for f in os.listdir(floor_dir) if f.endswith(".png")]
+        pack_dir = os.path.relpath(floor_dir, BASE_PATH).replace(os.sep, "/")
+        bank = pack_bank.get_bank(pack_dir, (1366, 768), actual_w, actual_h)
+        scan_results, stopped_early = bank.scan(gray_crop, floor_priorities, exception_packs, fallback_threshold=0.55)
+        if stopped_early:
+            self.logger.debug("Top priority pack confirmed, skipping the rest of the pack scan")
 
-        for pack_file in all_packs:
-            pack_name = pack_file.replace(".png", "")
-            pack_rel_path = f"pictures/1366/mirror/packs/f{floor_char}/{pack_file}"
-            pack_abs_path = common.resource_path(pack_rel_path)
-            is_excepted = pack_name in exception_packs
-
-            threshold_adj = common.get_total_threshold_adjustment(pack_rel_path)
-
-            gray_key = (pack_abs_path, cv2.IMREAD_GRAYSCALE)
-            tmpl_gray_orig = common._template_cache.get(gray_key)
-            if tmpl_gray_orig is None:
-                try:
-                    with open(pack_abs_path, 'rb') as _f:
-                        raw = np.frombuffer(_f.read(), dtype=np.uint8)
-                    tmpl_gray_orig = cv2.imdecode(raw, cv2.IMREAD_GRAYSCALE)
-                except Exception as e:
-                    self.logger.warning(f"Failed to load template for pack '{pack_name}': {e}")
-                    tmpl_gray_orig = None
-                if tmpl_gray_orig is not None:
-                    common._template_cache[gray_key] = tmpl_gray_orig
-
-            if tmpl_gray_orig is None:
-                self.logger.warning(f"Template returned None for pack '{pack_name}', skipping")
-                continue
-
-            def _extract_matches_scored(res, thresh, box_w, box_h):
-                locs = np.where(res >= thresh)
-                if not locs[0].size:
-                    return []
-                boxes = np.array([
-                    [int(x), int(y), int(x + box_w), int(y + box_h)]
-                    for x, y in zip(locs[1], locs[0])
-                ])
-                kept = common.non_max_suppression_fast(boxes)
-                out = []
-                for b in kept:
-                    cx = int((b[0] + b[2]) / 2) + min_x_scaled
-                    cy = int((b[1] + b[3]) / 2) + min_y_scaled
-                    score = float(np.max(res[b[1]:b[3], b[0]:b[2]]))
-                    out.append(((cx, cy), score))
-                return out
-
-            def _multiscale_match(tmpl_orig, search_img):
-                best_res, best_score, best_th, best_tw = None, 0.0, 0, 0
-                for sf in scale_candidates:
-                    t = cv2.resize(tmpl_orig, None, fx=sf, fy=sf, interpolation=cv2.INTER_LINEAR) if sf != 1.0 else tmpl_orig
-                    if t.shape[0] > search_img.shape[0] or t.shape[1] > search_img.shape[1]:
-                        continue
-                    res = cv2.matchTemplate(search_img, t, cv2.TM_CCOEFF_NORMED)
-                    s = float(res.max()) if res.size > 0 else 0.0
-                    if s > best_score:
-                        best_score, best_res, best_th, best_tw = s, res, t.shape[0], t.shape[1]
-                return best_res, best_score, best_th, best_tw
-
-            g_res, best_score, g_th, g_tw = _multiscale_match(tmpl_gray_orig, gray_crop)
-            coord_scores = []
-            if g_res is not None:
-                if is_excepted:
-                    if _extract_matches_scored(g_res, 0.55 + threshold_adj, g_tw, g_th):
-                        excepted_visible_count += 1
-                        self.logger.debug(f"Excepted pack visible (score>{0.55+threshold_adj:.2f}), skipping: {pack_name}")
-                    else:
-                        self.logger.debug(f"Excepted pack not visible (score={best_score:.4f}), skipping: {pack_name}")
-                    continue
-                coord_scores = (_extract_matches_scored(g_res, 0.65 + threshold_adj, g_tw, g_th) or
-                                _extract_matches_scored(g_res, 0.55 + threshold_adj, g_tw, g_th))
-            elif is_excepted:
-                self.logger.debug(f"Excepted pack skipped (template too large for crop): {pack_name}")
+        for pack_name, (best_score, matches) in scan_results.items():
+            if pack_name in exception_packs:
+                if matches:
+                    excepted_visible_count += 1
+                    self.logger.debug(f"Excepted pack visible, skipping: {pack_name}")
+                elif best_score is None:
+                    self.logger.debug(f"Excepted pack skipped (template too large for crop): {pack_name}")
+                else:
+                    self.logger.debug(f"Excepted pack not visible (score={best_score:.4f}), skipping: {pack_name}")
                 continue
 
-            if not coord_scores:
-                self.logger.debug(f"Pack not detected: {pack_name} | score: {best_score:.4f}")
-
-            for coord, score in coord_scores:
+            if not matches:
+                self.logger.debug(f"Pack not detected: {pack_name} | score: {best_score or 0.0:.4f}")
+            for (cx, cy), score in matches:
+                coord = (cx + min_x_scaled, cy + min_y_scaled)
                 existing = best_per_coord.get(coord)
                 if existing is None or score > existing[0]:
                     best_per_coord[coord] = (score, pack_name)
@@ -575,47 +531,22 @@ class Mirror:
         best_per_coord = kept
 
         already_found_names = {v[1] for v in best_per_coord.values()}
-        if len(best_per_coord) < 5:
+        if len(best_per_coord) < 5 and not stopped_early:
             self.logger.debug(f"CCOEFF found {len(best_per_coord)} packs - running ORB secondary scan")
             try:
-                orb = cv2.ORB_create(nfeatures=500)
-                bf = cv2.BFMatcher(cv2.NORM_HAMMING, crossCheck=True)
+                orb = cv2.ORB_create(nfeatures=feature_index.ORB_FEATURES)
                 kp_crop, des_crop = orb.detectAndCompute(gray_crop, None)
                 if des_crop is not None:
                     orb_candidates = {}
                     crop_h, crop_w = gray_crop.shape[:2]
-                    for pack_file in all_packs:
-                        pack_name = pack_file.replace(".png", "")
-                        if pack_name in exception_packs or pack_name in already_found_names:
+                    index = feature_index.get_index(f"pictures/mirror/packs/f{floor_char}")
+                    votes = index.query(des_crop, exclude=set(exception_packs) | already_found_names)
+                    for pack_name, pairs in votes.items():
+                        if len(pairs) < 4:
                             continue
-                        pack_abs_path = common.resource_path(f"pictures/mirror/packs/f{floor_char}/{pack_file}")
-                        cached = _orb_descriptor_cache.get(pack_abs_path)
-                        if cached is None:
-                            gray_key = (pack_abs_path, cv2.IMREAD_GRAYSCALE)
-                            tmpl_orb = common._template_cache.get(gray_key)
-                            if tmpl_orb is None:
-                                try:
-                                    with open(pack_abs_path, 'rb') as _f:
-                                        raw = np.frombuffer(_f.read(), dtype=np.uint8)
-                                    tmpl_orb = cv2.imdecode(raw, cv2.IMREAD_GRAYSCALE)
-                                except Exception:
-                                    continue
-                                if tmpl_orb is None:
-                                    continue
-                                common._template_cache[gray_key] = tmpl_orb
-                            kp_tmpl, des_tmpl = orb.detectAndCompute(tmpl_orb, None)
-                            if des_tmpl is None:
-                                continue
-                            tmpl_h, tmpl_w = tmpl_orb.shape[:2]
-                            _orb_descriptor_cache[pack_abs_path] = (kp_tmpl, des_tmpl, tmpl_h, tmpl_w)
-                            cached = (kp_tmpl, des_tmpl, tmpl_h, tmpl_w)
-                        kp_tmpl, des_tmpl, tmpl_h, tmpl_w = cached
-                        matches = bf.match(des_tmpl, des_crop)
-                        good = [m for m in matches if m.distance < 50]
-                        if len(good) < 4:
-                            continue
-                        pts1 = np.float32([kp_tmpl[m.queryIdx].pt for m in good]).reshape(-1, 1, 2)
-                        pts2 = np.float32([kp_crop[m.trainIdx].pt for m in good]).reshape(-1, 1, 2)
+                        tmpl_h, tmpl_w = index.sizes[pack_name]
+                        pts1 = np.float32([pt for pt, _ in pairs]).reshape(-1, 1, 2)
+                        pts2 = np.float32([kp_crop[qi].pt for _, qi in pairs]).reshape(-1, 1, 2)
                         H, mask = cv2.findHomography(pts1, pts2, cv2.RANSAC, 5.0)
                         if H is None or mask is None:
                             continue
@@ -757,16 +688,23 @@ class Mirror:
             self.logger.debug(f"Found {len(selectable_packs_pos)} selectable packs")
 
             def robust_drag_pack(x, y):
-                common.mouse_move(x, y)
-                common.sleep(0.15)
-                common.mouse_down()
-                common.sleep(0.15)
+                # Queued as one input sequence; returns its Future so the
+                # caller can watch the screen while the drag plays
                 drag_offset = round(350 * common.EXPECTED_HEIGHT / common.REFERENCE_HEIGHT_1080P)
+                src_x, src_y = common.get_MonCords(x, y)
                 dest_x, dest_y = common.get_MonCords(x, y + drag_offset)
                 dest_x, dest_y = common.get_MonCords(x, y + 350)
-                common._bezier_move(dest_x, dest_y, duration=0.3)
-                common.sleep(0.15)
-                common.mouse_up()
+
+                def drag():
+                    common._bezier_move(src_x, src_y)
+                    common.sleep(0.15)
+                    common.mouse_down()
+                    common.sleep(0.15)
+                    common._bezier_move(dest_x, dest_y, duration=0.3)
+                    common.sleep(0.15)
+                    common.mouse_up()
+
+                return common.submit_input(drag)
 
             def select_pack(coords, name="unknown_pack"):
                 pack_name = name
@@ -784,16 +722,21 @@ class Mirror:
                 self.logger.info(f"Selected Pack: {pack_name} | Location: {detected_floor}")
 
                 x, y = coords
-                robust_drag_pack(x, y)
+                drag = robust_drag_pack(x, y)
                 self.run_stats["packs_by_floor"][floor] = pack_name
 
-                wait_start = time.time()
+                # Polling starts while the drag is still playing; the 5s
+                # window counts from when it has landed
+                wait_start = None
                 selection_confirmed = False
-                while time.time() - wait_start < 5:
+                while wait_start is None or time.time() - wait_start < 5:
+                    if wait_start is None and drag.done():
+                        wait_start = time.time()
                     if not self.is_pack_screen():
                         selection_confirmed = True
                         break
                     common.sleep(0.2)
+                drag.result()
 
                 if selection_confirmed:
                     if not self.run_stats["packs"] or self.run_stats["packs"][-1] != pack_name:
@@ -906,7 +849,7 @@ class Mirror:
                     if filtered:
                         bx, by = filtered[0]
                         self.logger.info(f"inpack fallback: dragging pack at ({bx}, {by})")
-                        robust_drag_pack(bx, by)
+                        robust_drag_pack(bx, by).result()
                         return
                 self.logger.error(f"inpack fallback also found nothing on {floor}. Stopping macro.")
                 raise RuntimeError(f"All visible packs are excepted on {floor}. Cannot select a pack.")
@@ -1018,7 +961,10 @@ class Mirror:
                 if common.click_matching(rewards, recursive=False, x1=min_x, y1=min_y, x2=max_x, y2=max_y):
                     clicked = True
                     common.click_matching("pictures/1366/general/confirm_b.png")
-                    common.sleep(1)
+                    wait_engine.wait_until(wait_engine.any_of(
+                        wait_engine.appears("pictures/1366/mirror/encounter_reward/prompt.png"),
+                        wait_engine.appears("pictures/1366/mirror/general/ego_gift_get.png"),
+                    ), timeout=1, site="mirror_1366.encounter_reward")
                     if common.element_exist("pictures/1366/mirror/encounter_reward/prompt.png"):
                         common.click_matching("pictures/1366/CustomAdded1080p/mirror/general/BorderedConfirm.png")
                         break
@@ -1128,10 +1074,10 @@ class Mirror:
                     common.element_exist("pictures/1366/general/victory.png")):
                     return
                 nav_found = False
+                nav_enter = wait_engine.appears("pictures/1366/mirror/general/nav_enter.png", threshold=nav_threshold, x1=nav_x1)
                 for x,y in node_location:
                     common.mouse_move_click(x, y)
-                    common.sleep(1)
-                    if common.element_exist("pictures/1366/mirror/general/nav_enter.png", threshold=nav_threshold, x1=nav_x1):
+                    if wait_engine.wait_until(nav_enter, timeout=1, site="mirror_1366.nav_enter"):
                         nav_found = True
                         break
 
@@ -1142,7 +1088,8 @@ class Mirror:
 
     def sell_gifts(self):
         for _ in range(3):
-            common.sleep(1)
+            wait_engine.wait_until(wait_engine.appears("pictures/1366/mirror/restshop/market/vestige_2.png"),
+                                   timeout=1.0, site="mirror_1366.sell_vestige")
             if common.click_matching("pictures/1366/mirror/restshop/market/vestige_2.png", recursive=False):
                 common.click_matching("pictures/1366/mirror/restshop/market/sell_b.png")
                 common.click_matching("pictures/1366/general/confirm_w.png")
@@ -1376,7 +1323,8 @@ class Mirror:
             if common.element_exist("pictures/1366/mirror/restshop/close.png"):
                 common.click_matching("pictures/1366/mirror/restshop/close.png", recursive=False)
             else:
-                common.sleep(1)
+                wait_engine.wait_until(wait_engine.appears("pictures/1366/mirror/restshop/close.png"),
+                                       timeout=1.0, site="mirror_1366.fusion_close")
                 common.click_matching("pictures/1366/mirror/restshop/close.png", recursive=False)
 
             common.sleep(0.5)
@@ -1579,6 +1527,9 @@ class Mirror:
                                 offset_x, offset_y = common.scale_offset_1440p(25, 1)
                                 if common.luminence(x + offset_x, y + offset_y) < 2:
                                     continue
+                                # Head for the gift while the cost check runs;
+                                # the click itself waits for the move
+                                common.mouse_move_async(x, y)
                                 if common.element_exist("pictures/1366/mirror/restshop/small_not.png"):
                                     break
                                 common.mouse_move_click(x, y)
@@ -1710,8 +1661,8 @@ class Mirror:
                     break
                 if common.click_matching("pictures/1366/events/continue.png", recursive=False):
                     break
-            common.sleep(1)
-            if common.element_exist("pictures/1366/mirror/general/ego_gift_get.png"):
+            if wait_engine.wait_until(wait_engine.appears("pictures/1366/mirror/general/ego_gift_get.png"),
+                                      timeout=1.0, site="mirror_1366.event_gift"):
                 common.key_press("enter")
 
         elif common.click_matching("pictures/1366/events/gain_check.png", recursive=False):
@@ -1744,8 +1695,8 @@ class Mirror:
                     break
                 if common.click_matching("pictures/1366/events/continue.png", recursive=False):
                     break
-            common.sleep(1)
-            if common.element_exist("pictures/1366/mirror/general/ego_gift_get.png"):
+            if wait_engine.wait_until(wait_engine.appears("pictures/1366/mirror/general/ego_gift_get.png"),
+                                      timeout=1.0, site="mirror_1366.event_gift"):
                 common.key_press("enter")
 
         elif common.click_matching("pictures/1366/events/win_battle.png", recursive=False):
@@ -1783,9 +1734,11 @@ class Mirror:
         common.click_matching("pictures/1366/general/claim_rewards.png")
         common.sleep(1)
         common.click_matching("pictures/1366/general/md_claim.png")
-        common.sleep(1)
+        wait_engine.wait_until(wait_engine.appears("pictures/1366/general/confirm_b.png", quiet_failure=True),
+                               timeout=1.0, site="mirror_1366.victory_claim")
         common.click_matching("pictures/1366/general/confirm_b.png", recursive=False, quiet_failure=True)
-        common.sleep(0.5)
+        wait_engine.wait_until(wait_engine.appears("pictures/1366/general/confirm_w.png"), timeout=0.5,
+                               site="mirror_1366.victory_confirm")
         if common.click_matching("pictures/1366/general/confirm_w.png", recursive=False):
             _wait_end = time.time() + 30
             while True:
@@ -17,6 +17,8 @@ class SharedVars:
         self.reconnection_delay = Value('i', 6)
         self.reconnect_when_internet_reachable = Value('b', False)
         self.good_pc_mode = Value('b', True)
+        self.pyramid_matching = Value('b', False)
+        self.capture_fps = Value('i', 0)
         self.click_delay = Value('f', 0.5)
         self.retry_count = Value('i', 0)
         self.claim_on_defeat = Value('b', False)
@@ -27,5 +29,6 @@ class SharedVars:
         self.threads_difficulty = Value('i', 4)
         self.stop_after_current_run = Value('b', False)
         self.convert_enkephalin_to_modules = Value('b', True)
+        self.sampling_profiler = Value('b', False)
         self.enable_animations = Value('b', True)
         self.audio_volume = Value('f', 0.5)
\ No newline at end of file
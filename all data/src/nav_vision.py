@@ -0,0 +1,346 @@
+import os
+import sys
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+import common
+import shared_vars
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------------------------------------------------------
+# Mirror Dungeon floor map vision
+# The map shows up to three depths by three rows of nodes, row arrows to the
+# left of them and up/down connection marks between the first columns. Rather
+# than cropping each of the nine cells and trying node templates one by one,
+# every template is matched once over the whole node band (arrows and
+# connections over their own bands) on a small thread pool, and each cell
+# reads the maximum of the response inside its own window. That is the same
+# score a per-cell crop would give, so each cell gets a score for every node
+# class and the class is picked in the usual priority order.
+#
+#   python nav_vision.py bench <frames dir or png> ... [--repeat N]
+# ---------------------------------------------------------------------------
+
+NAV = "pictures/mirror/navigation"
+
+# 1080p reference geometry of the floor map
+ROW_Y_1080P = (238, 513, 788)
+DEPTH_X_1080P = ((624, 906), (1004, 1286), (1384, 1666))
+ROW_HALF_1080P = 120
+ARROW_X_1080P = (350, 906)
+CONNECTION_REGION_1080P = (850, 280, 1460, 710)
+
+# (class, ((template, threshold, grayscale), ...)) in priority order
+NODE_CLASSES = (
+    ("Boss", ((f"{NAV}/boss_ark.png", 0.65, False), (f"{NAV}/boss0.png", 0.65, False),
+              (f"{NAV}/boss1.png", 0.65, False), (f"{NAV}/boss_highlighted.png", 0.65, False))),
+    ("Event", ((f"{NAV}/event_node.png", 0.65, True), (f"{NAV}/event0.png", 0.72, False),
+               (f"{NAV}/event1.png", 0.72, False), (f"{NAV}/event2.png", 0.72, False))),
+    ("Shop", ((f"{NAV}/shop0.png", 0.65, False), (f"{NAV}/shop1.png", 0.65, False),
+              (f"{NAV}/shop_highlighted.png", 0.65, False), (f"{NAV}/super0.png", 0.65, False),
+              (f"{NAV}/super1.png", 0.65, False))),
+    ("Risky", ((f"{NAV}/risk0.png", 0.65, False), (f"{NAV}/risk1.png", 0.65, False),
+               (f"{NAV}/risk2.png", 0.65, False))),
+    ("Focused", ((f"{NAV}/focus0.png", 0.65, False), (f"{NAV}/focus1.png", 0.65, False),
+                 (f"{NAV}/focus2.png", 0.65, False), (f"{NAV}/focus3.png", 0.65, False))),
+    ("Normal", ((f"{NAV}/coin.png", 0.80, False),)),
+)
+ROW_ARROWS = (f"{NAV}/_up.png", f"{NAV}/_forward.png", f"{NAV}/_down.png")
+ARROW_THRESHOLD = 0.75
+CONNECTION_TEMPLATES = (f"{NAV}/up.png", f"{NAV}/down.png")
+CONNECTION_THRESHOLD = 0.80
+
+_MAX_WORKERS = max(1, min(4, (os.cpu_count() or 1)))
+_executor = None
+_lock = threading.Lock()
+
+def _get_executor():
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=_MAX_WORKERS, thread_name_prefix="NavVision")
+        return _executor
+
+class FloorGraph:
+    def __init__(self, nodes, scores, connections, reachable_rows):
+        # nodes[depth][row] is a node class or None, scores[depth][row] maps
+        # every class to its best template score (None when nothing fit)
+        self.nodes = nodes
+        self.scores = scores
+        self.connections = connections
+        self.reachable_rows = reachable_rows
+
+    def edges(self):
+        # Forward edges between present nodes: neighbouring rows of the next
+        # depth plus any detected connection marks
+        nodes = self.nodes
+        L = len(nodes)
+        adj = {}
+        for i in range(L):
+            for j in range(3):
+                if nodes[i][j] is not None:
+                    adj.setdefault((i, j), [])
+        for i in range(L - 1):
+            for j in range(3):
+                if nodes[i][j] is not None:
+                    for nj in [j - 1, j, j + 1]:
+                        if 0 <= nj <= 2 and nodes[i + 1][nj] is not None:
+                            adj.setdefault((i, j), []).append((i + 1, nj))
+        for (a, b), (c, d) in self.connections:
+            if 0 <= a < L and 0 <= c < L and nodes[a][b] is not None and nodes[c][d] is not None:
+                if a + 1 == c:
+                    adj.setdefault((a, b), []).append((c, d))
+                elif c + 1 == a:
+                    adj.setdefault((c, d), []).append((a, b))
+        return adj
+
+    def __repr__(self):
+        return f"FloorGraph(nodes={self.nodes}, connections={self.connections}, rows={self.reachable_rows})"
+
+def layout(x_adj=0, y_adj=0):
+    row_y = [common.scale_y_1080p(y) + y_adj for y in ROW_Y_1080P]
+    depth_x = [(common.scale_x_1080p(x1) + x_adj, common.scale_x_1080p(x2) + x_adj) for x1, x2 in DEPTH_X_1080P]
+    return row_y, depth_x
+
+def _clamp(box, shape):
+    x1, y1, x2, y2 = box
+    height, width = shape[:2]
+    x1 = max(0, min(x1, width))
+    y1 = max(0, min(y1, height))
+    return x1, y1, max(x1, min(x2, width)), max(y1, min(y2, height))
+
+def _union(boxes):
+    return (min(b[0] for b in boxes), min(b[1] for b in boxes),
+            max(b[2] for b in boxes), max(b[3] for b in boxes))
+
+def _window_max(res, box, origin, template_shape):
+    # Best score among placements lying fully inside box, which is what
+    # matching a crop of box would return
+    th, tw = template_shape[:2]
+    ox, oy = origin
+    x1, y1, x2, y2 = box
+    rx1, ry1 = x1 - ox, y1 - oy
+    rx2, ry2 = x2 - ox - tw + 1, y2 - oy - th + 1
+    if rx2 <= rx1 or ry2 <= ry1:
+        return None
+    return float(res[ry1:ry2, rx1:rx2].max())
+
+class _Band:
+    def __init__(self, screenshot, box):
+        self.box = box
+        self.origin = (box[0], box[1])
+        x1, y1, x2, y2 = box
+        self.color = screenshot[y1:y2, x1:x2]
+        if len(self.color.shape) == 2:
+            self.color = cv2.cvtColor(self.color, cv2.COLOR_GRAY2BGR)
+        self.gray = cv2.cvtColor(self.color, cv2.COLOR_BGR2GRAY)
+
+    def image(self, grayscale):
+        return self.gray if grayscale else self.color
+
+def _match(band, template, grayscale):
+    image = band.image(grayscale)
+    if template is None or template.shape[0] > image.shape[0] or template.shape[1] > image.shape[1]:
+        return None
+    return cv2.matchTemplate(image, template, cv2.TM_CCOEFF_NORMED)
+
+def _scaled(template_path, grayscale, scale):
+    flag = cv2.IMREAD_GRAYSCALE if grayscale else cv2.IMREAD_COLOR
+    return common._get_scaled_template(common.resource_path(template_path), flag, scale)
+
+def scan(screenshot, x_adj=0, y_adj=0, connections=None):
+    # One pass over the floor map. Pass connections to reuse the ones found
+    # earlier on the same floor.
+    row_y, depth_x = layout(x_adj, y_adj)
+    row_half = common.scale_y_1080p(ROW_HALF_1080P)
+    scale = min(common.EXPECTED_WIDTH / common.REFERENCE_WIDTH_1080P, common.EXPECTED_HEIGHT / common.REFERENCE_HEIGHT_1080P)
+    prefer_gray = shared_vars.convert_images_to_grayscale
+
+    cells = [[_clamp((x_min, y - row_half, x_max, y + row_half), screenshot.shape) for y in row_y]
+             for x_min, x_max in depth_x]
+    arrow_x1 = common.scale_x_1080p(ARROW_X_1080P[0]) + x_adj
+    arrow_x2 = common.scale_x_1080p(ARROW_X_1080P[1]) + x_adj
+    arrow_boxes = [_clamp((arrow_x1, y - row_half, arrow_x2, y + row_half), screenshot.shape) for y in row_y]
+    node_band = _Band(screenshot, _union([box for column in cells for box in column]))
+    arrow_band = _Band(screenshot, _union(arrow_boxes))
+
+    jobs = []
+    for class_name, templates in NODE_CLASSES:
+        for template_path, threshold, gray in templates:
+            grayscale = gray or prefer_gray
+            jobs.append(("node", class_name, template_path, threshold, node_band, grayscale,
+                         _scaled(template_path, grayscale, scale)))
+    for row, template_path in enumerate(ROW_ARROWS):
+        jobs.append(("arrow", row, template_path, ARROW_THRESHOLD, arrow_band, prefer_gray,
+                     _scaled(template_path, prefer_gray, scale)))
+
+    conn_band = None
+    if connections is None:
+        rx1 = common.scale_x_1080p(CONNECTION_REGION_1080P[0]) + x_adj
+        ry1 = common.scale_y_1080p(CONNECTION_REGION_1080P[1]) + y_adj
+        rx2 = common.scale_x_1080p(CONNECTION_REGION_1080P[2]) + x_adj
+        ry2 = common.scale_y_1080p(CONNECTION_REGION_1080P[3]) + y_adj
+        conn_box = _clamp((rx1, ry1, rx2, ry2), screenshot.shape)
+        if conn_box[2] > conn_box[0] and conn_box[3] > conn_box[1]:
+            conn_band = _Band(screenshot, conn_box)
+            for direction, template_path in enumerate(CONNECTION_TEMPLATES):
+                # The connection marks are matched at their native size
+                template = common._load_template(common.resource_path(template_path), cv2.IMREAD_GRAYSCALE)
+                jobs.append(("connection", direction, template_path, CONNECTION_THRESHOLD, conn_band, True, template))
+
+    if _MAX_WORKERS > 1:
+        responses = list(_get_executor().map(lambda job: _match(job[4], job[6], job[5]), jobs))
+    else:
+        responses = [_match(job[4], job[6], job[5]) for job in jobs]
+
+    scores = [[{class_name: None for class_name, _ in NODE_CLASSES} for _ in range(3)] for _ in range(3)]
+    hits = [[set() for _ in range(3)] for _ in range(3)]
+    reachable_rows = []
+    found_connections = []
+    for job, res in zip(jobs, responses):
+        kind, key, template_path, threshold, band, _, template = job
+        if res is None:
+            continue
+        threshold = common.get_effective_threshold(template_path, threshold, scale) if kind != "connection" else threshold
+        if kind == "node":
+            for depth in range(3):
+                for row in range(3):
+                    score = _window_max(res, cells[depth][row], band.origin, template.shape)
+                    if score is None:
+                        continue
+                    best = scores[depth][row][key]
+                    if best is None or score > best:
+                        scores[depth][row][key] = score
+                    if score >= threshold:
+                        hits[depth][row].add(key)
+        elif kind == "arrow":
+            score = _window_max(res, arrow_boxes[key], band.origin, template.shape)
+            if score is not None and score >= threshold:
+                reachable_rows.append(key)
+        else:
+            rx1, ry1, rx2, ry2 = band.box
+            rh, rw = ry2 - ry1, rx2 - rx1
+            ch = max(1, int(0.216 * rh))
+            cw = max(1, int(0.492 * rw))
+            quads = [
+                (rx1, ry1, rx1 + cw, ry1 + ch),
+                (rx2 - cw, ry1, rx2, ry1 + ch),
+                (rx1, ry2 - ch, rx1 + cw, ry2),
+                (rx2 - cw, ry2 - ch, rx2, ry2),
+            ]
+            for i, quad in enumerate(quads):
+                score = _window_max(res, quad, band.origin, template.shape)
+                if score is not None and score >= threshold:
+                    found_connections.append((i, key))
+
+    nodes = [[next((name for name, _ in NODE_CLASSES if name in hits[depth][row]), None) for row in range(3)]
+             for depth in range(3)]
+    if connections is None:
+        connections = [((i % 2, (i // 2) + 1 - j), (i % 2 + 1, (i // 2) + j)) for i, j in sorted(found_connections)]
+    return FloorGraph(nodes, scores, connections, sorted(reachable_rows) or [0, 1, 2])
+
+def legacy_scan(screenshot, x_adj=0, y_adj=0):
+    # Cell-by-cell matching through common.match_image, as navigation did
+    # before this module; kept as the reference for bench()
+    row_y, depth_x = layout(x_adj, y_adj)
+    row_half = common.scale_y_1080p(ROW_HALF_1080P)
+    arrow_x1 = common.scale_x_1080p(ARROW_X_1080P[0]) + x_adj
+    arrow_x2 = common.scale_x_1080p(ARROW_X_1080P[1]) + x_adj
+    rr = [row for row, (arrow, y) in enumerate(zip(ROW_ARROWS, row_y))
+          if common.match_image(arrow, ARROW_THRESHOLD, screenshot=screenshot, x1=arrow_x1, x2=arrow_x2,
+                                y1=y - row_half, y2=y + row_half, quiet_failure=True)]
+
+    nodes = [[None] * 3 for _ in range(3)]
+    for depth, (x_min, x_max) in enumerate(depth_x):
+        for row, y in enumerate(row_y):
+            kw = dict(screenshot=screenshot, x1=x_min, x2=x_max, y1=y - row_half, y2=y + row_half, quiet_failure=True)
+            for class_name, templates in NODE_CLASSES:
+                if any(common.match_image(path, threshold, grayscale=gray, **kw) for path, threshold, gray in templates):
+                    nodes[depth][row] = class_name
+                    break
+
+    rx1 = max(0, common.scale_x_1080p(CONNECTION_REGION_1080P[0]) + x_adj)
+    ry1 = max(0, common.scale_y_1080p(CONNECTION_REGION_1080P[1]) + y_adj)
+    rx2 = min(screenshot.shape[1], common.scale_x_1080p(CONNECTION_REGION_1080P[2]) + x_adj)
+    ry2 = min(screenshot.shape[0], common.scale_y_1080p(CONNECTION_REGION_1080P[3]) + y_adj)
+    region = screenshot[ry1:ry2, rx1:rx2]
+    connections = []
+    if region.size:
+        rh, rw = region.shape[:2]
+        ch = max(1, int(0.216 * rh))
+        cw = max(1, int(0.492 * rw))
+        quads = [region[0:ch, 0:cw], region[0:ch, rw-cw:rw], region[rh-ch:rh, 0:cw], region[rh-ch:rh, rw-cw:rw]]
+        for i, quad in enumerate(quads):
+            src = cv2.cvtColor(quad, cv2.COLOR_BGR2GRAY) if len(quad.shape) == 3 else quad
+            for j, template_path in enumerate(CONNECTION_TEMPLATES):
+                template = cv2.imread(common.resource_path(template_path), cv2.IMREAD_GRAYSCALE)
+                if template is None or template.shape[0] > src.shape[0] or template.shape[1] > src.shape[1]:
+                    continue
+                if cv2.matchTemplate(src, template, cv2.TM_CCOEFF_NORMED).max() >= CONNECTION_THRESHOLD:
+                    connections.append(((i % 2, (i // 2) + 1 - j), (i % 2 + 1, (i // 2) + j)))
+    return FloorGraph(nodes, None, connections, rr or [0, 1, 2])
+
+def _frame_files(paths):
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            frames_dir = os.path.join(path, "frames")
+            directory = frames_dir if os.path.isdir(frames_dir) else path
+            files.extend(os.path.join(directory, f) for f in sorted(os.listdir(directory)) if f.endswith(".png"))
+        elif path.endswith(".png"):
+            files.append(path)
+    return files
+
+def _percentile(values, pct):
+    return float(np.percentile(values, pct)) if values else 0.0
+
+def bench(paths, repeat=3):
+    # Latency of scan() against legacy_scan() on recorded floor screenshots,
+    # plus every frame where the two disagree
+    files = _frame_files(paths)
+    if not files:
+        raise ValueError("No floor screenshots given")
+    timings = {"legacy": [], "batched": []}
+    differences = []
+    for path in files:
+        frame = cv2.imdecode(np.fromfile(path, dtype=np.uint8), cv2.IMREAD_COLOR)
+        if frame is None:
+            continue
+        common.set_monitor_size(frame.shape[1], frame.shape[0])
+        for _ in range(repeat):
+            for name, function in (("legacy", legacy_scan), ("batched", scan)):
+                started = time.perf_counter()
+                graph = function(frame)
+                timings[name].append((time.perf_counter() - started) * 1000.0)
+                if name == "legacy":
+                    legacy = graph
+        if (graph.nodes, sorted(graph.connections), graph.reachable_rows) != \
+                (legacy.nodes, sorted(legacy.connections), legacy.reachable_rows):
+            differences.append((path, legacy, graph))
+
+    print(f"{len(files)} frames, {repeat} runs each")
+    for name, values in timings.items():
+        print(f"{name:8} p50 {_percentile(values, 50):8.2f} ms   p95 {_percentile(values, 95):8.2f} ms")
+    for path, legacy, graph in differences:
+        print(f"  {os.path.basename(path)}:\n    legacy  {legacy}\n    batched {graph}")
+    return timings, differences
+
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description="Mirror floor map vision")
+    sub = parser.add_subparsers(dest="command", required=True)
+    bench_parser = sub.add_parser("bench")
+    bench_parser.add_argument("paths", nargs="+", help="floor screenshots, folders of them or frame_replay sessions")
+    bench_parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args(argv)
+    bench(args.paths, args.repeat)
+
+if __name__ == "__main__":
+    os.environ.setdefault("WORKERBEE_DRY_INPUT", "1")
+    sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+    main()
@@ -0,0 +1,75 @@
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------------------------------------------------------
+# Shared EasyOCR reader
+# One reader per process, loaded on first use or by warm_up() in the
+# background when a runner starts. Results are cached by a hash of the image
+# crop so re-reading an unchanged strip costs nothing.
+# ---------------------------------------------------------------------------
+
+_RESULT_CACHE_SIZE = 128
+
+_reader = None
+_reader_failed = False
+_reader_lock = threading.Lock()
+_result_cache = OrderedDict()
+_result_lock = threading.Lock()
+
+def get_reader():
+    global _reader, _reader_failed
+    if _reader is not None or _reader_failed:
+        return _reader
+    with _reader_lock:
+        if _reader is None and not _reader_failed:
+            logger.info("Loading EasyOCR model (first use, may take a moment)...")
+            try:
+                import easyocr
+                _reader = easyocr.Reader(['en'], gpu=False, verbose=False)
+                logger.info("EasyOCR model loaded")
+            except Exception as e:
+                import traceback
+                _reader_failed = True
+                logger.error(f"Failed to load OCR: {e}\n{traceback.format_exc()}")
+    return _reader
+
+def available():
+    return get_reader() is not None
+
+def warm_up():
+    if _reader is not None or _reader_failed:
+        return
+    threading.Thread(target=get_reader, name="OCRWarmUp", daemon=True).start()
+
+def _image_key(image):
+    image = np.ascontiguousarray(image)
+    digest = hashlib.blake2b(image.data, digest_size=16).hexdigest()
+    return digest, image.shape
+
+def read_boxes(image):
+    key = _image_key(image)
+    with _result_lock:
+        cached = _result_cache.get(key)
+        if cached is not None:
+            _result_cache.move_to_end(key)
+            return list(cached)
+
+    reader = get_reader()
+    if reader is None:
+        raise RuntimeError("OCR reader unavailable")
+    results = reader.readtext(image)
+
+    with _result_lock:
+        _result_cache[key] = tuple(results)
+        if len(_result_cache) > _RESULT_CACHE_SIZE:
+            _result_cache.popitem(last=False)
+    return results
+
+def read_text(image):
+    return [text for _, text, _ in read_boxes(image)]
@@ -0,0 +1,144 @@
+import os
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+import cv2
+import common
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------------------------------------------------------
+# Compiled pack template bank for the pack selection screen
+# One bank per pack folder and frame size, built on first use: the folder is
+# listed once and every pack template is kept in grayscale at each of the
+# scan scales. A scan matches all packs against the crop on a thread pool
+# (matchTemplate releases the GIL) in priority order and stops early once the
+# single best-ranked priority pack is confirmed, since pack_selection picks
+# it regardless of what else is on screen.
+# ---------------------------------------------------------------------------
+
+SCALE_ADJUSTMENTS = (1.00, 1.33, 0.87)
+EARLY_STOP_SCORE = 0.85
+
+EXCEPTED_THRESHOLD = 0.55
+MATCH_THRESHOLD = 0.65
+
+_MAX_WORKERS = max(1, min(4, (os.cpu_count() or 1)))
+_executor = None
+_banks = {}
+_lock = threading.Lock()
+
+def _get_executor():
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=_MAX_WORKERS, thread_name_prefix="PackBank")
+        return _executor
+
+class PackBank:
+    def __init__(self, pack_dir, reference_size, frame_width, frame_height):
+        self.pack_dir = pack_dir
+        reference_width, reference_height = reference_size
+        base_scale = min(frame_width / reference_width, frame_height / reference_height)
+        self.scales = [base_scale * adj for adj in SCALE_ADJUSTMENTS]
+        self.packs = {}
+
+        full_dir = common.resource_path(pack_dir)
+        names = sorted(f[:-4] for f in os.listdir(full_dir) if f.endswith(".png")) if os.path.isdir(full_dir) else []
+        for name in names:
+            rel_path = f"{pack_dir}/{name}.png"
+            original = common._load_template(common.resource_path(rel_path), cv2.IMREAD_GRAYSCALE)
+            if original is None:
+                logger.warning(f"Template returned None for pack '{name}', skipping")
+                continue
+            templates = [cv2.resize(original, None, fx=sf, fy=sf, interpolation=cv2.INTER_LINEAR) if sf != 1.0 else original
+                         for sf in self.scales]
+            self.packs[name] = (rel_path, templates)
+        logger.debug(f"Pack bank built for {pack_dir}: {len(self.packs)} packs at {frame_width}x{frame_height}")
+
+    def names(self):
+        return list(self.packs)
+
+    def _match_pack(self, name, gray_crop, excepted, fallback_threshold):
+        rel_path, templates = self.packs[name]
+        best_res, best_score, best_h, best_w = None, 0.0, 0, 0
+        for template in templates:
+            if template.shape[0] > gray_crop.shape[0] or template.shape[1] > gray_crop.shape[1]:
+                continue
+            res = cv2.matchTemplate(gray_crop, template, cv2.TM_CCOEFF_NORMED)
+            score = float(res.max()) if res.size > 0 else 0.0
+            if score > best_score:
+                best_res, best_score, best_h, best_w = res, score, template.shape[0], template.shape[1]
+        if best_res is None:
+            return name, None, []
+
+        threshold_adj = common.get_total_threshold_adjustment(rel_path)
+        thresholds = (EXCEPTED_THRESHOLD,) if excepted else (MATCH_THRESHOLD, fallback_threshold)
+        for threshold in thresholds:
+            kept, scores = common.match_peaks(best_res, threshold + threshold_adj, best_w, best_h)
+            if len(kept):
+                matches = [((int((b[0] + b[2]) / 2), int((b[1] + b[3]) / 2)), float(s)) for b, s in zip(kept, scores)]
+                return name, best_score, matches
+        return name, best_score, []
+
+    def scan(self, gray_crop, priorities, exceptions, fallback_threshold=0.50, early_stop_score=EARLY_STOP_SCORE):
+        # Returns ({name: (best_score or None, [((cx, cy), score), ...])} in
+        # crop coordinates, stopped_early). None means no scale of the
+        # template fits the crop.
+        priorities = priorities or {}
+        exceptions = set(exceptions or [])
+
+        def rank(name):
+            if name in exceptions:
+                return (2, 0)
+            if name in priorities:
+                return (0, priorities[name])
+            return (1, 0)
+        order = sorted(self.packs, key=rank)
+
+        top_pack = None
+        ranked = sorted((priorities[name], name) for name in self.packs if name in priorities and name not in exceptions)
+        if ranked and (len(ranked) == 1 or ranked[0][0] != ranked[1][0]):
+            top_pack = ranked[0][1]
+
+        results = {}
+        stopped_early = False
+        if _MAX_WORKERS > 1 and len(order) > 1:
+            executor = _get_executor()
+            pending = {executor.submit(self._match_pack, name, gray_crop, name in exceptions, fallback_threshold)
+                       for name in order}
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name, score, matches = future.result()
+                    results[name] = (score, matches)
+                    if name == top_pack and any(s >= early_stop_score for _, s in matches):
+                        stopped_early = True
+                if stopped_early:
+                    for future in pending:
+                        future.cancel()
+                    break
+        else:
+            for name in order:
+                name, score, matches = self._match_pack(name, gray_crop, name in exceptions, fallback_threshold)
+                results[name] = (score, matches)
+                if name == top_pack and any(s >= early_stop_score for _, s in matches):
+                    stopped_early = True
+                    break
+
+        return results, stopped_early
+
+def get_bank(pack_dir, reference_size, frame_width, frame_height):
+    key = (pack_dir, reference_size, frame_width, frame_height)
+    with _lock:
+        bank = _banks.get(key)
+    if bank is None:
+        bank = PackBank(pack_dir, reference_size, frame_width, frame_height)
+        with _lock:
+            bank = _banks.setdefault(key, bank)
+    return bank
+
+def clear():
+    with _lock:
+        _banks.clear()
@@ -0,0 +1,121 @@
+import math
+import random
+import logging
+import threading
+
+import numpy as np
+import profiles
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------------------------------------------------------
+# Precomputed mouse path pool
+# Humanized paths are synthesized ahead of time on a background thread, per
+# macro profile and per distance bucket, and stored normalized: start at
+# (0, 0), end at (1, 0). A move pops one shape and places it onto the real
+# start and target with one rotate-and-scale in NumPy (mirrored half of the
+# time), so a move starts without waiting on the path generator. Shapes are
+# used once; a bucket running low is refilled in the background, and a
+# bucket that is empty makes the caller synthesize inline as before.
+# ---------------------------------------------------------------------------
+
+# Shapes keep the feel of the distance they were generated at (point count,
+# overshoot size), so each move draws from the nearest bucket
+DISTANCE_BUCKETS = (120, 320, 700, 1400)
+POOL_SIZE = 24
+REFILL_BELOW = 8
+CANVAS = (1920, 1080)
+
+def bucket_for(distance):
+    distance = max(distance, 1.0)
+    return min(DISTANCE_BUCKETS, key=lambda b: abs(math.log(distance / b)))
+
+def place(shape, sx, sy, ex, ey, mirror=False):
+    dx, dy = ex - sx, ey - sy
+    u = shape[:, 0]
+    v = -shape[:, 1] if mirror else shape[:, 1]
+    points = np.empty_like(shape)
+    points[:, 0] = sx + u * dx - v * dy
+    points[:, 1] = sy + u * dy + v * dx
+    points = np.maximum(np.rint(points), 0).astype(np.int64)
+    return [tuple(p) for p in points.tolist()]
+
+class PathPool:
+    def __init__(self, synthesize, pool_size=POOL_SIZE):
+        # synthesize(sx, sy, ex, ey, profile, canvas) -> [(x, y), ...]
+        self.synthesize = synthesize
+        self.pool_size = pool_size
+        self._shapes = {}
+        self._wanted = []
+        self._seen = set()
+        self._cond = threading.Condition()
+        self._thread = None
+
+    def _request(self, key):
+        # Caller holds self._cond
+        if key not in self._wanted:
+            self._wanted.append(key)
+            self._cond.notify()
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="PathPool", daemon=True)
+            self._thread.start()
+
+    def warm(self, profile_name):
+        with self._cond:
+            self._seen.add(profile_name)
+            for bucket in DISTANCE_BUCKETS:
+                self._request((profile_name, bucket))
+
+    def take(self, profile_name, sx, sy, ex, ey):
+        # Returns the placed path, or None when the bucket is empty
+        if profile_name not in self._seen:
+            self.warm(profile_name)
+        key = (profile_name, bucket_for(math.hypot(ex - sx, ey - sy)))
+        with self._cond:
+            shapes = self._shapes.get(key)
+            shape = shapes.pop() if shapes else None
+            if not shapes or len(shapes) < REFILL_BELOW:
+                self._request(key)
+        if shape is None:
+            return None
+        return place(shape, sx, sy, ex, ey, mirror=random.random() < 0.5)
+
+    def size(self, profile_name=None):
+        with self._cond:
+            return sum(len(shapes) for (name, _), shapes in self._shapes.items()
+                       if profile_name is None or name == profile_name)
+
+    def _generate(self, profile_name, bucket):
+        sx = (CANVAS[0] - bucket) // 2
+        sy = CANVAS[1] // 2
+        points = self.synthesize(sx, sy, sx + bucket, sy, profiles.get_profile(profile_name), CANVAS)
+        if len(points) < 2:
+            return None
+        shape = np.asarray(points, dtype=np.float32)
+        shape -= (sx, sy)
+        shape /= bucket
+        return shape
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._wanted:
+                    self._cond.wait()
+                key = self._wanted[0]
+                if len(self._shapes.get(key, ())) >= self.pool_size:
+                    self._wanted.pop(0)
+                    continue
+
+            try:
+                shape = self._generate(*key)
+            except Exception as e:
+                logger.debug(f"Path synthesis for {key} failed: {e}")
+                shape = None
+
+            with self._cond:
+                if shape is None:
+                    # Left to the inline path until a later take asks again
+                    if key in self._wanted:
+                        self._wanted.remove(key)
+                    continue
+                self._shapes.setdefault(key, []).append(shape)
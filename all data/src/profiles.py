@@ -63,13 +63,16 @@ _rhythm_lock = threading.Lock()
 _rhythm_counter = 0
 _rhythm_next = random.randint(*PROFILES[_DEFAULT]["rhythm_every"])
 
-def get_profile(name=None):
+def active_name(name=None):
     try:
         import shared_vars
         key = (name or getattr(shared_vars, "macro_profile", _DEFAULT)).upper()
     except Exception:
         key = _DEFAULT
-    return PROFILES.get(key, PROFILES[_DEFAULT])
+    return key if key in PROFILES else _DEFAULT
+
+def get_profile(name=None):
+    return PROFILES[active_name(name)]
 
 def rhythm_tick():
     global _rhythm_counter, _rhythm_next
@@ -0,0 +1,187 @@
+import os
+import json
+import time
+import atexit
+import logging
+import threading
+
+import shared_vars
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------------------------------------------------------
+# Region-of-interest registry
+# Regions are stored in 1080p reference coordinates so they survive monitor
+# and resolution changes. Hand-written regions live in
+# config/template_regions.json; regions learned from real matches are kept in
+# config/template_regions_learned.json and only used once a template has been
+# seen often enough. A learned entry is [x1, y1, x2, y2, samples, instances].
+# Templates that ever matched more than once in a frame (gifts, packs, shop
+# items) get no learned region, since a crop would drop the copies outside
+# it. Every verify_interval seconds a query also runs on the full frame even
+# when its region had hits, which is how a second copy gets noticed. A miss
+# in the region that the full-frame fallback then finds means the element
+# has moved, so the learned region is dropped and learned again from scratch.
+# ---------------------------------------------------------------------------
+
+LEARNED_PATH = os.path.join(shared_vars.BASE_PATH, "config", "template_regions_learned.json")
+
+_DEFAULTS = {
+    "enabled": True,
+    "learn": True,
+    "padding": 48,
+    "min_samples": 5,
+    "fallback_interval": 2.0,
+    "verify_interval": 10.0,
+    "save_interval": 60.0,
+}
+
+_lock = threading.Lock()
+_learned = None
+_dirty = False
+_last_save = 0.0
+_last_fallback = {}
+_last_verify = {}
+_dropped = set()
+_learning_override = None
+
+def _settings():
+    return shared_vars.ConfigCache.get_config("template_regions")
+
+def _setting(name):
+    return _settings().get(name, _DEFAULTS[name])
+
+def enabled():
+    return bool(_setting("enabled"))
+
+def learning():
+    if _learning_override is not None:
+        return _learning_override
+    return bool(_setting("learn"))
+
+def set_learning(enabled):
+    global _learning_override
+    _learning_override = enabled
+
+def _read_learned():
+    try:
+        if os.path.exists(LEARNED_PATH):
+            with open(LEARNED_PATH, 'r') as f:
+                return json.load(f)
+    except Exception as e:
+        logger.warning(f"Could not read learned template regions: {e}")
+    return {}
+
+def _instances(entry):
+    # Entries saved before instances were tracked have five fields
+    return entry[5] if len(entry) > 5 else 1
+
+def _ensure_loaded():
+    global _learned
+    if _learned is None:
+        _learned = _read_learned()
+
+def get_region(template_path):
+    region = _settings().get("regions", {}).get(template_path)
+    if region is None:
+        with _lock:
+            _ensure_loaded()
+            entry = _learned.get(template_path)
+        if entry is None or entry[4] < _setting("min_samples") or _instances(entry) > 1:
+            return None
+        region = entry[:4]
+
+    padding = _setting("padding")
+    x1, y1, x2, y2 = region
+    return x1 - padding, y1 - padding, x2 + padding, y2 + padding
+
+def record(template_path, box, instances=1):
+    global _dirty
+    x1, y1, x2, y2 = (int(round(v)) for v in box)
+    with _lock:
+        _ensure_loaded()
+        entry = _learned.get(template_path)
+        _dropped.discard(template_path)
+        if entry is None:
+            _learned[template_path] = [x1, y1, x2, y2, 1, instances]
+        else:
+            _learned[template_path] = [min(entry[0], x1), min(entry[1], y1),
+                                       max(entry[2], x2), max(entry[3], y2), entry[4] + 1,
+                                       max(_instances(entry), instances)]
+        _dirty = True
+    if time.time() - _last_save > _setting("save_interval"):
+        save()
+
+def forget(template_path=None):
+    global _dirty
+    with _lock:
+        _ensure_loaded()
+        if template_path is None:
+            _learned.clear()
+        else:
+            _learned.pop(template_path, None)
+        _dirty = True
+    save(merge=False)
+
+def drop(template_path):
+    # Unlike forget(), leaves the file to the next save; the template is
+    # kept out of the merge until it is learned again
+    global _dirty
+    with _lock:
+        _ensure_loaded()
+        if _learned.pop(template_path, None) is None:
+            return
+        _dropped.add(template_path)
+        _dirty = True
+    logger.debug(f"Dropped learned region for {template_path}: found outside it")
+
+def should_fallback(template_path):
+    now = time.time()
+    with _lock:
+        if now - _last_fallback.get(template_path, 0.0) < _setting("fallback_interval"):
+            return False
+        _last_fallback[template_path] = now
+    return True
+
+def should_verify(template_path):
+    # First call only starts the clock; the region has just been trusted
+    now = time.time()
+    with _lock:
+        if now - _last_verify.setdefault(template_path, now) < _setting("verify_interval"):
+            return False
+        _last_verify[template_path] = now
+    return True
+
+def save(merge=True):
+    global _dirty, _last_save
+    with _lock:
+        _last_save = time.time()
+        if not _dirty or _learned is None:
+            return
+        data = dict(_learned)
+        dropped = set(_dropped)
+        _dirty = False
+
+    # Several runner processes can learn at once, so fold in whatever is on disk
+    if merge:
+        for path, entry in _read_learned().items():
+            if path in dropped:
+                continue
+            mine = data.get(path)
+            if mine is None:
+                data[path] = entry
+            else:
+                data[path] = [min(mine[0], entry[0]), min(mine[1], entry[1]),
+                              max(mine[2], entry[2]), max(mine[3], entry[3]), max(mine[4], entry[4]),
+                              max(_instances(mine), _instances(entry))]
+
+    try:
+        os.makedirs(os.path.dirname(LEARNED_PATH), exist_ok=True)
+        tmp_path = LEARNED_PATH + ".tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(data, f, indent=4, sort_keys=True)
+        os.replace(tmp_path, LEARNED_PATH)
+    except Exception as e:
+        logger.warning(f"Could not save learned template regions: {e}")
+
+atexit.register(save)
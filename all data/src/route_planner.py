@@ -0,0 +1,114 @@
+import os
+import json
+import logging
+import threading
+
+import shared_vars
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------------------------------------------------------
+# Mirror Dungeon route planner
+# Best routes over a nav_vision.FloorGraph are found by dynamic programming
+# from the last visible depth back to the first, so every node is settled
+# once. A node's cost is the time it takes from entering it to being back on
+# the floor map, learned per node type from our own runs and stored in
+# config/node_times.json. All costs are in seconds. Until a type has
+# samples its cost leans on PRIOR_COSTS, typical node durations that keep the
+# order of the old hand-tuned weights and count as a few runs' worth of
+# samples. Boss is never learned (its time runs into the next floor's pack
+# selection) and always costs its prior; it is the only node at its depth.
+# ---------------------------------------------------------------------------
+
+NODE_TIMES_PATH = os.path.join(shared_vars.BASE_PATH, "config", "node_times.json")
+
+# Seconds from entering a node to being back on the floor map
+PRIOR_COSTS = {"Boss": 120, "Event": 25, "Shop": 45, "Focused": 160,
+               "Miniboss": 140, "Normal": 100, "Risky": 180, "Unknown": 100}
+PRIOR_WEIGHT = 3
+# Later samples keep counting once this many are in, so the mean follows
+# changes in team strength instead of freezing
+MAX_SAMPLES = 50
+MAX_NODE_SECONDS = 900
+
+_lock = threading.Lock()
+_times = None
+
+def _read_times():
+    try:
+        if os.path.exists(NODE_TIMES_PATH):
+            with open(NODE_TIMES_PATH, 'r') as f:
+                return json.load(f)
+    except Exception as e:
+        logger.warning(f"Could not read node times: {e}")
+    return {}
+
+def _ensure_loaded():
+    global _times
+    if _times is None:
+        _times = _read_times()
+
+def node_cost(node_type):
+    prior = PRIOR_COSTS.get(node_type, PRIOR_COSTS["Unknown"])
+    with _lock:
+        _ensure_loaded()
+        count, mean = _times.get(node_type, (0, 0.0))
+    return (prior * PRIOR_WEIGHT + mean * count) / (PRIOR_WEIGHT + count)
+
+def costs():
+    return {node_type: node_cost(node_type) for node_type in PRIOR_COSTS}
+
+def record(node_type, seconds):
+    if node_type is None or not 0 < seconds < MAX_NODE_SECONDS:
+        return
+    with _lock:
+        _ensure_loaded()
+        count, mean = _times.get(node_type, (0, 0.0))
+        count = min(count, MAX_SAMPLES - 1)
+        mean = (mean * count + seconds) / (count + 1)
+        _times[node_type] = [count + 1, round(mean, 2)]
+        data = dict(_times)
+    logger.debug(f"{node_type} node took {seconds:.1f}s (average {mean:.1f}s)")
+
+    try:
+        os.makedirs(os.path.dirname(NODE_TIMES_PATH), exist_ok=True)
+        tmp_path = NODE_TIMES_PATH + ".tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(data, f, indent=4, sort_keys=True)
+        os.replace(tmp_path, NODE_TIMES_PATH)
+    except Exception as e:
+        logger.warning(f"Could not save node times: {e}")
+
+def plan(graph, node_costs=None):
+    # Returns (path, cost): path lists (depth, row) from depth 0 to the last
+    # depth it can reach, or ([], inf) when depth 0 is empty
+    node_costs = node_costs or costs()
+    nodes = graph.nodes
+    L = len(nodes)
+    if L == 0:
+        return [], float('inf')
+    adj = graph.edges()
+
+    best = {}
+    for i in range(L - 1, -1, -1):
+        for j in range(3):
+            if nodes[i][j] is None:
+                continue
+            cost = node_costs.get(nodes[i][j], node_costs.get("Unknown", PRIOR_COSTS["Unknown"]))
+            children = [child for child in adj.get((i, j), []) if child[0] == i + 1 and child in best]
+            if i == L - 1 or not children:
+                best[(i, j)] = (cost, None)
+                continue
+            child = min(children, key=lambda c: best[c][0])
+            best[(i, j)] = (cost + best[child][0], child)
+
+    starts = [(0, j) for j in range(3) if (0, j) in best]
+    if not starts:
+        return [], float('inf')
+    start = min(starts, key=lambda s: best[s][0])
+    path = []
+    step = start
+    while step is not None:
+        path.append(step)
+        step = best[step][1]
+    return path, best[start][0]
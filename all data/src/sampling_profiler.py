@@ -0,0 +1,250 @@
+import os
+import sys
+import time
+import atexit
+import logging
+import threading
+from collections import Counter
+
+import shared_vars
+import timeline
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------------------------------------------------------
+# Sampling profiler for the runner processes
+# A daemon thread wakes every INTERVAL seconds and records the Python stack
+# of every other thread from sys._current_frames(), so nothing is traced and
+# it works the same in frozen builds. Stacks are counted per thread and
+# written to logs/ as collapsed stacks (one "root;caller;callee count" line
+# each, the input flamegraph.pl and speedscope take) next to a summary of the
+# hottest functions. The .folded file keeps every thread; the summary leaves
+# out helper threads parked in a wait (pool workers, sync loops, watchdogs),
+# which would otherwise bury the automation thread. A dump is written at the
+# end of every timeline run, when the profiler is switched off, and at exit.
+# Runners are stopped with terminate(), which skips atexit, so the samples
+# collected so far are also checkpointed to a *_partial file every
+# CHECKPOINT_INTERVAL seconds. Enabled by the sampling_profiler setting,
+# which the runners' sync loops pass to set_enabled().
+# ---------------------------------------------------------------------------
+
+PROFILE_DIR = os.path.join(shared_vars.BASE_PATH, "logs")
+INTERVAL = 0.01
+TOP_N = 30
+MAX_DEPTH = 64
+CHECKPOINT_INTERVAL = 30.0
+
+# (module, function) leaves where a helper thread is idle. Waits that block
+# in C (SimpleQueue.get, time.sleep) show up as their Python caller
+IDLE_LEAVES = {
+    ("threading", "wait"), ("threading", "acquire"), ("threading", "join"),
+    ("threading", "_wait_for_tstate_lock"), ("queue", "get"), ("thread", "_worker"),
+    ("compiled_runner", "sync_shared_vars"), ("exp_runner", "sync_shared_vars"),
+    ("threads_runner", "sync_shared_vars"), ("compiled_runner", "_connection_check"),
+    ("exp_runner", "_connection_check"), ("threads_runner", "_connection_check"),
+    ("core", "_capture_watchdog"),
+}
+
+_lock = threading.Lock()
+_sampler = None
+_label = "run"
+_labels = {}
+_write_lock = threading.Lock()
+_partial_base = None
+
+def _frame_label(code):
+    label = _labels.get(code)
+    if label is None:
+        module = os.path.splitext(os.path.basename(code.co_filename))[0]
+        label = f"{module}.{getattr(code, 'co_qualname', code.co_name)}"
+        _labels[code] = label
+    return label
+
+def _idle(stack):
+    frames = stack.split(";")
+    if frames[0] == "MainThread" or len(frames) < 2:
+        return False
+    module, _, name = frames[-1].partition(".")
+    return (module, name.rsplit(".", 1)[-1]) in IDLE_LEAVES
+
+class Sampler:
+    def __init__(self, interval=INTERVAL, checkpoint=None):
+        self.interval = interval
+        self.checkpoint = checkpoint
+        self.stacks = Counter()
+        self.samples = 0
+        self.started = time.time()
+        self._stop = threading.Event()
+        self._data_lock = threading.Lock()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="SamplingProfiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+
+    def _run(self):
+        own = threading.get_ident()
+        names = {}
+        last_checkpoint = time.time()
+        while not self._stop.wait(self.interval):
+            if self.checkpoint is not None and time.time() - last_checkpoint >= CHECKPOINT_INTERVAL:
+                last_checkpoint = time.time()
+                self.checkpoint()
+            frames = sys._current_frames()
+            if any(ident not in names for ident in frames):
+                names = {thread.ident: thread.name for thread in threading.enumerate()}
+            with self._data_lock:
+                for ident, frame in frames.items():
+                    if ident == own:
+                        continue
+                    stack = []
+                    while frame is not None and len(stack) < MAX_DEPTH:
+                        stack.append(_frame_label(frame.f_code))
+                        frame = frame.f_back
+                    stack.append(names.get(ident, f"thread-{ident}"))
+                    stack.reverse()
+                    self.stacks[";".join(stack)] += 1
+                self.samples += 1
+
+    def peek(self):
+        # Like take() but leaves the collected data in place
+        with self._data_lock:
+            return Counter(self.stacks), self.samples, time.time() - self.started, self.started
+
+    def take(self):
+        # Returns (stacks, samples, seconds) collected since the last take
+        with self._data_lock:
+            stacks, samples, started = self.stacks, self.samples, self.started
+            self.stacks, self.samples, self.started = Counter(), 0, time.time()
+        return stacks, samples, time.time() - started
+
+def _summary(stacks, samples, seconds, label):
+    own = Counter()
+    total = Counter()
+    idle = 0
+    for stack, count in stacks.items():
+        if _idle(stack):
+            idle += count
+            continue
+        frames = stack.split(";")[1:]
+        if not frames:
+            continue
+        own[frames[-1]] += count
+        for name in set(frames):
+            total[name] += count
+
+    lines = [f"Sampling profile: {label}",
+             f"{samples} samples over {seconds:.1f}s at {INTERVAL * 1000:.0f} ms",
+             f"{idle} idle helper-thread stacks left out (still in the .folded file)",
+             "",
+             f"Top {TOP_N} by own samples:",
+             f"{'own %':>7} {'total %':>8}  function"]
+    hits = (sum(stacks.values()) - idle) or 1
+    for name, count in own.most_common(TOP_N):
+        lines.append(f"{count / hits * 100:7.2f} {total[name] / hits * 100:8.2f}  {name}")
+    lines += ["", f"Top {TOP_N} by total samples:", f"{'total %':>8}  function"]
+    for name, count in total.most_common(TOP_N):
+        lines.append(f"{count / hits * 100:8.2f}  {name}")
+    return "\n".join(lines) + "\n"
+
+def _write(base, stacks, samples, seconds, label):
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    with open(base + ".folded", 'w') as f:
+        for stack, count in sorted(stacks.items()):
+            f.write(f"{stack} {count}\n")
+    with open(base + ".txt", 'w') as f:
+        f.write(_summary(stacks, samples, seconds, label))
+
+def _remove_partial():
+    # Caller holds _write_lock
+    global _partial_base
+    if _partial_base is None:
+        return
+    for ext in (".folded", ".txt"):
+        try:
+            os.remove(_partial_base + ext)
+        except OSError:
+            pass
+    _partial_base = None
+
+def checkpoint():
+    # Rewrites the samples collected since the last dump to one *_partial
+    # file pair, which the next dump replaces
+    global _partial_base
+    with _lock:
+        sampler = _sampler
+        label = _label
+    if sampler is None:
+        return
+    stacks, samples, seconds, started = sampler.peek()
+    if not samples:
+        return
+    stamp = time.strftime('%Y%m%d_%H%M%S', time.localtime(started))
+    base = os.path.join(PROFILE_DIR, f"profile_{label}_{stamp}_partial")
+    with _write_lock:
+        try:
+            if base != _partial_base:
+                _remove_partial()
+            _write(base, stacks, samples, seconds, f"{label} (partial)")
+            _partial_base = base
+        except Exception as e:
+            logger.warning(f"Could not write sampling profile checkpoint: {e}")
+
+def dump(label=None):
+    # Writes what was sampled since the last dump; returns the collapsed
+    # stacks path, or None when nothing was sampled
+    with _lock:
+        sampler = _sampler
+        label = label or _label
+    if sampler is None:
+        return None
+    stacks, samples, seconds = sampler.take()
+    if not samples:
+        return None
+
+    stamp = time.strftime('%Y%m%d_%H%M%S')
+    base = os.path.join(PROFILE_DIR, f"profile_{label}_{stamp}")
+    with _write_lock:
+        try:
+            _write(base, stacks, samples, seconds, label)
+        except Exception as e:
+            logger.warning(f"Could not write sampling profile: {e}")
+            return None
+        _remove_partial()
+    logger.info(f"Sampling profile written to {base}.folded ({samples} samples)")
+    return base + ".folded"
+
+def set_enabled(enabled, label=None):
+    global _sampler, _label
+    with _lock:
+        if label:
+            _label = label
+        running = _sampler is not None
+        if bool(enabled) == running:
+            return
+        if enabled:
+            _sampler = Sampler(checkpoint=checkpoint)
+            _sampler.start()
+            logger.info(f"Sampling profiler started ({INTERVAL * 1000:.0f} ms interval)")
+            return
+    dump()
+    with _lock:
+        sampler, _sampler = _sampler, None
+    if sampler is not None:
+        sampler.stop()
+        logger.info("Sampling profiler stopped")
+
+def running():
+    return _sampler is not None
+
+def _on_run_end(record):
+    if _sampler is not None:
+        dump(f"{record['kind']}_{(record.get('result') or 'run').lower()}")
+
+timeline.add_listener(_on_run_end)
+atexit.register(dump)
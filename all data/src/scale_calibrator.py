@@ -0,0 +1,166 @@
+import os
+import json
+import time
+import atexit
+import logging
+import threading
+
+import shared_vars
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------------------------------------------------------
+# Per-family scale calibration for enable_scaling matches
+# A scaled match normally sweeps eleven scales. Templates in the same folder
+# (a family, e.g. the navigation node icons) are drawn at the same scale on a
+# given screen, so the best scale of confident sweep matches is averaged per
+# family and resolution. Once a family has enough samples only the calibrated
+# scale and its two neighbours are tried. The family falls back to the full
+# sweep when its match confidence keeps dropping below the calibrated level,
+# and a miss periodically re-runs the full sweep to catch a scale that moved
+# out of the neighbourhood. Calibrations persist in
+# config/template_scales.json.
+# ---------------------------------------------------------------------------
+
+SCALES_PATH = os.path.join(shared_vars.BASE_PATH, "config", "template_scales.json")
+
+FULL_SWEEP = [x / 100.0 for x in range(80, 121, 4)]
+NEIGHBOURHOOD = 0.02
+MIN_SAMPLES = 3
+CONFIDENCE_DROP = 0.08
+MAX_DROPS = 3
+VERIFY_INTERVAL = 20.0
+SAVE_INTERVAL = 60.0
+
+_lock = threading.Lock()
+_scales = None
+_dirty = False
+_last_save = 0.0
+_drops = {}
+_last_verify = {}
+
+def family(template_path):
+    return os.path.dirname(template_path).replace("\\", "/")
+
+def resolution_key(width, height):
+    return f"{width}x{height}"
+
+def _read_scales():
+    try:
+        if os.path.exists(SCALES_PATH):
+            with open(SCALES_PATH, 'r') as f:
+                return json.load(f)
+    except Exception as e:
+        logger.warning(f"Could not read template scales: {e}")
+    return {}
+
+def _ensure_loaded():
+    global _scales
+    if _scales is None:
+        _scales = _read_scales()
+
+def _calibrated(entry):
+    return entry is not None and entry["samples"] >= MIN_SAMPLES
+
+def _entry(resolution, template_path):
+    _ensure_loaded()
+    return _scales.get(resolution, {}).get(family(template_path))
+
+def scales_for(template_path, resolution):
+    with _lock:
+        entry = _entry(resolution, template_path)
+        if not _calibrated(entry):
+            return FULL_SWEEP
+        scale = entry["scale"]
+    low, high = FULL_SWEEP[0], FULL_SWEEP[-1]
+    return sorted({round(min(high, max(low, scale + step)), 2) for step in (-NEIGHBOURHOOD, 0.0, NEIGHBOURHOOD)})
+
+def should_verify(template_path, resolution):
+    # Rate-limits the full-sweep re-check that follows a calibrated miss
+    key = (resolution, family(template_path))
+    now = time.time()
+    with _lock:
+        if now - _last_verify.get(key, 0.0) < VERIFY_INTERVAL:
+            return False
+        _last_verify[key] = now
+    return True
+
+def observe(template_path, resolution, scale, score, found, swept):
+    global _dirty
+    key = (resolution, family(template_path))
+    with _lock:
+        _ensure_loaded()
+        families = _scales.setdefault(resolution, {})
+        entry = families.get(key[1])
+
+        if not swept:
+            if not found or not _calibrated(entry):
+                return
+            if score < entry["score"] - CONFIDENCE_DROP:
+                _drops[key] = _drops.get(key, 0) + 1
+                if _drops[key] >= MAX_DROPS:
+                    logger.info(f"Match confidence dropped for {key[1]} at {resolution}, recalibrating its scale")
+                    families[key[1]] = dict(entry, samples=0)
+                    _drops.pop(key, None)
+                    _dirty = True
+            else:
+                _drops[key] = 0
+            return
+
+        if not found:
+            return
+        if entry is None or abs(scale - entry["scale"]) > NEIGHBOURHOOD * 2:
+            if _calibrated(entry):
+                logger.info(f"Scale for {key[1]} at {resolution} moved from {entry['scale']:.2f} to {scale:.2f}, recalibrating")
+            entry = {"scale": scale, "score": score, "samples": 0}
+        samples = entry["samples"]
+        entry = {
+            "scale": round((entry["scale"] * samples + scale) / (samples + 1), 2),
+            "score": round((entry["score"] * samples + score) / (samples + 1), 4),
+            "samples": samples + 1,
+        }
+        families[key[1]] = entry
+        _drops.pop(key, None)
+        _dirty = True
+        if entry["samples"] == MIN_SAMPLES:
+            logger.debug(f"Calibrated scale for {key[1]} at {resolution}: {entry['scale']:.2f}")
+    if time.time() - _last_save > SAVE_INTERVAL:
+        save()
+
+def forget(resolution=None):
+    global _dirty
+    with _lock:
+        _ensure_loaded()
+        if resolution is None:
+            _scales.clear()
+        else:
+            _scales.pop(resolution, None)
+        _drops.clear()
+        _dirty = True
+    save(merge=False)
+
+def save(merge=True):
+    global _dirty, _last_save
+    with _lock:
+        _last_save = time.time()
+        if not _dirty or _scales is None:
+            return
+        data = {resolution: dict(families) for resolution, families in _scales.items()}
+        _dirty = False
+
+    # Keep families another runner process calibrated in the meantime
+    if merge:
+        for resolution, families in _read_scales().items():
+            for name, entry in families.items():
+                data.setdefault(resolution, {}).setdefault(name, entry)
+
+    try:
+        os.makedirs(os.path.dirname(SCALES_PATH), exist_ok=True)
+        tmp_path = SCALES_PATH + ".tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(data, f, indent=4, sort_keys=True)
+        os.replace(tmp_path, SCALES_PATH)
+    except Exception as e:
+        logger.warning(f"Could not save template scales: {e}")
+
+atexit.register(save)
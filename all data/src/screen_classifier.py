@@ -0,0 +1,121 @@
+import os
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import common
+import shared_vars
+import roi_registry
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------------------------------------------------------
+# Batched screen-state classifier
+# A table of (state, template, region, threshold) rows is matched against one
+# frame in a single pass. Rows run on a shared thread pool (matchTemplate
+# releases the GIL) and each row only searches its own region, given in 1080p
+# reference coordinates; None uses the ROI registry, then the whole frame.
+# Inside common.idle_wait() rows whose region has not changed since their
+# last miss are skipped.
+# ---------------------------------------------------------------------------
+
+_MAX_WORKERS = max(1, min(4, (os.cpu_count() or 1)))
+_executor = None
+_executor_lock = threading.Lock()
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=_MAX_WORKERS, thread_name_prefix="ScreenClassifier")
+        return _executor
+
+def _scale_region(region):
+    if region is None:
+        return None, None, None, None
+    x1, y1, x2, y2 = region
+    return (common.scale_x_1080p(x1), common.scale_y_1080p(y1),
+            common.scale_x_1080p(x2), common.scale_y_1080p(y2))
+
+class ScreenClassifier:
+    def __init__(self, table):
+        self.table = []
+        for row in table:
+            state, template = row[0], row[1]
+            region = row[2] if len(row) > 2 else None
+            threshold = row[3] if len(row) > 3 else 0.8
+            self.table.append((state, template, region, threshold))
+
+    def _match_row(self, row, frame, idle=False, frame_token=None):
+        state, template, region, threshold = row
+        started = time.perf_counter()
+        threshold = common.get_effective_threshold(template, threshold)
+
+        roi_region = None
+        if region is None:
+            roi_region = common._roi_region(template, frame)
+            x1, y1, x2, y2 = roi_region if roi_region is not None else (None, None, None, None)
+        else:
+            x1, y1, x2, y2 = _scale_region(region)
+
+        gate_key = ("classify", template, threshold, x1, y1, x2, y2, frame.shape)
+        region_image, _, _ = common._crop_region(frame, x1, y1, x2, y2)
+        gated, gate_signature = common._gate_check(gate_key, template, region_image, idle=idle)
+        if gated:
+            score, box, found = 0.0, None, False
+        else:
+            score, box = common.match_score(template, screenshot=frame, x1=x1, y1=y1, x2=x2, y2=y2, record=False)
+            found = box is not None and score >= threshold
+            common._gate_store(gate_key, gate_signature, found)
+        searched = (x1, y1, x2, y2)
+        if roi_region is not None and not found and roi_registry.should_fallback(template):
+            score, box = common.match_score(template, screenshot=frame, record=False)
+            found = box is not None and score >= threshold
+            searched = (None, None, None, None)
+            if found:
+                roi_registry.drop(template)
+
+        location = ((box[0] + box[2]) // 2, (box[1] + box[3]) // 2) if found else None
+        if frame_token is not None:
+            common._record_query(template, {
+                "kind": "classify", "threshold": threshold, "region": searched, "gated": gated,
+                "grayscale": len(frame.shape) == 2,
+            }, [location] if found else [], score, started, frame.shape, frame_token)
+        if not found:
+            return None
+
+        if region is None:
+            common._roi_learn(template, frame, [box])
+        return state, template, score, location
+
+    def classify(self, screenshot=None):
+        if screenshot is None:
+            screenshot = common.capture_screen()
+
+        frame = screenshot
+        if shared_vars.convert_images_to_grayscale:
+            frame = common.to_grayscale(frame)
+
+        # Read on this thread; the pool threads never enter idle_wait() and
+        # never captured the frame the recorder has to attribute rows to
+        idle = common.idle_waiting()
+        frame_token = common.match_frame_token()
+        if len(self.table) > 1 and _MAX_WORKERS > 1:
+            results = list(_get_executor().map(lambda row: self._match_row(row, frame, idle, frame_token), self.table))
+        else:
+            results = [self._match_row(row, frame, idle, frame_token) for row in self.table]
+
+        hits = {}
+        for result in results:
+            if result is None:
+                continue
+            state, template, score, location = result
+            hits.setdefault(state, []).append((template, score, location))
+        for state_hits in hits.values():
+            state_hits.sort(key=lambda hit: hit[1], reverse=True)
+
+        if logger.isEnabledFor(logging.DEBUG):
+            summary = ", ".join(f"{state}={state_hits[0][1]:.3f}" for state, state_hits in hits.items())
+            logger.debug(f"Screen classified: {summary or 'no match'}", dirty=True)
+        return hits
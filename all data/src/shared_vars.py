@@ -184,12 +184,15 @@ def _get_gui_values():
         'reconnection_delay': 6,
         'reconnect_when_internet_reachable': False,
         'good_pc_mode': True,
+        'pyramid_matching': False,
+        'capture_fps': 0,
         'click_delay': 0.5,
         'claim_on_defeat': False,
         'retry_count': 0,
         'pack_refreshes': 7,
         'stop_after_current_run': False,
         'convert_enkephalin_to_modules': True,
+        'sampling_profiler': False,
         'enable_animations': True,
         'audio_volume': 0.5,
         'disable_audio': False,
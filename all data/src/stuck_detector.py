@@ -0,0 +1,168 @@
+import os
+import time
+import logging
+import threading
+from collections import deque
+from contextlib import contextmanager
+
+import cv2
+import numpy as np
+import shared_vars
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------------------------------------------------------
+# Stuck-screen detector for the run watchdog
+# Frames are reduced to small grayscale thumbnails and compared against the
+# thumbnail taken at the last change. Each region from
+# config/stuck_detector.json (1080p reference coordinates) has its own
+# threshold in mean grey levels, so a busy background can be given a high
+# threshold or left out while the UI regions still reveal a hang. With no
+# regions configured the whole frame is one region. Time is measured between
+# frame timestamps, so a run that simply stops capturing is not reported.
+# stuck_after has to outlast the longest legitimate static screen (loading
+# waits up to 60s); waits that can run longer, such as reconnecting, are
+# wrapped in expected_wait(), which holds the clock at zero until they end.
+# ---------------------------------------------------------------------------
+
+_DEFAULTS = {
+    "enabled": True,
+    "sample_interval": 2.0,
+    "stuck_after": 90.0,
+    "thumb_width": 96,
+    "threshold": 2.0,
+    "history": 16,
+    "debug_dump": False,
+    "regions": [],
+}
+
+_waits = 0
+_waits_lock = threading.Lock()
+
+@contextmanager
+def expected_wait():
+    # Process-wide, since the watchdog runs on its own thread
+    global _waits
+    with _waits_lock:
+        _waits += 1
+    try:
+        yield
+    finally:
+        with _waits_lock:
+            _waits -= 1
+
+def waiting():
+    return _waits > 0
+
+def _settings():
+    return shared_vars.ConfigCache.get_config("stuck_detector")
+
+def _setting(name):
+    return _settings().get(name, _DEFAULTS[name])
+
+def thumbnail(frame, width):
+    height = max(1, round(width * frame.shape[0] / frame.shape[1]))
+    thumb = cv2.resize(frame, (width, height), interpolation=cv2.INTER_AREA)
+    if len(thumb.shape) == 3:
+        thumb = cv2.cvtColor(thumb, cv2.COLOR_BGR2GRAY)
+    return thumb.astype(np.float32)
+
+class StuckScreenDetector:
+    def __init__(self):
+        self.enabled = bool(_setting("enabled"))
+        self.sample_interval = float(_setting("sample_interval"))
+        self.stuck_after = float(_setting("stuck_after"))
+        self.thumb_width = int(_setting("thumb_width"))
+        self.debug_dump = bool(_setting("debug_dump"))
+        self.history = deque(maxlen=int(_setting("history")))
+        self.reference = None
+        self.reference_time = 0.0
+        self.last_time = 0.0
+        self.last_diffs = {}
+        self._reference_frame = None
+        self._current_frame = None
+        self._regions = None
+
+    def _build_regions(self, thumb_shape):
+        thumb_height, thumb_width = thumb_shape
+        configured = _setting("regions")
+        if not configured:
+            return [("screen", (slice(0, thumb_height), slice(0, thumb_width)), float(_setting("threshold")))]
+
+        regions = []
+        scale_x = thumb_width / 1920
+        scale_y = thumb_height / 1080
+        for i, region in enumerate(configured):
+            x1, y1, x2, y2 = region["box"]
+            rows = slice(int(y1 * scale_y), max(int(y1 * scale_y) + 1, int(round(y2 * scale_y))))
+            cols = slice(int(x1 * scale_x), max(int(x1 * scale_x) + 1, int(round(x2 * scale_x))))
+            threshold = float(region.get("threshold", _setting("threshold")))
+            regions.append((region.get("name", f"region{i}"), (rows, cols), threshold))
+        return regions
+
+    def reset(self):
+        self.history.clear()
+        self.reference = None
+        self._reference_frame = None
+
+    def update(self, frame, timestamp):
+        # Feed the newest frame; returns True once nothing has moved for
+        # stuck_after seconds of captured frames
+        if not self.enabled or frame is None or timestamp <= self.last_time:
+            return False
+        self.last_time = timestamp
+
+        thumb = thumbnail(frame, self.thumb_width)
+        self.history.append((timestamp, thumb))
+        if self.debug_dump:
+            self._current_frame = frame
+        if self.reference is None or self.reference.shape != thumb.shape:
+            self._regions = self._build_regions(thumb.shape)
+            self._mark_change(thumb, timestamp, frame)
+            return False
+
+        if waiting():
+            self._mark_change(thumb, timestamp, frame)
+            return False
+
+        diff = cv2.absdiff(thumb, self.reference)
+        self.last_diffs = {name: float(diff[cells].mean()) for name, cells, _ in self._regions}
+        if any(self.last_diffs[name] > threshold for name, _, threshold in self._regions):
+            self._mark_change(thumb, timestamp, frame)
+            return False
+        return self.static_for() >= self.stuck_after
+
+    def _mark_change(self, thumb, timestamp, frame):
+        self.reference = thumb
+        self.reference_time = timestamp
+        if self.debug_dump:
+            self._reference_frame = frame
+
+    def static_for(self):
+        if self.reference is None:
+            return 0.0
+        return self.last_time - self.reference_time
+
+    def dump(self, directory):
+        # Optional debug artifact: the frame at the last change, the current
+        # frame and the thumbnail history as one strip
+        if not self.debug_dump:
+            return None
+        try:
+            os.makedirs(directory, exist_ok=True)
+            stamp = time.strftime("%Y%m%d_%H%M%S")
+            base = os.path.join(directory, f"stuck_{stamp}")
+            for suffix, image in (("reference", self._reference_frame), ("current", self._current_frame)):
+                if image is not None:
+                    ok, encoded = cv2.imencode(".png", image)
+                    if ok:
+                        encoded.tofile(f"{base}_{suffix}.png")
+            if self.history:
+                strip = np.hstack([thumb for _, thumb in self.history]).astype(np.uint8)
+                ok, encoded = cv2.imencode(".png", strip)
+                if ok:
+                    encoded.tofile(f"{base}_history.png")
+            return base
+        except Exception as e:
+            logger.warning(f"Could not write stuck screen debug images: {e}")
+            return None
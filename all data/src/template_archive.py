@@ -0,0 +1,269 @@
+import os
+import sys
+import json
+import time
+import hashlib
+import logging
+import threading
+
+import cv2
+import numpy as np
+import shared_vars
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------------------------------------------------------
+# Pre-decoded template archive
+# Every PNG under pictures/ is decoded once into raw uint8 arrays (colour and
+# grayscale, plus copies pre-scaled for one screen size when asked for) and
+# appended to a single data file next to a JSON manifest holding each array's
+# offset and shape and each source image's content hash. Runner processes map
+# the data file copy-on-write, so template loads cost nothing and the pages
+# are shared between the Mirror, Exp and Threads processes. A template whose
+# file no longer matches the manifest is decoded the usual way instead.
+#
+#   python template_archive.py [--width W --height H]    build / refresh
+# ---------------------------------------------------------------------------
+
+ARCHIVE_DIR = os.path.join(shared_vars.BASE_PATH, "temp", "template_archive")
+MANIFEST_FILE = "manifest.json"
+ARCHIVE_VERSION = 1
+SOURCE_DIR = "pictures"
+
+_ALIGN = 64
+_KINDS = (("color", cv2.IMREAD_COLOR), ("gray", cv2.IMREAD_GRAYSCALE))
+
+def _hash_file(path):
+    with open(path, "rb") as f:
+        return hashlib.blake2b(f.read(), digest_size=12).hexdigest()
+
+def _array_key(color_flag, scale=1.0):
+    kind = "gray" if color_flag == cv2.IMREAD_GRAYSCALE else "color"
+    scale = round(scale, 4)
+    return kind if scale == 1.0 else f"{kind}@{scale}"
+
+def _read_manifest(archive_dir):
+    path = os.path.join(archive_dir, MANIFEST_FILE)
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, "r") as f:
+            manifest = json.load(f)
+    except Exception as e:
+        logger.warning(f"Could not read template archive manifest: {e}")
+        return None
+    if manifest.get("version") != ARCHIVE_VERSION:
+        return None
+    return manifest
+
+def _map_data(archive_dir, manifest):
+    path = os.path.join(archive_dir, manifest["data"])
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        return None
+    # Copy-on-write keeps the arrays writeable for OpenCV while untouched
+    # pages stay shared with every other process mapping the file
+    return np.memmap(path, dtype=np.uint8, mode="c")
+
+def _view(data, offset, shape):
+    size = int(np.prod(shape))
+    return np.asarray(data[offset:offset + size]).reshape(shape)
+
+def _list_sources(resource_base):
+    sources = []
+    for root, _, files in os.walk(os.path.join(resource_base, SOURCE_DIR)):
+        for filename in files:
+            if filename.lower().endswith(".png"):
+                rel_path = os.path.relpath(os.path.join(root, filename), resource_base).replace(os.sep, "/")
+                sources.append(rel_path)
+    return sorted(sources)
+
+def _stat_signature(path):
+    st = os.stat(path)
+    return st.st_size, st.st_mtime_ns
+
+def _effective_scale(full_path, expected_size):
+    # Same scale the matcher picks for an unscaled lookup of this template
+    import common
+    if common.is_custom_fuse_image(full_path):
+        return 1.0
+    base_width, base_height = common.get_template_reference_resolution(full_path)
+    return min(expected_size[0] / base_width, expected_size[1] / base_height)
+
+def _is_current(resource_base, manifest, sources, expected_size):
+    if manifest is None or manifest.get("expected_size") != expected_size:
+        return False
+    entries = manifest["entries"]
+    if set(entries) != set(sources):
+        return False
+    for rel_path in sources:
+        entry = entries[rel_path]
+        if list(_stat_signature(os.path.join(resource_base, rel_path))) != [entry["size"], entry["mtime"]]:
+            return False
+    return True
+
+def build(resource_base, archive_dir=ARCHIVE_DIR, expected_size=None):
+    # Refreshes the archive; unchanged images (by content hash) are copied
+    # over from the previous archive instead of being decoded again
+    previous = _read_manifest(archive_dir)
+    if expected_size is None and previous is not None:
+        expected_size = previous.get("expected_size")
+    expected_size = list(expected_size) if expected_size else None
+
+    sources = _list_sources(resource_base)
+    if _is_current(resource_base, previous, sources, expected_size):
+        logger.debug("Template archive is up to date")
+        return False
+
+    os.makedirs(archive_dir, exist_ok=True)
+    old_data = _map_data(archive_dir, previous) if previous is not None else None
+    old_entries = previous["entries"] if previous is not None else {}
+
+    data_name = f"templates_{time.strftime('%Y%m%d_%H%M%S')}_{os.getpid()}.bin"
+    entries = {}
+    reused = decoded = 0
+    offset = 0
+    with open(os.path.join(archive_dir, data_name), "wb") as f:
+        def append(array):
+            nonlocal offset
+            padding = (-offset) % _ALIGN
+            f.write(b"\0" * padding)
+            offset += padding
+            array = np.ascontiguousarray(array, dtype=np.uint8)
+            f.write(array.tobytes())
+            placed = [offset, list(array.shape)]
+            offset += array.nbytes
+            return placed
+
+        for rel_path in sources:
+            full_path = os.path.join(resource_base, rel_path)
+            size, mtime = _stat_signature(full_path)
+            digest = _hash_file(full_path)
+            scale = round(_effective_scale(full_path, expected_size), 4) if expected_size else 1.0
+            wanted = [(kind, flag, key) for kind, flag in _KINDS
+                      for key in {_array_key(flag), _array_key(flag, scale)}]
+
+            arrays = {}
+            old = old_entries.get(rel_path)
+            if old_data is not None and old is not None and old["hash"] == digest \
+                    and all(key in old["arrays"] for _, _, key in wanted):
+                for _, _, key in wanted:
+                    arrays[key] = _view(old_data, *old["arrays"][key])
+                reused += 1
+            else:
+                for kind, flag in _KINDS:
+                    image = cv2.imdecode(np.fromfile(full_path, dtype=np.uint8), flag)
+                    if image is None:
+                        break
+                    arrays[kind] = image
+                    if scale != 1.0:
+                        arrays[f"{kind}@{scale}"] = cv2.resize(image, None, fx=scale, fy=scale, interpolation=cv2.INTER_LINEAR)
+                if len(arrays) < len(wanted):
+                    logger.warning(f"Could not decode {rel_path}, leaving it out of the template archive")
+                    continue
+                decoded += 1
+
+            entries[rel_path] = {
+                "hash": digest,
+                "size": size,
+                "mtime": mtime,
+                "arrays": {key: append(array) for key, array in arrays.items()},
+            }
+
+    manifest = {
+        "version": ARCHIVE_VERSION,
+        "data": data_name,
+        "expected_size": expected_size,
+        "built": time.time(),
+        "entries": entries,
+    }
+    manifest_path = os.path.join(archive_dir, MANIFEST_FILE)
+    with open(manifest_path + ".tmp", "w") as f:
+        json.dump(manifest, f, indent=4)
+    os.replace(manifest_path + ".tmp", manifest_path)
+
+    del old_data
+    for filename in os.listdir(archive_dir):
+        if filename.endswith(".bin") and filename != data_name:
+            try:
+                os.remove(os.path.join(archive_dir, filename))
+            except OSError:
+                # Still mapped by a running process; removed on a later build
+                pass
+
+    logger.info(f"Template archive built: {len(entries)} templates ({decoded} decoded, {reused} reused), "
+                f"{offset / (1024 * 1024):.1f} MB")
+    return True
+
+def build_in_background(resource_base):
+    def _run():
+        try:
+            build(resource_base)
+        except Exception as e:
+            logger.warning(f"Template archive build failed: {e}")
+    threading.Thread(target=_run, name="TemplateArchiveBuild", daemon=True).start()
+
+class TemplateArchive:
+    def __init__(self, resource_base, manifest, data):
+        self.resource_base = resource_base
+        self.entries = manifest["entries"]
+        self.data = data
+        self._checked = {}
+
+    def _entry(self, rel_path):
+        entry = self.entries.get(rel_path)
+        if entry is None:
+            return None
+        fresh = self._checked.get(rel_path)
+        if fresh is None:
+            try:
+                signature = _stat_signature(os.path.join(self.resource_base, rel_path))
+                fresh = list(signature) == [entry["size"], entry["mtime"]]
+            except OSError:
+                fresh = False
+            self._checked[rel_path] = fresh
+        return entry if fresh else None
+
+    def get(self, full_path, color_flag, scale=1.0):
+        if color_flag not in (cv2.IMREAD_COLOR, cv2.IMREAD_GRAYSCALE):
+            return None
+        rel_path = os.path.relpath(full_path, self.resource_base).replace(os.sep, "/")
+        entry = self._entry(rel_path)
+        if entry is None:
+            return None
+        placed = entry["arrays"].get(_array_key(color_flag, scale))
+        if placed is None:
+            return None
+        return _view(self.data, *placed)
+
+def open_archive(resource_base, archive_dir=ARCHIVE_DIR):
+    manifest = _read_manifest(archive_dir)
+    if manifest is None:
+        return None
+    try:
+        data = _map_data(archive_dir, manifest)
+    except Exception as e:
+        logger.warning(f"Could not map template archive: {e}")
+        return None
+    if data is None:
+        return None
+    logger.debug(f"Template archive mapped: {len(manifest['entries'])} templates")
+    return TemplateArchive(resource_base, manifest, data)
+
+def main(argv=None):
+    import argparse
+    import common
+    parser = argparse.ArgumentParser(description="Build the pre-decoded template archive")
+    parser.add_argument("--width", type=int, default=None, help="also store templates pre-scaled for this screen width")
+    parser.add_argument("--height", type=int, default=None)
+    args = parser.parse_args(argv)
+
+    expected_size = None
+    if args.width and args.height:
+        common.set_monitor_size(args.width, args.height)
+        expected_size = (common.EXPECTED_WIDTH, common.EXPECTED_HEIGHT)
+    build(common.BASE_PATH, expected_size=expected_size)
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+    main()
@@ -17,6 +17,8 @@ sys.path.append(os.path.join(BASE_PATH, 'src'))
 
 import luxcavation_functions
 import common
+import frame_replay
+import sampling_profiler
 
 logger = logging.getLogger(__name__)
 
@@ -73,11 +75,18 @@ def sync_shared_vars(shared_vars_instance):
             if hasattr(shared_vars_instance, 'game_monitor'): sv_module.game_monitor = shared_vars_instance.game_monitor.value
             if hasattr(shared_vars_instance, 'click_delay'): sv_module.click_delay = shared_vars_instance.click_delay.value
             if hasattr(shared_vars_instance, 'good_pc_mode'): sv_module.good_pc_mode = shared_vars_instance.good_pc_mode.value
+            if hasattr(shared_vars_instance, 'pyramid_matching'): sv_module.pyramid_matching = shared_vars_instance.pyramid_matching.value
+            if hasattr(shared_vars_instance, 'capture_fps'):
+                sv_module.capture_fps = shared_vars_instance.capture_fps.value
+                common.set_capture_fps(sv_module.capture_fps)
             if hasattr(shared_vars_instance, 'debug_image_matches'): sv_module.debug_image_matches = shared_vars_instance.debug_image_matches.value
             if hasattr(shared_vars_instance, 'convert_images_to_grayscale'): sv_module.convert_images_to_grayscale = shared_vars_instance.convert_images_to_grayscale.value
             if hasattr(shared_vars_instance, 'reconnection_delay'): sv_module.reconnection_delay = shared_vars_instance.reconnection_delay.value
             if hasattr(shared_vars_instance, 'reconnect_when_internet_reachable'): sv_module.reconnect_when_internet_reachable = shared_vars_instance.reconnect_when_internet_reachable.value
             if hasattr(shared_vars_instance, 'stop_after_current_run'): sv_module.stop_after_current_run = shared_vars_instance.stop_after_current_run.value
+            if hasattr(shared_vars_instance, 'sampling_profiler'):
+                sv_module.sampling_profiler = shared_vars_instance.sampling_profiler.value
+                sampling_profiler.set_enabled(sv_module.sampling_profiler, "threads")
             
         except AttributeError:
             pass 
@@ -98,6 +107,8 @@ def main(runs, difficulty, shared_vars=None):
             sync_thread = threading.Thread(target=sync_shared_vars, args=(shared_vars,), daemon=True)
             sync_thread.start()
 
+        frame_replay.start_recording_from_env()
+
         difficulty_arg = difficulty
         if difficulty_arg == "latest":
             difficulty = "latest"
@@ -0,0 +1,198 @@
+import os
+import json
+import math
+import time
+import logging
+import threading
+from functools import wraps
+from contextlib import contextmanager
+
+import shared_vars
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------------------------------------------------------
+# Per-phase run timeline
+# Phases (pack selection, navigation, battle, events, ...) are marked with
+# span() or the @phase decorator. While a run is open on the current thread,
+# every span records its start and duration; a span's self time excludes the
+# spans nested inside it, so a battle started from an event is counted once.
+# Outside a run, or on another thread, a span costs one attribute lookup.
+# end_run() writes the run to logs/timeline/ as compact JSON and folds its
+# per-phase self times into config/timeline_stats.json, which keeps the last
+# runs per kind and their percentiles for the statistics page. Time no span
+# covers (screen classification in the main loop, mostly) is "other".
+# ---------------------------------------------------------------------------
+
+TIMELINE_DIR = os.path.join(shared_vars.BASE_PATH, "logs", "timeline")
+STATS_PATH = os.path.join(shared_vars.BASE_PATH, "config", "timeline_stats.json")
+
+MAX_SPANS = 20000
+KEEP_RUN_FILES = 100
+KEEP_RUNS = 50
+PERCENTILES = (50, 90)
+
+_lock = threading.Lock()
+_run = None
+_listeners = []
+
+def _percentile(values, pct):
+    # Nearest rank on sorted values
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    rank = max(0, min(len(ordered) - 1, math.ceil(pct / 100.0 * len(ordered)) - 1))
+    return ordered[rank]
+
+class _Run:
+    def __init__(self, kind):
+        self.kind = kind
+        self.thread = threading.get_ident()
+        self.start = time.time()
+        self.stack = []
+        self.spans = []
+        self.totals = {}
+
+    def push(self, name):
+        self.stack.append([name, time.time(), 0.0])
+
+    def pop(self):
+        name, started, nested = self.stack.pop()
+        duration = time.time() - started
+        self_time = max(0.0, duration - nested)
+        if self.stack:
+            self.stack[-1][2] += duration
+        total = self.totals.setdefault(name, [0.0, 0])
+        total[0] += self_time
+        total[1] += 1
+        if len(self.spans) < MAX_SPANS:
+            self.spans.append([name, round(started - self.start, 3), round(duration, 3), len(self.stack)])
+
+def _active():
+    run = _run
+    if run is not None and run.thread == threading.get_ident():
+        return run
+    return None
+
+@contextmanager
+def span(name):
+    run = _active()
+    if run is None:
+        yield
+        return
+    run.push(name)
+    try:
+        yield
+    finally:
+        run.pop()
+
+def phase(name):
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            run = _active()
+            if run is None:
+                return fn(*args, **kwargs)
+            run.push(name)
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                run.pop()
+        return wrapper
+    return decorator
+
+def add_listener(callback):
+    # callback(record) runs after every end_run, on the run's thread
+    _listeners.append(callback)
+
+def start_run(kind):
+    global _run
+    with _lock:
+        if _run is not None:
+            logger.debug(f"Timeline run {_run.kind} was still open, dropping it")
+        _run = _Run(kind)
+
+def end_run(result=None):
+    global _run
+    with _lock:
+        run, _run = _run, None
+    if run is None:
+        return None
+    while run.stack:
+        run.pop()
+
+    duration = time.time() - run.start
+    phases = {name: round(total[0], 3) for name, total in run.totals.items()}
+    phases["other"] = round(max(0.0, duration - sum(phases.values())), 3)
+    record = {
+        "kind": run.kind,
+        "start": run.start,
+        "duration": round(duration, 3),
+        "result": result,
+        "phases": phases,
+        "counts": {name: total[1] for name, total in run.totals.items()},
+        "spans": run.spans,
+    }
+
+    try:
+        _write_run(record)
+        _update_stats(run.kind, duration, phases)
+    except Exception as e:
+        logger.warning(f"Could not save run timeline: {e}")
+
+    for callback in _listeners:
+        try:
+            callback(record)
+        except Exception as e:
+            logger.warning(f"Run timeline listener failed: {e}")
+    return record
+
+def _write_run(record):
+    os.makedirs(TIMELINE_DIR, exist_ok=True)
+    stamp = time.strftime('%Y%m%d_%H%M%S', time.localtime(record["start"]))
+    path = os.path.join(TIMELINE_DIR, f"{record['kind']}_{stamp}.json")
+    with open(path, 'w') as f:
+        json.dump(record, f, separators=(",", ":"))
+
+    files = sorted(f for f in os.listdir(TIMELINE_DIR) if f.endswith(".json"))
+    for filename in files[:-KEEP_RUN_FILES]:
+        try:
+            os.remove(os.path.join(TIMELINE_DIR, filename))
+        except OSError:
+            pass
+
+def _read_stats():
+    try:
+        if os.path.exists(STATS_PATH):
+            with open(STATS_PATH, 'r') as f:
+                return json.load(f)
+    except Exception as e:
+        logger.warning(f"Could not read timeline stats: {e}")
+    return {}
+
+def _summarize(recent):
+    summary = {}
+    names = {name for run in recent for name in run["phases"]}
+    total = sum(run["duration"] for run in recent) or 1.0
+    for name in names:
+        values = [run["phases"].get(name, 0.0) for run in recent]
+        entry = {f"p{pct}": round(_percentile(values, pct), 1) for pct in PERCENTILES}
+        entry["share"] = round(sum(values) / total, 4)
+        summary[name] = entry
+    return summary
+
+def _update_stats(kind, duration, phases):
+    with _lock:
+        data = _read_stats()
+        stats = data.setdefault(kind, {"runs": 0, "recent": []})
+        stats["runs"] = stats.get("runs", 0) + 1
+        stats["recent"] = ([{"duration": round(duration, 1), "phases": phases}] + stats.get("recent", []))[:KEEP_RUNS]
+        stats["duration"] = {f"p{pct}": round(_percentile([run["duration"] for run in stats["recent"]], pct), 1)
+                             for pct in PERCENTILES}
+        stats["phases"] = _summarize(stats["recent"])
+
+        os.makedirs(os.path.dirname(STATS_PATH), exist_ok=True)
+        tmp_path = STATS_PATH + ".tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(data, f, indent=4)
+        os.replace(tmp_path, STATS_PATH)
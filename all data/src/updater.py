@@ -34,6 +34,13 @@ EXCLUDED_PATHS = [
     "staged_updater", 
     "pictures/CustomFuse/CustomEgoGifts/", 
     "config/stats.json", 
+    "config/template_regions_learned.json",
+    "config/template_scales.json",
+    "config/node_times.json",
+    "config/wait_latency.json",
+    "config/timeline_stats.json",
+    "config/glyphs/",
+    "config/features/",
     "config/schedule.json"
 ]
 
@@ -51,7 +58,9 @@ CONFIG_MERGE_FILES = [
     "config/card_priority.json",
     "config/exp_team_selection.json",
     "config/threads_team_selection.json",
-    "config/image_thresholds.json"
+    "config/image_thresholds.json",
+    "config/template_regions.json",
+    "config/stuck_detector.json"
 ]
 
 class Updater:
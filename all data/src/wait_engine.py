@@ -0,0 +1,171 @@
+import os
+import sys
+import json
+import time
+import atexit
+import logging
+import threading
+
+import cv2
+import common
+import shared_vars
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------------------------------------------------------
+# Adaptive waits
+# wait_until() polls a condition (a template appearing or vanishing, a screen
+# region changing) and returns as soon as it holds, bounded by a timeout, so
+# a delay sized for the slowest PC only costs its full length when the game
+# really is that slow. Each call site keeps a short history of how long its
+# transition took on this machine; once enough samples are in, polling only
+# starts shortly before the fastest transitions seen, which saves captures on
+# long waits. Histories persist in config/wait_latency.json.
+# ---------------------------------------------------------------------------
+
+LATENCY_PATH = os.path.join(shared_vars.BASE_PATH, "config", "wait_latency.json")
+
+POLL_INTERVAL = 0.1
+MAX_SAMPLES = 30
+MIN_SAMPLES = 5
+# Polling starts at this share of the fastest observed transition
+EARLY_FACTOR = 0.8
+CHANGE_TOLERANCE = 12
+SAVE_INTERVAL = 60.0
+
+_CHANGE_CELL = 16
+
+_lock = threading.Lock()
+_latency = None
+_dirty = False
+_last_save = 0.0
+
+def _read_latency():
+    try:
+        if os.path.exists(LATENCY_PATH):
+            with open(LATENCY_PATH, 'r') as f:
+                return json.load(f)
+    except Exception as e:
+        logger.warning(f"Could not read wait latencies: {e}")
+    return {}
+
+def _ensure_loaded():
+    global _latency
+    if _latency is None:
+        _latency = _read_latency()
+
+def _caller_site():
+    frame = sys._getframe(2)
+    module = os.path.splitext(os.path.basename(frame.f_code.co_filename))[0]
+    return f"{module}.{frame.f_code.co_name}:{frame.f_lineno}"
+
+def expected(site):
+    # Returns (fast, typical) transition seconds for a site, or None while it
+    # has too few samples
+    with _lock:
+        _ensure_loaded()
+        samples = sorted(_latency.get(site, ()))
+    if len(samples) < MIN_SAMPLES:
+        return None
+    return samples[len(samples) // 10], samples[len(samples) // 2]
+
+def _observe(site, seconds):
+    global _dirty
+    with _lock:
+        _ensure_loaded()
+        samples = _latency.setdefault(site, [])
+        samples.append(round(seconds, 3))
+        del samples[:-MAX_SAMPLES]
+        _dirty = True
+    if time.time() - _last_save > SAVE_INTERVAL:
+        save()
+
+def wait_until(condition, timeout, site=None, interval=POLL_INTERVAL):
+    # Returns the condition's first truthy result, or its last result once
+    # the timeout runs out. timeout=None waits for as long as it takes.
+    site = site or _caller_site()
+    start = time.time()
+    learned = expected(site)
+    if learned is not None:
+        early = learned[0] * EARLY_FACTOR
+        common.sleep(early if timeout is None else min(early, timeout))
+
+    with common.idle_wait():
+        while True:
+            result = condition()
+            elapsed = time.time() - start
+            if result:
+                _observe(site, elapsed)
+                return result
+            if timeout is not None and elapsed >= timeout:
+                logger.debug(f"Wait at {site} gave up after {elapsed:.2f}s")
+                return result
+            pause = interval if timeout is None else min(interval, timeout - elapsed)
+            common.sleep(max(0.0, pause))
+
+def appears(template_path, **match_kwargs):
+    return lambda: common.match_image(template_path, **match_kwargs)
+
+def vanishes(template_path, **match_kwargs):
+    return lambda: not common.match_image(template_path, **match_kwargs)
+
+def any_of(*conditions):
+    def check():
+        for condition in conditions:
+            result = condition()
+            if result:
+                return result
+        return None
+    return check
+
+def _thumbnail(region):
+    frame = common.capture_screen(region=region, grayscale=region is not None)
+    frame = common.to_grayscale(frame) if len(frame.shape) == 3 else frame
+    height, width = frame.shape[:2]
+    size = (max(1, width // _CHANGE_CELL), max(1, height // _CHANGE_CELL))
+    return cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+
+def changed(region=None, tolerance=CHANGE_TOLERANCE):
+    # region=(x1, y1, x2, y2) in monitor pixels; the baseline is taken now,
+    # so build the condition before the input that should change the screen
+    baseline = _thumbnail(region)
+    def check():
+        current = _thumbnail(region)
+        return current.shape != baseline.shape or int(cv2.absdiff(current, baseline).max()) > tolerance
+    return check
+
+def forget(site=None):
+    global _dirty
+    with _lock:
+        _ensure_loaded()
+        if site is None:
+            _latency.clear()
+        else:
+            _latency.pop(site, None)
+        _dirty = True
+    save(merge=False)
+
+def save(merge=True):
+    global _dirty, _last_save
+    with _lock:
+        _last_save = time.time()
+        if not _dirty or _latency is None:
+            return
+        data = {site: list(samples) for site, samples in _latency.items()}
+        _dirty = False
+
+    # Keep sites another runner process measured in the meantime
+    if merge:
+        for site, samples in _read_latency().items():
+            data.setdefault(site, samples)
+
+    try:
+        os.makedirs(os.path.dirname(LATENCY_PATH), exist_ok=True)
+        tmp_path = LATENCY_PATH + ".tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(data, f, indent=4, sort_keys=True)
+        os.replace(tmp_path, LATENCY_PATH)
+    except Exception as e:
+        logger.warning(f"Could not save wait latencies: {e}")
+
+atexit.register(save)
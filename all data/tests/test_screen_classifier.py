@@ -0,0 +1,104 @@
+import os
+import sys
+
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("cv2")
+pytest.importorskip("mss")
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+import common
+import shared_vars
+import screen_classifier
+
+
+@pytest.fixture
+def classifier(monkeypatch):
+    # Two rows on a multi-worker pool, so rows run off the calling thread
+    monkeypatch.setattr(screen_classifier, "_MAX_WORKERS", 2)
+    monkeypatch.setattr(shared_vars, "convert_images_to_grayscale", False)
+    monkeypatch.setattr(common, "get_effective_threshold", lambda template, threshold: threshold)
+    monkeypatch.setattr(common, "_roi_region", lambda template, frame: None)
+
+    # Every row's region looks the same as on its last miss
+    seen = []
+    def gate_check(key, template_path, region, idle=None):
+        if idle is None:
+            idle = common.idle_waiting()
+        seen.append(idle)
+        return idle, None
+    monkeypatch.setattr(common, "_gate_check", gate_check)
+    monkeypatch.setattr(common, "_gate_store", lambda key, signature, found: None)
+
+    matched = []
+    def match_score(template, **kwargs):
+        matched.append(template)
+        return 0.0, None
+    monkeypatch.setattr(common, "match_score", match_score)
+
+    instance = screen_classifier.ScreenClassifier([
+        ("loading", "pictures/general/loading.png"),
+        ("connecting", "pictures/general/connecting.png"),
+    ])
+    return instance, seen, matched
+
+
+def test_multi_row_classify_is_gated_inside_idle_wait(classifier):
+    instance, seen, matched = classifier
+    frame = np.zeros((1080, 1920, 3), dtype=np.uint8)
+
+    with common.idle_wait():
+        assert instance.classify(frame) == {}
+
+    assert seen == [True, True]
+    assert matched == []
+
+
+def test_multi_row_classify_matches_outside_idle_wait(classifier):
+    instance, seen, matched = classifier
+    frame = np.zeros((1080, 1920, 3), dtype=np.uint8)
+
+    assert instance.classify(frame) == {}
+
+    assert seen == [False, False]
+    assert sorted(matched) == ["pictures/general/connecting.png", "pictures/general/loading.png"]
+
+
+def test_table_classifies_one_frame_into_hits_and_scores(monkeypatch):
+    monkeypatch.setattr(screen_classifier, "_MAX_WORKERS", 2)
+    monkeypatch.setattr(shared_vars, "convert_images_to_grayscale", False)
+    monkeypatch.setattr(common, "get_effective_threshold", lambda template, threshold: threshold)
+    monkeypatch.setattr(common, "_roi_region", lambda template, frame: None)
+    monkeypatch.setattr(common, "_roi_learn", lambda template, frame, boxes: None)
+    monkeypatch.setattr(common, "scale_x_1080p", lambda x: x)
+    monkeypatch.setattr(common, "scale_y_1080p", lambda y: y)
+
+    scores = {
+        "winrate.png": (0.93, (1700, 800, 1760, 860)),
+        "winrate_wave.png": (0.85, (1650, 810, 1745, 850)),
+        "danteh.png": (0.55, (300, 400, 385, 485)),
+        "skip.png": (0.91, (1000, 300, 1104, 343)),
+    }
+    regions = {}
+    def match_score(template, screenshot=None, x1=None, y1=None, x2=None, y2=None, **kwargs):
+        regions[template] = (x1, y1, x2, y2)
+        return scores[template]
+    monkeypatch.setattr(common, "match_score", match_score)
+
+    classifier = screen_classifier.ScreenClassifier([
+        ("event_skip", "skip.png", (640, 120, 1920, 900)),
+        ("battle", "winrate_wave.png", (960, 540, 1920, 1080)),
+        ("battle", "winrate.png", (960, 540, 1920, 1080)),
+        ("navigation", "danteh.png", (0, 0, 1280, 1080), 0.8),
+    ])
+    hits = classifier.classify(np.zeros((1080, 1920, 3), dtype=np.uint8))
+
+    assert set(hits) == {"event_skip", "battle"}
+    assert hits["event_skip"] == [("skip.png", 0.91, (1052, 321))]
+    # Best score first within a state
+    assert hits["battle"] == [("winrate.png", 0.93, (1730, 830)), ("winrate_wave.png", 0.85, (1697, 830))]
+    # Every row searched only its own region, the miss included
+    assert regions["danteh.png"] == (0, 0, 1280, 1080)
+    assert regions["skip.png"] == (640, 120, 1920, 900)
@@ -0,0 +1,57 @@
+import os
+import sys
+
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("cv2")
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+import stuck_detector
+
+
+@pytest.fixture
+def detector(monkeypatch):
+    # Built-in defaults, whatever config/stuck_detector.json holds
+    monkeypatch.setattr(stuck_detector, "_settings", lambda: {})
+    return stuck_detector.StuckScreenDetector()
+
+
+def _frame(value):
+    return np.full((1080, 1920, 3), value, dtype=np.uint8)
+
+
+def test_static_screen_is_stuck_only_after_stuck_after(detector):
+    assert detector.stuck_after >= 60
+
+    static = _frame(40)
+    timestamp = 0.0
+    while timestamp < detector.stuck_after:
+        assert detector.update(static, timestamp) is False
+        timestamp += detector.sample_interval
+    assert detector.update(static, timestamp) is True
+
+
+def test_changing_frame_restarts_the_clock(detector):
+    timestamp = 0.0
+    while timestamp < detector.stuck_after - detector.sample_interval:
+        assert detector.update(_frame(40), timestamp) is False
+        timestamp += detector.sample_interval
+
+    assert detector.update(_frame(120), timestamp) is False
+    assert detector.static_for() == 0.0
+
+    timestamp += detector.sample_interval
+    assert detector.update(_frame(120), timestamp) is False
+    assert detector.static_for() == detector.sample_interval
+
+
+def test_expected_wait_holds_the_clock(detector):
+    static = _frame(40)
+    timestamp = 0.0
+    with stuck_detector.expected_wait():
+        while timestamp <= detector.stuck_after * 2:
+            assert detector.update(static, timestamp) is False
+            timestamp += detector.sample_interval
+    assert detector.static_for() == 0.0